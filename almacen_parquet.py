@@ -0,0 +1,119 @@
+import os
+import glob
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    pa = pq = None
+    PARQUET_DISPONIBLE = False
+
+# Columnas de fecha que se guardan como timestamp
+COLUMNAS_FECHA = ('fecha', 'fecha_insercion')
+# Columnas que se mantienen como texto aunque parezcan numéricas
+COLUMNAS_TEXTO = ('codigo_interno',)
+EXTENSIONES_DATOS = ('.csv', '.parquet')
+
+
+def tipar_columnas(df):
+    """
+    Convierte las columnas de un paquete a tipos definitivos.
+
+    Las fechas pasan a timestamp y las columnas de texto que son numéricas en
+    todas sus filas pasan a número; el resto queda como texto.
+
+    Returns:
+        DataFrame: El mismo DataFrame con columnas tipadas
+    """
+    for columna in df.columns:
+        if columna in COLUMNAS_FECHA:
+            df[columna] = pd.to_datetime(df[columna], errors='coerce')
+        elif columna in COLUMNAS_TEXTO:
+            df[columna] = df[columna].astype('string')
+        elif not pd.api.types.is_numeric_dtype(df[columna]) and not pd.api.types.is_datetime64_any_dtype(df[columna]):
+            numerica = pd.to_numeric(df[columna], errors='coerce')
+            if numerica.notna().sum() == df[columna].notna().sum():
+                df[columna] = numerica
+            else:
+                df[columna] = df[columna].astype('string')
+    return df
+
+
+def particionar_paquete(ruta_csv, dia_defecto, esquemas=None, clave=None):
+    """
+    Lee un paquete CSV y lo separa por día de medición.
+
+    El día se toma de 'fecha' (o de 'fecha_insercion' si falta); las filas
+    sin fecha válida van a dia_defecto. Con un CacheEsquemas el paquete se
+    lee con el esquema aprendido para clave (endpoint y dispositivo) en lugar de
+    inferir los tipos paquete a paquete.
+
+    Returns:
+        dict: {'YYYY-MM-DD': DataFrame tipado}
+    """
+    if esquemas is not None:
+        df = esquemas.leer_csv(ruta_csv, clave)
+    else:
+        df = tipar_columnas(pd.read_csv(ruta_csv, dtype=str, keep_default_na=False, na_values=['']))
+    columna_dia = next((c for c in COLUMNAS_FECHA if c in df.columns), None)
+    if columna_dia is None or df.empty:
+        return {dia_defecto: df}
+    dias = df[columna_dia].dt.strftime('%Y-%m-%d').fillna(dia_defecto)
+    return {dia: grupo.reset_index(drop=True) for dia, grupo in df.groupby(dias, sort=True)}
+
+
+def escribir_parquet(df, ruta, compresion='zstd'):
+    """Escribe un DataFrame como Parquet y fuerza el contenido a disco"""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with open(ruta, 'wb') as f:
+        pq.write_table(tabla, f, compression=compresion)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def anexar_dia(ruta_existente, df, ruta_salida):
+    """
+    Agrega filas al Parquet de un día reescribiéndolo completo en ruta_salida.
+
+    Parquet no admite agregar filas a un archivo cerrado; como cada archivo
+    contiene un solo día de un dispositivo, reescribirlo es barato y deja un
+    único archivo ordenado por fecha_insercion por día. Las filas que el día
+    ya tenía (misma fecha y fecha_insercion) no se repiten, así volver a
+    agregar un paquete no cambia el archivo.
+
+    Returns:
+        int: Filas totales del día
+    """
+    categoricas = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if os.path.exists(ruta_existente):
+        df = tipar_columnas(pd.concat([pd.read_parquet(ruta_existente), df], ignore_index=True))
+    # Al concatenar categorías distintas pandas vuelve a texto; se mantienen como categoría
+    for columna in categoricas:
+        df[columna] = df[columna].astype('category')
+    orden = [c for c in ('fecha_insercion', 'fecha') if c in df.columns]
+    if orden:
+        df = df.sort_values(orden, kind='stable')
+    # El archivo es de un solo dispositivo: fecha y fecha_insercion identifican la medición
+    df = df.drop_duplicates(subset=orden if len(orden) == len(COLUMNAS_FECHA) else None).reset_index(drop=True)
+    escribir_parquet(df, ruta_salida)
+    return len(df)
+
+
+def leer_archivo_datos(ruta):
+    """Lee un archivo de datos del colector (CSV o Parquet) como DataFrame"""
+    if ruta.endswith('.parquet'):
+        if not PARQUET_DISPONIBLE:
+            raise ImportError("pyarrow no está instalado: no se pueden leer archivos Parquet")
+        return pd.read_parquet(ruta)
+    return pd.read_csv(ruta)
+
+
+def archivos_datos(carpeta):
+    """Archivos de datos (CSV y Parquet) de una carpeta de fecha, ordenados por nombre"""
+    archivos = []
+    for extension in EXTENSIONES_DATOS:
+        archivos.extend(glob.glob(os.path.join(carpeta, f"*{extension}")))
+    return sorted(archivos)
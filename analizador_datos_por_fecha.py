@@ -8,6 +8,7 @@ import json
 import numpy as np
 from matplotlib.patches import Rectangle
 import warnings
+from almacen_parquet import archivos_datos, leer_archivo_datos
 warnings.filterwarnings('ignore')
 
 # Configurar matplotlib para mejor visualización
@@ -53,8 +54,8 @@ class AnalizadorDatosPorFecha:
                         if os.path.isdir(fecha_folder):
                             fecha_nombre = os.path.basename(fecha_folder)
                             
-                            # Buscar archivos CSV en la carpeta de fecha
-                            archivos_csv = glob.glob(os.path.join(fecha_folder, "*.csv"))
+                            # Buscar archivos de datos (CSV o Parquet) en la carpeta de fecha
+                            archivos_csv = archivos_datos(fecha_folder)
                             estructura[proyecto_id][dispositivo_nombre][fecha_nombre] = archivos_csv
         
         return estructura
@@ -73,7 +74,7 @@ class AnalizadorDatosPorFecha:
             
             for archivo in archivos:
                 try:
-                    df = pd.read_csv(archivo)
+                    df = leer_archivo_datos(archivo)
                     registros_fecha += len(df)
                     todos_los_datos.append(df)
                     
@@ -225,7 +226,7 @@ class AnalizadorDatosPorFecha:
                 for archivos in fechas_datos.values():
                     for archivo in archivos:
                         try:
-                            df = pd.read_csv(archivo)
+                            df = leer_archivo_datos(archivo)
                             total_registros += len(df)
                         except:
                             continue
@@ -0,0 +1,222 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import urllib.request
+
+from cache_esquemas import CacheEsquemas
+from colector_async import ColectorAsync
+from controlador_paquetes import ControladorPaquetes
+from estado_colector import EstadoColector
+from limitador_tasa import LimitadorTasa
+from metricas_colector import MetricasColector, FASES
+from reintentos import PoliticaReintentos
+
+ENDPOINT_DEFECTO = 'listarUltimasMediciones'
+
+
+class BenchmarkColector:
+    """
+    Prueba de carga del colector contra la API simulada (mock_api_sensores.py).
+
+    Levanta la API simulada en un subproceso (o usa una ya corriendo con
+    url), genera un config.json con dispositivos sintéticos en una carpeta
+    temporal y ejecuta ColectorAsync con su propio estado, sin tocar los
+    datos ni el estado reales. Cada corrida informa filas/s, peticiones/s y
+    la latencia p50/p99 medida por el servidor; desde la segunda corrida se
+    mide la descarga incremental sobre el estado que dejó la anterior.
+    """
+
+    def __init__(self, dispositivos=10, corridas=1, puerto=8185, url=None, args_servidor=None,
+                 opciones_colector=None, rps=1000.0, verbose=False, conservar=False):
+        self.dispositivos = dispositivos
+        self.corridas = corridas
+        self.puerto = puerto
+        self.url = url or f"http://127.0.0.1:{puerto}"
+        self.externo = url is not None
+        self.args_servidor = args_servidor or []
+        self.opciones_colector = opciones_colector or {}
+        self.rps = rps
+        self.verbose = verbose
+        self.conservar = conservar
+        self.carpeta = None
+        self._servidor = None
+
+    def _consultar_estadisticas(self, reiniciar=False):
+        url = f"{self.url}/_estadisticas" + ('?reiniciar=1' if reiniciar else '')
+        with urllib.request.urlopen(url, timeout=10) as respuesta:
+            return json.loads(respuesta.read())
+
+    def iniciar_servidor(self):
+        """Lanzar la API simulada y esperar a que responda"""
+        if self.externo:
+            return
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_api_sensores.py')
+        self._servidor = subprocess.Popen(
+            [sys.executable, script, '--puerto', str(self.puerto)] + self.args_servidor,
+            stdout=subprocess.DEVNULL)
+        limite = time.monotonic() + 15
+        while True:
+            try:
+                self._consultar_estadisticas()
+                return
+            except OSError:
+                if self._servidor.poll() is not None or time.monotonic() > limite:
+                    raise RuntimeError("La API simulada no arrancó")
+                time.sleep(0.1)
+
+    def detener_servidor(self):
+        if self._servidor is not None:
+            self._servidor.terminate()
+            self._servidor.wait(timeout=10)
+            self._servidor = None
+
+    def preparar_config(self):
+        """Crear la carpeta temporal con un config.json de dispositivos sintéticos"""
+        self.carpeta = tempfile.mkdtemp(prefix='benchmark_colector_')
+        dispositivos = [{
+            'proyecto': 1,
+            'codigo_interno': f"SIM-{i + 1:03d}",
+            'api_url': f"{self.url}/{ENDPOINT_DEFECTO}",
+        } for i in range(self.dispositivos)]
+        config_path = os.path.join(self.carpeta, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(dispositivos, f, indent=4)
+        return config_path
+
+    def _corrida(self, numero, config_path, estado, controlador):
+        colector = ColectorAsync(
+            config_path, os.path.join(self.carpeta, 'datos'), estado=estado, controlador=controlador,
+            limitador=LimitadorTasa(rps=self.rps, max_en_vuelo=self.opciones_colector.get('max_por_endpoint', 4)),
+            politica_reintentos=PoliticaReintentos(base=0.1, maximo=2.0),
+            esquemas=CacheEsquemas(os.path.join(self.carpeta, 'esquemas_endpoints.json')),
+            metricas=MetricasColector(self.carpeta), **self.opciones_colector)
+        self._consultar_estadisticas(reiniciar=True)
+        salida = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        inicio = time.perf_counter()
+        with salida:
+            archivos = colector.ejecutar()
+        duracion = time.perf_counter() - inicio
+        servidor = self._consultar_estadisticas()
+
+        filas = sum(d['registros_ultima'] or 0 for d in estado.resumen())
+        errores = sum(v for k, v in servidor['por_estado'].items() if k != '200')
+        contadores = colector.metricas.dispositivos.values()
+        tiempos = {fase: round(sum(d['tiempo'][fase] for d in contadores), 3) for fase in FASES}
+        bytes_recibidos = sum(d['bytes_recibidos'] for d in contadores)
+        paquetes = sum(d['paquetes_escritos'] for d in contadores)
+        return {
+            'corrida': numero,
+            'segundos': round(duracion, 3),
+            'archivos': len(archivos),
+            'filas': filas,
+            'filas_por_segundo': round(filas / duracion, 1) if duracion else None,
+            'peticiones': servidor['peticiones'],
+            'peticiones_por_segundo': round(servidor['peticiones'] / duracion, 1) if duracion else None,
+            'errores': errores,
+            'por_estado': servidor['por_estado'],
+            'reintentos': sum(colector.reintentos.values()),
+            'duplicados': sum(colector.duplicados.values()),
+            'latencia_ms': servidor['latencia_ms'],
+            'tiempo_segundos': tiempos,
+            'formato_api': colector.formato_api,
+            'bytes_recibidos': bytes_recibidos,
+            'bytes_por_fila': round(bytes_recibidos / filas, 1) if filas else None,
+            'paquetes': paquetes,
+            'kb_por_paquete': round(bytes_recibidos / paquetes / 1024, 1) if paquetes else None,
+            'parseo_ms_por_paquete': round(tiempos['parseo'] * 1000 / paquetes, 2) if paquetes else None,
+        }
+
+    @staticmethod
+    def imprimir_corrida(resultado):
+        latencia = resultado['latencia_ms']
+        p50 = f"{latencia['p50']:.1f}" if latencia['p50'] is not None else '-'
+        p99 = f"{latencia['p99']:.1f}" if latencia['p99'] is not None else '-'
+        print(f"🏁 Corrida {resultado['corrida']}: {resultado['filas']:,} filas en {resultado['segundos']:.2f}s "
+              f"→ {resultado['filas_por_segundo']:,.0f} filas/s, {resultado['peticiones_por_segundo']:,.1f} peticiones/s")
+        print(f"   ⏱️  Latencia p50 {p50} ms, p99 {p99} ms | {resultado['peticiones']} peticiones, "
+              f"{resultado['errores']} errores {resultado['por_estado']}, {resultado['reintentos']} reintentos, "
+              f"{resultado['duplicados']} duplicados")
+        tiempos = resultado['tiempo_segundos']
+        print(f"   🧮 Tiempo acumulado: red {tiempos['red']:.2f}s, parseo {tiempos['parseo']:.2f}s, "
+              f"disco {tiempos['disco']:.2f}s")
+        if resultado['paquetes']:
+            print(f"   📦 Formato {resultado['formato_api']}: {resultado['bytes_recibidos'] / 1048576:.2f} MB en red, "
+                  f"{resultado['bytes_por_fila']} bytes/fila, {resultado['kb_por_paquete']} KB y "
+                  f"{resultado['parseo_ms_por_paquete']} ms de parseo por paquete")
+
+    def ejecutar(self):
+        """
+        Ejecuta todas las corridas.
+
+        Returns:
+            list: Resultado de cada corrida (diccionarios)
+        """
+        print(f"🧪 Benchmark del colector: {self.dispositivos} dispositivos, {self.corridas} corridas contra {self.url}")
+        resultados = []
+        self.iniciar_servidor()
+        try:
+            config_path = self.preparar_config()
+            estado = EstadoColector(os.path.join(self.carpeta, 'estado_colector.db'))
+            controlador = ControladorPaquetes(os.path.join(self.carpeta, 'limites_endpoints.json'))
+            try:
+                for numero in range(1, self.corridas + 1):
+                    resultado = self._corrida(numero, config_path, estado, controlador)
+                    self.imprimir_corrida(resultado)
+                    resultados.append(resultado)
+            finally:
+                estado.cerrar()
+        finally:
+            self.detener_servidor()
+            if self.carpeta and not self.conservar:
+                shutil.rmtree(self.carpeta, ignore_errors=True)
+            elif self.carpeta:
+                print(f"📁 Datos de la prueba en {self.carpeta}")
+        return resultados
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark del colector contra la API simulada. Los argumentos no reconocidos "
+                    "(--latencia, --prob-524, --dias, ...) se pasan a mock_api_sensores.py")
+    parser.add_argument('--dispositivos', type=int, default=10)
+    parser.add_argument('--corridas', type=int, default=1,
+                        help="Corridas sobre el mismo estado (la segunda en adelante es incremental)")
+    parser.add_argument('--puerto', type=int, default=8185, help="Puerto para la API simulada")
+    parser.add_argument('--url', default=None, help="Usar una API simulada ya corriendo en esta URL")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--por-endpoint', type=int, default=4)
+    parser.add_argument('--paginacion', choices=['cursor', 'offset'], default='cursor')
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--formato-api', choices=['csv', 'ndjson', 'arrow'], default='csv',
+                        help="Formato pedido a la API (vuelve a CSV si no lo ofrece)")
+    parser.add_argument('--sin-backfill', action='store_true')
+    parser.add_argument('--rps', type=float, default=1000.0, help="Peticiones por segundo del limitador")
+    parser.add_argument('--salida', default=None, help="Guardar los resultados en este JSON")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar la salida del colector")
+    parser.add_argument('--conservar', action='store_true', help="No borrar la carpeta temporal")
+    args, args_servidor = parser.parse_known_args()
+
+    benchmark = BenchmarkColector(
+        dispositivos=args.dispositivos, corridas=args.corridas, puerto=args.puerto, url=args.url,
+        args_servidor=args_servidor, rps=args.rps, verbose=args.verbose, conservar=args.conservar,
+        opciones_colector={
+            'max_concurrencia': args.concurrencia,
+            'max_por_endpoint': args.por_endpoint,
+            'paginacion': args.paginacion,
+            'formato': args.formato,
+            'formato_api': args.formato_api,
+            'backfill': not args.sin_backfill,
+        })
+    resultados = benchmark.ejecutar()
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=4, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.salida}")
@@ -0,0 +1,354 @@
+import os
+import re
+import json
+import argparse
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from almacen_parquet import COLUMNAS_FECHA, COLUMNAS_TEXTO
+
+# Tipo aprendido de cada columna y el dtype con que se lee en pandas
+TIPOS_PANDAS = {
+    'entero': 'Int64',
+    'decimal': 'float64',
+    'categoria': 'category',
+    'texto': 'string',
+}
+FORMATOS_FECHA = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+PATRON_FECHA = re.compile(r'^\d{4}-\d{2}-\d{2}')
+PATRON_ENTERO = re.compile(r'^[+-]?\d+$')
+
+
+def clave_esquema(api_url, codigo_interno):
+    """Clave del esquema de un dispositivo: dispositivos del mismo endpoint pueden traer otras columnas"""
+    return f"{api_url}#{codigo_interno}"
+
+
+def inferir_tipo(nombre, serie, max_categorias=50):
+    """
+    Tipo de una columna leída como texto.
+
+    Returns:
+        tuple: (tipo, formato de fecha o None, valores distintos si es
+                categoría o None); tipo es None si la columna vino vacía
+    """
+    valores = serie.dropna()
+    if valores.empty:
+        return None, None, None
+    if nombre in COLUMNAS_TEXTO:
+        return 'texto', None, None
+    numerica = pd.to_numeric(valores, errors='coerce')
+    if numerica.notna().all():
+        if valores.str.match(PATRON_ENTERO).all():
+            return 'entero', None, None
+        return 'decimal', None, None
+    if nombre in COLUMNAS_FECHA or valores.str.match(PATRON_FECHA).all():
+        for formato in FORMATOS_FECHA:
+            if pd.to_datetime(valores, format=formato, errors='coerce').notna().all():
+                return 'fecha', formato, None
+        if pd.to_datetime(valores, format='ISO8601', errors='coerce').notna().all():
+            return 'fecha', 'ISO8601', None
+    distintos = valores.unique()
+    if len(distintos) <= max_categorias:
+        return 'categoria', None, sorted(distintos.tolist())
+    return 'texto', None, None
+
+
+def combinar_tipos(actual, nuevo):
+    """Tipo que admite los valores de ambos (entero+decimal → decimal, lo demás → texto)"""
+    if actual is None or actual == nuevo:
+        return nuevo
+    if nuevo is None:
+        return actual
+    if {actual, nuevo} == {'entero', 'decimal'}:
+        return 'decimal'
+    return 'texto'
+
+
+class CacheEsquemas:
+    """
+    Esquema de columnas y tipos aprendido por dispositivo (clave_esquema:
+    endpoint y codigo_interno) o cualquier otra clave.
+
+    Los primeros paquetes de cada clave se leen como texto y de ellos se
+    aprenden los nombres de columna y su tipo: fecha (con su formato),
+    entero, decimal, categoría (texto con pocos valores distintos) o texto.
+    Con paquetes_aprendizaje paquetes vistos el esquema queda fijo y los
+    siguientes se leen con dtype y parse_dates explícitos, sin inferencia,
+    así todos los paquetes de un endpoint salen con los mismos dtypes.
+
+    Lo que no calza con un esquema fijo (columnas nuevas o faltantes,
+    valores que no son del tipo aprendido) se informa como deriva: se
+    muestra una vez por proceso y se acumula en el archivo con su cantidad
+    y fechas. La columna afectada queda como texto en ese paquete en lugar
+    de forzar los valores a NaN. Los esquemas se guardan en un archivo
+    JSON para reutilizarlos en la siguiente ejecución.
+
+    Los tipos se aplican donde se parsea un paquete (leer_csv, que usa el
+    almacén Parquet). En formato csv el colector copia los paquetes sin
+    parsearlos y solo llama a revisar_columnas: ahí el caché informa la
+    deriva de columnas, pero no tipa ni valida los valores.
+    """
+
+    def __init__(self, archivo_estado='esquemas_endpoints.json', paquetes_aprendizaje=3, max_categorias=50):
+        self.archivo_estado = archivo_estado
+        self.paquetes_aprendizaje = max(1, int(paquetes_aprendizaje))
+        self.max_categorias = max_categorias
+        self._lock = threading.Lock()
+        self._informadas = set()
+        self.esquemas = self.cargar()
+
+    def cargar(self):
+        """Cargar los esquemas aprendidos en ejecuciones anteriores"""
+        if not self.archivo_estado or not os.path.exists(self.archivo_estado):
+            return {}
+        try:
+            with open(self.archivo_estado, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  No se pudieron leer los esquemas de endpoints ({e}), se volverán a aprender")
+            return {}
+
+    def guardar(self):
+        """Guardar los esquemas y derivas para la próxima ejecución"""
+        if not self.archivo_estado:
+            return
+        with self._lock:
+            contenido = json.dumps(self.esquemas, indent=4, ensure_ascii=False)
+        ruta_tmp = self.archivo_estado + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(ruta_tmp, self.archivo_estado)
+
+    def _esquema(self, clave):
+        if clave not in self.esquemas:
+            self.esquemas[clave] = {'columnas': {}, 'paquetes': 0, 'fijo': False, 'derivas': {}}
+        return self.esquemas[clave]
+
+    def _registrar_deriva(self, clave, esquema, tipo, columna, detalle):
+        ahora = datetime.now().isoformat(timespec='seconds')
+        id_deriva = f"{tipo}:{columna}"
+        deriva = esquema['derivas'].setdefault(id_deriva, {
+            'tipo': tipo, 'columna': columna, 'detalle': detalle, 'veces': 0, 'primera': ahora})
+        deriva['veces'] += 1
+        deriva['ultima'] = ahora
+        deriva['detalle'] = detalle
+        if (clave, id_deriva) not in self._informadas:
+            self._informadas.add((clave, id_deriva))
+            print(f"⚠️  Deriva de esquema en {clave}: {detalle}")
+
+    def revisar_columnas(self, clave, columnas):
+        """
+        Compara la cabecera de un paquete con el esquema de la clave.
+
+        Mientras se aprende, las columnas nuevas se agregan al esquema; con el
+        esquema fijo se informan como deriva, igual que las faltantes. Cada
+        llamada cuenta como un paquete visto.
+
+        Returns:
+            bool: True si el esquema ya estaba fijo
+        """
+        if not columnas:
+            return False
+        with self._lock:
+            return self._revisar_columnas(clave, list(columnas))
+
+    def _revisar_columnas(self, clave, columnas, fijar=True):
+        esquema = self._esquema(clave)
+        fijo = esquema['fijo']
+        conocidas = esquema['columnas']
+        for columna in columnas:
+            if columna in conocidas:
+                continue
+            if fijo:
+                self._registrar_deriva(clave, esquema, 'columna_nueva', columna,
+                                       f"columna nueva '{columna}' que no está en el esquema")
+            else:
+                conocidas[columna] = {'tipo': None}
+        if fijo:
+            for columna in conocidas:
+                if columna not in columnas:
+                    self._registrar_deriva(clave, esquema, 'columna_faltante', columna,
+                                           f"falta la columna '{columna}' del esquema")
+        esquema['paquetes'] += 1
+        if fijar:
+            self._fijar(esquema)
+        return fijo
+
+    def _fijar(self, esquema):
+        """Dejar fijo el esquema cuando ya se vieron paquetes_aprendizaje paquetes"""
+        if esquema['fijo'] or esquema['paquetes'] < self.paquetes_aprendizaje:
+            return
+        esquema['fijo'] = True
+        esquema['actualizado'] = datetime.now().isoformat(timespec='seconds')
+        for columna in esquema['columnas'].values():
+            columna.pop('distintos', None)
+
+    def _aprender(self, esquema, df):
+        """
+        Combina los tipos de un paquete leído como texto con los ya aprendidos.
+
+        Con el esquema fijo solo se aprenden las columnas que hasta ahora
+        vinieron vacías (o cuya cabecera se vio sin leer el paquete).
+        """
+        for nombre in df.columns:
+            columna = esquema['columnas'].get(nombre)
+            if columna is None or (esquema['fijo'] and columna['tipo'] is not None):
+                continue
+            tipo, formato, distintos = inferir_tipo(nombre, df[nombre], self.max_categorias)
+            if tipo is None:
+                continue
+            tipo_nuevo = combinar_tipos(columna['tipo'], tipo)
+            if tipo_nuevo == 'fecha' and columna.get('formato') not in (None, formato):
+                formato = 'ISO8601'
+            if tipo_nuevo == 'categoria':
+                union = sorted(set(columna.get('distintos', [])) | set(distintos))
+                if len(union) > self.max_categorias:
+                    tipo_nuevo = 'texto'
+                else:
+                    columna['distintos'] = union
+            if tipo_nuevo != 'categoria' or esquema['fijo']:
+                columna.pop('distintos', None)
+            if tipo_nuevo == 'fecha':
+                columna['formato'] = formato
+            else:
+                columna.pop('formato', None)
+            columna['tipo'] = tipo_nuevo
+
+    def _aplicar(self, clave, esquema, df, informar):
+        """Convierte un DataFrame de texto al esquema, dejando como texto las columnas que no calzan"""
+        for nombre in df.columns:
+            columna = esquema['columnas'].get(nombre)
+            tipo = columna['tipo'] if columna else None
+            serie = df[nombre]
+            if tipo in ('entero', 'decimal'):
+                convertida = pd.to_numeric(serie, errors='coerce')
+                malos = serie.notna() & convertida.isna()
+                if tipo == 'entero':
+                    malos |= serie.notna() & ~serie.fillna('0').str.match(PATRON_ENTERO)
+            elif tipo == 'fecha':
+                convertida = pd.to_datetime(serie, format=columna['formato'], errors='coerce')
+                malos = serie.notna() & convertida.isna()
+            elif tipo == 'categoria':
+                df[nombre] = serie.astype('category')
+                continue
+            else:
+                df[nombre] = serie.astype('string')
+                continue
+            if malos.any():
+                if informar:
+                    self._registrar_deriva(clave, esquema, 'tipo', nombre,
+                                           f"'{nombre}' es {tipo} y llegó '{serie[malos].iloc[0]}'")
+                df[nombre] = serie.astype('string')
+            elif tipo == 'entero':
+                df[nombre] = convertida.astype('Int64')
+            elif tipo == 'decimal':
+                df[nombre] = convertida.astype('float64')
+            else:
+                df[nombre] = convertida
+        return df
+
+    def leer_csv(self, ruta, clave):
+        """
+        Lee un paquete CSV con el esquema de la clave.
+
+        Mientras el esquema se aprende el paquete se lee como texto y se
+        convierte con lo aprendido hasta ahí; con el esquema fijo se lee con
+        dtype y parse_dates explícitos y solo si eso falla se vuelve a leer
+        como texto para ubicar e informar las columnas que no calzan.
+
+        Returns:
+            DataFrame: Paquete con columnas tipadas
+        """
+        columnas = list(pd.read_csv(ruta, nrows=0).columns)
+        with self._lock:
+            fijo = self._revisar_columnas(clave, columnas, fijar=False)
+            esquema = self.esquemas[clave]
+
+        if not fijo:
+            df = pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=[''])
+            with self._lock:
+                self._aprender(esquema, df)
+                self._fijar(esquema)
+                return self._aplicar(clave, esquema, df, informar=False)
+
+        dtype = {}
+        formatos_fecha = {}
+        with self._lock:
+            # Columnas que hasta ahora vinieron vacías: se leen como texto y se aprenden si traen datos
+            pendientes = [c for c in columnas if esquema['columnas'].get(c, {}).get('tipo', '') is None]
+            for nombre in columnas:
+                columna = esquema['columnas'].get(nombre, {'tipo': None})
+                if columna['tipo'] == 'fecha':
+                    formatos_fecha[nombre] = columna['formato']
+                else:
+                    dtype[nombre] = TIPOS_PANDAS.get(columna['tipo'], 'string')
+        try:
+            df = pd.read_csv(ruta, dtype=dtype, parse_dates=list(formatos_fecha), date_format=formatos_fecha,
+                             keep_default_na=False, na_values=[''])
+        except (ValueError, TypeError):
+            df = None
+        # read_csv deja como texto, sin avisar, las fechas que no calzan con el formato
+        if df is None or any(not pd.api.types.is_datetime64_any_dtype(df[c]) for c in formatos_fecha):
+            df = pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=[''])
+            with self._lock:
+                self._aprender(esquema, df[pendientes])
+                return self._aplicar(clave, esquema, df, informar=True)
+        pendientes = [c for c in pendientes if df[c].notna().any()]
+        if pendientes:
+            with self._lock:
+                self._aprender(esquema, df[pendientes])
+                df[pendientes] = self._aplicar(clave, esquema, df[pendientes].copy(), informar=True)
+        return df
+
+    def olvidar(self, clave):
+        """
+        Descartar el esquema de una clave para volver a aprenderlo (tras un
+        cambio conocido de la API); con un endpoint se descartan los de
+        todos sus dispositivos.
+
+        Returns:
+            int: Esquemas descartados
+        """
+        with self._lock:
+            claves = [c for c in self.esquemas if c == clave or c.startswith(clave + '#')]
+            for c in claves:
+                del self.esquemas[c]
+            return len(claves)
+
+    def imprimir(self):
+        """Mostrar los esquemas aprendidos y sus derivas"""
+        if not self.esquemas:
+            print("📭 No hay esquemas aprendidos")
+            return
+        for clave, esquema in sorted(self.esquemas.items()):
+            estado = 'fijo' if esquema['fijo'] else f"aprendiendo ({esquema['paquetes']}/{self.paquetes_aprendizaje})"
+            print(f"\n🧬 {clave}: {len(esquema['columnas'])} columnas, {estado}")
+            for nombre, columna in esquema['columnas'].items():
+                detalle = f" ({columna['formato']})" if columna.get('formato') else ''
+                print(f"   • {nombre}: {columna['tipo'] or '?'}{detalle}")
+            for deriva in esquema['derivas'].values():
+                print(f"   ⚠️  {deriva['detalle']} — {deriva['veces']} veces, última {deriva.get('ultima')}")
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esquemas de columnas aprendidos por dispositivo y derivas detectadas")
+    parser.add_argument('--archivo', default='esquemas_endpoints.json')
+    parser.add_argument('--olvidar', metavar='CLAVE', default=None,
+                        help="Descartar el esquema de una clave (endpoint#CODIGO) o de todos los "
+                             "dispositivos de un endpoint para volver a aprenderlo")
+    args = parser.parse_args()
+
+    cache = CacheEsquemas(args.archivo)
+    if args.olvidar:
+        descartados = cache.olvidar(args.olvidar)
+        if descartados:
+            cache.guardar()
+            print(f"🗑️  {descartados} esquemas de {args.olvidar} descartados")
+        else:
+            print(f"❌ No hay esquema para {args.olvidar}")
+    else:
+        cache.imprimir()
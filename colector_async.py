@@ -0,0 +1,1626 @@
+import asyncio
+import os
+import json
+import glob
+import time
+import functools
+import csv
+import shutil
+import threading
+from io import BufferedReader, StringIO
+from urllib.parse import quote
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from controlador_paquetes import ControladorPaquetes
+from estado_colector import EstadoColector
+from limitador_tasa import LimitadorTasa, segundos_retry_after
+from diario_descargas import DiarioDescargas
+from indice_dedup import IndiceDedup
+from almacen_parquet import PARQUET_DISPONIBLE, particionar_paquete, anexar_dia
+from cache_esquemas import CacheEsquemas, clave_esquema
+from reintentos import PoliticaReintentos, Circuito, CircuitoAbierto, ReintentosAgotados
+from metricas_colector import MetricasColector
+from formatos_api import (ARROW_DISPONIBLE, FORMATOS_API, LectorBloques, abrir_arrow, bytes_en_red,
+                          cabecera_accept, escribir_csv_arrow, filas_ndjson, formato_respuesta, pa, pc,
+                          texto_columna)
+
+API_URL_DEFECTO = "https://api-sensores.cmasccp.cl/listarUltimasMediciones"
+
+# Parámetros de paginación keyset: filas con (fecha_insercion, desempate) mayor al cursor
+PARAM_CURSOR_FECHA = 'cursor_fecha_insercion'
+PARAM_CURSOR_DESEMPATE = 'cursor_desempate'
+COLUMNA_DESEMPATE_DEFECTO = 'id'
+
+# Inicio de la historia para dispositivos sin datos previos
+FECHA_INICIO_HISTORIA = '2005-10-23'
+
+
+class FinVentanaIgnorado(Exception):
+    """El endpoint devolvió filas fuera de la ventana pedida (no respeta fecha_inicio/fecha_fin)"""
+
+
+def obtener_ultima_fecha_csv(codigo_interno, datos_folder):
+    """
+    Obtiene la última fecha de medición desde los archivos CSV existentes.
+
+    Args:
+        codigo_interno (str): Código interno del dispositivo (ej: AIRE-03)
+        datos_folder (str): Carpeta donde están los archivos CSV
+
+    Returns:
+        str: Última fecha en formato YYYY-MM-DD o None si no hay datos
+    """
+    try:
+        # Buscar archivos CSV que contengan el código interno
+        patron = os.path.join(datos_folder, f"{codigo_interno}*.csv")
+        archivos_csv = glob.glob(patron)
+
+        if not archivos_csv:
+            print(f"🔍 No se encontraron archivos CSV para {codigo_interno}")
+            return None
+
+        ultima_fecha = None
+
+        for archivo in archivos_csv:
+            try:
+                df = pd.read_csv(archivo)
+
+                # Buscar columnas que puedan contener fechas
+                columnas_fecha = [col for col in df.columns if any(palabra in col.lower()
+                                for palabra in ['fecha_insercion'])]
+
+                if columnas_fecha:
+                    # Usar la primera columna de fecha encontrada
+                    col_fecha = columnas_fecha[0]
+                    df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce')
+                    fecha_max = df[col_fecha].max()
+
+                    if pd.notna(fecha_max):
+                        fecha_str = fecha_max.strftime('%Y-%m-%d')
+                        if ultima_fecha is None or fecha_str > ultima_fecha:
+                            ultima_fecha = fecha_str
+            except Exception as e:
+                print(f"⚠️  Error leyendo {archivo}: {e}")
+                continue
+
+        return ultima_fecha
+
+    except Exception as e:
+        print(f"❌ Error obteniendo última fecha para {codigo_interno}: {e}")
+        return None
+
+
+def clave_cursor(cursor):
+    """Clave comparable de un cursor (fecha_insercion, desempate)"""
+    fecha, desempate = cursor
+    try:
+        return fecha, 0, float(desempate), ''
+    except ValueError:
+        return fecha, 1, 0.0, desempate
+
+
+def _campos_csv(linea):
+    """Separa una línea CSV; solo usa el parser completo si hay comillas"""
+    if '"' in linea:
+        return next(csv.reader([linea]))
+    return linea.split(',')
+
+
+def _resumidor_csv(columna_desempate=COLUMNA_DESEMPATE_DEFECTO, indice=None, cabecera=None):
+    """
+    Acumulador del resumen de un CSV que se recorre línea a línea.
+
+    Si se entrega un IndiceDedup, la función devuelve False para las filas
+    ya vistas (que no deben escribirse) y el resumen acumula en 'claves' las
+    claves nuevas del paquete. Con cabecera las filas ya separadas en campos
+    se pueden entregar directamente a la segunda función.
+
+    Returns:
+        tuple: (diccionario de resumen, función que procesa una línea en bytes,
+                función que procesa una fila ya separada en campos)
+    """
+    resumen = {'bytes': 0, 'filas': 0, 'fecha_min': None, 'fecha_max': None,
+               'clave_primera': None, 'clave_maxima': None, 'duplicados': 0, 'claves': [], 'columnas': None}
+    estado = {'cabecera': None, 'i_fecha': None, 'i_desempate': None, 'i_medicion': None}
+    vistas = set()
+
+    def fijar_cabecera(columnas):
+        estado['cabecera'] = columnas
+        resumen['columnas'] = columnas
+        if 'fecha_insercion' in columnas:
+            estado['i_fecha'] = columnas.index('fecha_insercion')
+        if columna_desempate in columnas:
+            estado['i_desempate'] = columnas.index(columna_desempate)
+        if 'fecha' in columnas:
+            estado['i_medicion'] = columnas.index('fecha')
+
+    def procesar_campos(campos):
+        resumen['filas'] += 1
+        i_fecha = estado['i_fecha']
+        if i_fecha is None or len(campos) <= i_fecha:
+            return
+        fecha = campos[i_fecha]
+        if fecha:
+            if resumen['fecha_min'] is None or fecha < resumen['fecha_min']:
+                resumen['fecha_min'] = fecha
+            if resumen['fecha_max'] is None or fecha > resumen['fecha_max']:
+                resumen['fecha_max'] = fecha
+
+        i_desempate = estado['i_desempate']
+        if i_desempate is not None and len(campos) > i_desempate:
+            clave = (fecha, campos[i_desempate])
+            if resumen['clave_primera'] is None:
+                resumen['clave_primera'] = clave
+            if resumen['clave_maxima'] is None or clave_cursor(clave) > clave_cursor(resumen['clave_maxima']):
+                resumen['clave_maxima'] = clave
+
+        i_medicion = estado['i_medicion']
+        if indice is not None and i_medicion is not None and len(campos) > i_medicion:
+            clave = indice.clave(campos[i_medicion], fecha)
+            if clave in vistas or indice.es_duplicado(clave):
+                resumen['duplicados'] += 1
+                return False
+            vistas.add(clave)
+            resumen['claves'].append(clave)
+
+    def procesar_linea(linea):
+        texto = linea.decode('utf-8', errors='replace').strip()
+        if not texto:
+            return
+        if estado['cabecera'] is None:
+            fijar_cabecera([c.strip().lstrip('\ufeff') for c in _campos_csv(texto)])
+            return
+        if estado['i_fecha'] is None:
+            resumen['filas'] += 1
+            return
+        return procesar_campos(_campos_csv(texto))
+
+    if cabecera is not None:
+        fijar_cabecera(list(cabecera))
+    return resumen, procesar_linea, procesar_campos
+
+
+def volcar_respuesta_csv(response, ruta_destino, columna_desempate=COLUMNA_DESEMPATE_DEFECTO,
+                         tamano_bloque=64 * 1024, indice=None):
+    """
+    Escribe el cuerpo CSV de una respuesta directamente a disco.
+
+    Lee la respuesta por bloques y, en la misma pasada, cuenta las filas y
+    calcula el rango de fecha_insercion y las claves de cursor, sin construir
+    el texto completo ni un DataFrame. Con un IndiceDedup las filas ya
+    descargadas (o recibidas por push) se descartan antes de llegar a disco.
+
+    Returns:
+        dict: bytes (escritos), bytes_recibidos, filas (recibidas), duplicados
+              (descartados), fecha_min, fecha_max, clave_primera y
+              clave_maxima (las claves son None si falta la columna de
+              desempate), las claves de dedup nuevas y los segundos gastados
+              en 'red', 'parseo' y 'disco'
+    """
+    if indice is not None:
+        indice.refrescar()
+    resumen, procesar_linea, _ = _resumidor_csv(columna_desempate, indice)
+    resumen['bytes_recibidos'] = 0
+    tiempos = resumen['tiempos'] = {'red': 0.0, 'parseo': 0.0, 'disco': 0.0}
+
+    def escribir(f, lineas):
+        inicio = time.perf_counter()
+        salida = [linea for linea in lineas if procesar_linea(linea) is not False]
+        parseado = time.perf_counter()
+        tiempos['parseo'] += parseado - inicio
+        if salida:
+            datos = b'\n'.join(salida) + b'\n'
+            f.write(datos)
+            resumen['bytes'] += len(datos)
+        tiempos['disco'] += time.perf_counter() - parseado
+
+    pendiente = b''
+    bloques = response.iter_content(chunk_size=tamano_bloque)
+    with open(ruta_destino, 'wb') as f:
+        while True:
+            inicio = time.perf_counter()
+            bloque = next(bloques, None)
+            tiempos['red'] += time.perf_counter() - inicio
+            if bloque is None:
+                break
+            if not bloque:
+                continue
+            resumen['bytes_recibidos'] += len(bloque)
+            lineas = (pendiente + bloque).split(b'\n')
+            pendiente = lineas.pop()
+            if indice is None:
+                inicio = time.perf_counter()
+                f.write(bloque)
+                escrito = time.perf_counter()
+                resumen['bytes'] += len(bloque)
+                for linea in lineas:
+                    procesar_linea(linea)
+                tiempos['disco'] += escrito - inicio
+                tiempos['parseo'] += time.perf_counter() - escrito
+            else:
+                escribir(f, lineas)
+        if indice is None:
+            procesar_linea(pendiente)
+        elif pendiente.strip():
+            escribir(f, [pendiente])
+        inicio = time.perf_counter()
+        f.flush()
+        os.fsync(f.fileno())
+        tiempos['disco'] += time.perf_counter() - inicio
+
+    if indice is not None:
+        indice.reservar(resumen['claves'])
+    return resumen
+
+
+def _linea_csv(campos):
+    """Une campos de texto en una línea CSV, con comillas solo donde hacen falta"""
+    return ','.join('"' + c.replace('"', '""') + '"' if (',' in c or '"' in c or '\n' in c or '\r' in c) else c
+                    for c in campos)
+
+
+def _volcar_ndjson(fuente, f, columna_desempate, indice, tiempos):
+    """Procesa un cuerpo NDJSON línea a línea y escribe sus filas como CSV"""
+    resumen = procesar_campos = None
+    salida = []
+
+    def escribir():
+        inicio = time.perf_counter()
+        f.write(('\n'.join(salida) + '\n').encode('utf-8'))
+        tiempos['disco'] += time.perf_counter() - inicio
+        salida.clear()
+
+    for cabecera, fila in filas_ndjson(fuente):
+        if resumen is None:
+            resumen, _, procesar_campos = _resumidor_csv(columna_desempate, indice, cabecera)
+            salida.append(_linea_csv(cabecera))
+        if procesar_campos(fila) is not False:
+            salida.append(_linea_csv(fila))
+        if len(salida) >= 1000:
+            escribir()
+    if salida:
+        escribir()
+    return resumen or _resumidor_csv(columna_desempate, indice, [])[0]
+
+
+def _resumir_lote_arrow(lote, resumen, columna_desempate, indice, vistas):
+    """
+    Acumula en resumen lo mismo que _resumidor_csv, pero con funciones de
+    columna de Arrow: solo la deduplicación recorre las filas en Python.
+
+    Returns:
+        list: Máscara de filas a conservar o None si se conservan todas
+    """
+    resumen['filas'] += lote.num_rows
+    cabecera = lote.schema.names
+    if 'fecha_insercion' not in cabecera or not lote.num_rows:
+        return None
+    fechas = lote.column('fecha_insercion')
+    if not pa.types.is_string(fechas.type):
+        fechas = pc.cast(fechas, pa.string())
+    rango = pc.min_max(pc.if_else(pc.equal(fechas, ''), pa.scalar(None, pa.string()), fechas))
+    for extremo, campo in ((rango['min'].as_py(), 'fecha_min'), (rango['max'].as_py(), 'fecha_max')):
+        actual = resumen[campo]
+        if extremo is not None and (actual is None or (extremo < actual if campo == 'fecha_min' else extremo > actual)):
+            resumen[campo] = extremo
+    fechas = pc.fill_null(fechas, '')
+
+    if columna_desempate in cabecera:
+        desempate = lote.column(columna_desempate)
+        texto = texto_columna(desempate) if pa.types.is_string(desempate.type) else None
+        if resumen['clave_primera'] is None:
+            primera = texto[0] if texto is not None else texto_columna(desempate.slice(0, 1))[0]
+            resumen['clave_primera'] = (fechas[0].as_py(), primera)
+        if texto is None:
+            # Desempate numérico: la clave máxima sale de ordenar las dos columnas
+            tabla = pa.table({'f': fechas, 'd': desempate})
+            fila = pc.sort_indices(tabla, [('f', 'descending'), ('d', 'descending')])[0].as_py()
+            maxima = (fechas[fila].as_py(), texto_columna(desempate.slice(fila, 1))[0])
+        else:
+            maxima = max(zip(fechas.to_pylist(), texto), key=clave_cursor)
+        if resumen['clave_maxima'] is None or clave_cursor(maxima) > clave_cursor(resumen['clave_maxima']):
+            resumen['clave_maxima'] = maxima
+
+    if indice is None or 'fecha' not in cabecera:
+        return None
+    conservar = []
+    for clave in map(indice.clave, texto_columna(lote.column('fecha')), fechas.to_pylist()):
+        nueva = clave not in vistas and not indice.es_duplicado(clave)
+        if nueva:
+            vistas.add(clave)
+            resumen['claves'].append(clave)
+        else:
+            resumen['duplicados'] += 1
+        conservar.append(nueva)
+    return conservar
+
+
+def _volcar_arrow(fuente, f, columna_desempate, indice, tiempos):
+    """
+    Lee un stream Arrow por lotes y los escribe como CSV con pyarrow.csv,
+    sin pasar los valores por Python.
+    """
+    resumen = _resumidor_csv(columna_desempate, indice, [])[0]
+    lector = abrir_arrow(fuente)
+    if lector is None:
+        return resumen
+    resumen['columnas'] = lector.schema.names
+    vistas = set()
+    primero = True
+    for lote in lector:
+        conservar = _resumir_lote_arrow(lote, resumen, columna_desempate, indice, vistas)
+        if conservar is not None and not all(conservar):
+            lote = lote.filter(pa.array(conservar))
+        inicio = time.perf_counter()
+        escribir_csv_arrow(lote, f, cabecera=primero)
+        tiempos['disco'] += time.perf_counter() - inicio
+        primero = False
+    return resumen
+
+
+def volcar_respuesta_formato(response, ruta_destino, formato, columna_desempate=COLUMNA_DESEMPATE_DEFECTO,
+                             indice=None, tamano_bloque=64 * 1024):
+    """
+    Escribe como paquete CSV una respuesta NDJSON o Arrow IPC.
+
+    El cuerpo se lee por bloques a medida que llega: NDJSON se procesa línea
+    a línea y Arrow por lotes con sus columnas tipadas, que se escriben con
+    pyarrow.csv. El paquete en disco es un CSV como el de la API (en Arrow
+    los textos van entre comillas y los decimales sin '.0').
+
+    Returns:
+        dict: Mismo resumen que volcar_respuesta_csv
+    """
+    if indice is not None:
+        indice.refrescar()
+    tiempos = {'red': 0.0, 'parseo': 0.0, 'disco': 0.0}
+    inicio = time.perf_counter()
+    lector = LectorBloques(response.iter_content(chunk_size=tamano_bloque))
+    fuente = BufferedReader(lector, tamano_bloque)
+    volcar = _volcar_arrow if formato == 'arrow' else _volcar_ndjson
+    with open(ruta_destino, 'wb') as f:
+        resumen = volcar(fuente, f, columna_desempate, indice, tiempos)
+        resumen['bytes'] = f.tell()
+        fin = time.perf_counter()
+        f.flush()
+        os.fsync(f.fileno())
+
+    tiempos['red'] = lector.segundos
+    tiempos['parseo'] = fin - inicio - lector.segundos - tiempos['disco']
+    tiempos['disco'] += time.perf_counter() - fin
+    resumen['tiempos'] = tiempos
+    resumen['bytes_recibidos'] = lector.leidos
+    if indice is not None:
+        indice.reservar(resumen['claves'])
+    return resumen
+
+
+def recortar_paquete_csv(ruta, hasta, columna_desempate=COLUMNA_DESEMPATE_DEFECTO):
+    """
+    Reescribe un paquete conservando solo las filas con fecha_insercion < hasta.
+
+    Se usa al rellenar un rezago: la última página puede traer filas que ya
+    se descargaron al priorizar los datos recientes.
+
+    Returns:
+        dict: Resumen del paquete recortado (mismo formato que volcar_respuesta_csv)
+    """
+    with open(ruta, 'rb') as f:
+        lineas = f.read().split(b'\n')
+    cabecera = next((l for l in lineas if l.strip()), b'')
+    columnas = [c.strip().lstrip('\ufeff') for c in _campos_csv(cabecera.decode('utf-8', errors='replace'))]
+    i_fecha = columnas.index('fecha_insercion') if 'fecha_insercion' in columnas else None
+
+    conservadas = [cabecera]
+    if i_fecha is not None:
+        for linea in lineas[lineas.index(cabecera) + 1:]:
+            if not linea.strip():
+                continue
+            campos = _campos_csv(linea.decode('utf-8', errors='replace').strip())
+            fecha = normalizar_fecha_insercion(campos[i_fecha]) if len(campos) > i_fecha else None
+            if fecha is not None and fecha < hasta:
+                conservadas.append(linea)
+
+    resumen, procesar_linea, _ = _resumidor_csv(columna_desempate)
+    contenido = b'\n'.join(conservadas)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    resumen['bytes'] = len(contenido)
+    for linea in conservadas:
+        procesar_linea(linea)
+    return resumen
+
+
+def registros_escritos(resumen):
+    """Filas que quedaron en el archivo del paquete (recibidas menos duplicadas)"""
+    return resumen['filas'] - resumen.get('duplicados', 0)
+
+
+def normalizar_fecha_insercion(fecha_texto):
+    """Convierte un fecha_insercion tal como viene de la API a datetime (o None)"""
+    if not fecha_texto:
+        return None
+    try:
+        return datetime.fromisoformat(fecha_texto.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        fecha = pd.to_datetime(fecha_texto, errors='coerce')
+        return None if pd.isna(fecha) else fecha.to_pydatetime()
+
+
+def parsear_fecha_config(fecha_str):
+    """Interpreta una fecha de config.json con o sin hora"""
+    try:
+        return datetime.strptime(fecha_str, '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return datetime.strptime(fecha_str, '%Y-%m-%d')
+
+
+class ColectorAsync:
+    """
+    Motor de colección concurrente basado en asyncio.
+
+    Descarga todos los dispositivos de config.json en paralelo usando una
+    única sesión HTTP con pool de conexiones (keep-alive, reutilización TLS y
+    gzip). La concurrencia se limita globalmente y por cada api_url, de modo
+    que un endpoint lento no bloquea a los dispositivos de otros endpoints.
+    """
+
+    def __init__(self, config_path='config.json', output_folder='datos',
+                 max_concurrencia=8, max_por_endpoint=4, timeout=180, paginas_en_vuelo=2,
+                 paginacion='cursor', controlador=None, estado=None, limitador=None,
+                 politica_reintentos=None, umbral_circuito=5, enfriamiento_circuito=120.0,
+                 max_paquetes=None, backfill=True, dias_ventana=7, ventanas_en_paralelo=4,
+                 presupuesto=None, horas_recientes=24, dedup=True, horizonte_dedup_dias=30,
+                 formato='csv', metricas=None, formato_api='csv', esquemas=None):
+        self.config_path = config_path
+        self.output_folder = output_folder
+        self.max_concurrencia = max(1, int(max_concurrencia))
+        self.max_por_endpoint = max(1, int(max_por_endpoint))
+        self.timeout = timeout
+        self.paginas_en_vuelo = max(1, int(paginas_en_vuelo))
+        self.paginacion = paginacion
+        # Sin tope por defecto: el diario permite cortar y reanudar en cualquier paquete
+        self.max_paquetes = max_paquetes
+        self.backfill = backfill
+        self.dias_ventana = dias_ventana
+        self.ventanas_en_paralelo = max(1, int(ventanas_en_paralelo))
+        # Con presupuesto (segundos) primero se bajan las últimas horas_recientes
+        # de cada dispositivo y el atraso se rellena con el tiempo que sobre
+        self.presupuesto = presupuesto
+        self.horas_recientes = horas_recientes
+        self.diferidos = []
+        self.dedup = dedup
+        self.horizonte_dedup_dias = horizonte_dedup_dias
+        self._indices = {}
+        self._lock_indices = threading.Lock()
+        self._diarios = {}
+        self._lock_diarios = threading.Lock()
+        self.duplicados = {}
+        # 'parquet' guarda cada paquete tipado y repartido por día de medición
+        if formato == 'parquet' and not PARQUET_DISPONIBLE:
+            print("⚠️  pyarrow no está instalado: los paquetes se guardarán en CSV")
+            formato = 'csv'
+        self.formato = formato
+        # Formato pedido a la API ('csv', 'ndjson' o 'arrow'); CSV queda como alternativa
+        if formato_api not in FORMATOS_API:
+            raise ValueError(f"formato_api desconocido: {formato_api}")
+        if formato_api == 'arrow' and not ARROW_DISPONIBLE:
+            print("⚠️  pyarrow no está instalado: se pedirá CSV a la API")
+            formato_api = 'csv'
+        self.formato_api = formato_api
+        self._endpoints_sin_cursor = set()
+        self._endpoints_solo_csv = set()
+        self.controlador = controlador or ControladorPaquetes()
+        # Columnas y tipos aprendidos por dispositivo; informa la deriva de esquema. Los tipos
+        # solo se aplican en formato parquet: en csv los paquetes se copian tal como llegan
+        self.esquemas = esquemas or CacheEsquemas()
+        self.estado = estado or EstadoColector()
+        self.limitador = limitador or LimitadorTasa()
+        self.politica = politica_reintentos or PoliticaReintentos()
+        self.metricas = metricas or MetricasColector()
+        self.umbral_circuito = umbral_circuito
+        self.enfriamiento_circuito = enfriamiento_circuito
+        self.circuitos = {}
+        self.reintentos = {}
+        self.archivos_creados = []
+        self._sesion = None
+        self._executor = None
+        self._sem_global = None
+        self._sem_endpoints = {}
+
+    def crear_sesion(self):
+        """Crear la sesión HTTP compartida con pool de conexiones"""
+        sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=self.max_concurrencia,
+                                pool_maxsize=self.max_concurrencia)
+        sesion.mount('https://', adaptador)
+        sesion.mount('http://', adaptador)
+        sesion.headers.update({
+            'Accept': 'text/csv',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        return sesion
+
+    def leer_dispositivos(self):
+        """Leer la lista de dispositivos desde el archivo de configuración"""
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def obtener_api_base(dispositivo):
+        """URL base del endpoint del dispositivo (personalizada o por defecto)"""
+        return dispositivo.get('api_url') or API_URL_DEFECTO
+
+    def modo_paginacion(self, dispositivo):
+        """
+        Modo de paginación del dispositivo: 'cursor' o 'offset'.
+
+        Se puede forzar con la clave 'paginacion' en config.json; los endpoints
+        que ya demostraron no soportar cursor usan offset.
+        """
+        modo = dispositivo.get('paginacion', self.paginacion)
+        if modo == 'cursor' and self.obtener_api_base(dispositivo) in self._endpoints_sin_cursor:
+            return 'offset'
+        return modo
+
+    def formato_api_dispositivo(self, dispositivo):
+        """
+        Formato que se pide a la API para el dispositivo.
+
+        Se puede forzar con la clave 'formato_api' en config.json; los
+        endpoints que ya respondieron solo CSV vuelven a CSV.
+        """
+        formato = dispositivo.get('formato_api', self.formato_api)
+        if formato == 'arrow' and not ARROW_DISPONIBLE:
+            return 'csv'
+        if self.obtener_api_base(dispositivo) in self._endpoints_solo_csv:
+            return 'csv'
+        return formato
+
+    def determinar_fecha_inicio(self, dispositivo, dispositivo_folder, diario=None):
+        """
+        Determina desde dónde reanudar la descarga de un dispositivo.
+
+        Returns:
+            tuple: (fecha_inicio para la API, nombre de la carpeta de fecha,
+                    origen: 'estado', 'csv' o 'sin_datos')
+        """
+        codigo_interno = dispositivo['codigo_interno']
+
+        # 1. Marca de agua en el estado del colector (importada de config.json la primera vez)
+        marca = self.estado.obtener_ultima_fecha(codigo_interno)
+
+        # El diario puede ir un paquete por delante si el proceso murió entre
+        # confirmar el paquete y actualizar el estado
+        ultimo = diario.ultimo() if diario else None
+        if ultimo and ultimo.get('fecha_max') and (not marca or ultimo['fecha_max'] > marca):
+            print(f"[{codigo_interno}] 📓 Recuperando marca de agua desde el diario: {ultimo['fecha_max']}")
+            if ultimo.get('rezago'):
+                # Corte durante una descarga de recientes: anotar también el tramo que se postergó
+                self.estado.agregar_rezago(codigo_interno, *ultimo['rezago'], marca=ultimo['fecha_max'])
+            else:
+                self.estado.avanzar_marca(codigo_interno, ultimo['fecha_max'])
+            marca = ultimo['fecha_max']
+        if marca:
+            ultima_fecha = parsear_fecha_config(marca)
+            print(f"[{codigo_interno}] 📅 Última fecha registrada: {marca}")
+            return ultima_fecha.strftime('%Y-%m-%dT%H:%M:%S'), ultima_fecha.strftime('%Y-%m-%d'), 'estado'
+
+        # 2. Buscar última fecha en archivos CSV existentes en la carpeta del dispositivo
+        ultima_fecha_csv = obtener_ultima_fecha_csv(codigo_interno, dispositivo_folder)
+        if ultima_fecha_csv:
+            siguiente = parsear_fecha_config(ultima_fecha_csv) + timedelta(days=1)
+            print(f"[{codigo_interno}] 📅 Última fecha encontrada en CSV: {ultima_fecha_csv}")
+            return siguiente.strftime('%Y-%m-%dT%H:%M:%S'), siguiente.strftime('%Y-%m-%d'), 'csv'
+
+        # 3. Si no hay datos, usar fecha específica
+        fecha_inicio = FECHA_INICIO_HISTORIA
+        print(f"[{codigo_interno}] 📅 No hay datos previos, iniciando desde: {fecha_inicio}")
+        return fecha_inicio, fecha_inicio, 'sin_datos'
+
+    async def _ejecutar_en_pool(self, funcion, *args):
+        """Ejecuta trabajo bloqueante (HTTP, parseo, disco) en el pool de hilos"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(funcion, *args))
+
+    async def _get(self, url, headers=None):
+        """Ejecuta un GET sobre la sesión compartida sin bloquear el event loop"""
+        return await self._ejecutar_en_pool(
+            functools.partial(self._sesion.get, timeout=self.timeout, stream=True, headers=headers), url)
+
+    def _construir_url(self, descarga, limite, offset=0, cursor=None, formato=None):
+        """URL de una página en modo offset o, si se entrega cursor, en modo keyset"""
+        api_url = (f"{descarga['api_base_url']}?tabla=datos&order_by=fecha_insercion"
+                   f"&disp.id_proyecto={descarga['proyecto']}&limite={limite}&offset={offset}"
+                   f"&disp.codigo_interno={descarga['codigo_interno']}&fecha_inicio={descarga['fecha_inicio']}"
+                   f"&formato={formato or descarga['formato_api']}")
+        if descarga.get('fecha_fin'):
+            api_url += f"&fecha_fin={descarga['fecha_fin']}"
+        if cursor is not None:
+            api_url += (f"&{PARAM_CURSOR_FECHA}={quote(cursor[0])}"
+                        f"&{PARAM_CURSOR_DESEMPATE}={quote(cursor[1])}")
+        return api_url
+
+    def _cambiar_a_csv(self, descarga, motivo):
+        """Vuelve a pedir CSV al endpoint del dispositivo"""
+        if descarga['api_base_url'] not in self._endpoints_solo_csv:
+            print(f"[{descarga['codigo_interno']}] ⚠️  Endpoint sin soporte de formato "
+                  f"{descarga['formato_api']} ({motivo}), usando CSV")
+        self._endpoints_solo_csv.add(descarga['api_base_url'])
+        descarga['formato_api'] = 'csv'
+
+    def _cambiar_a_offset(self, descarga, motivo):
+        """Desactiva el modo cursor para el endpoint del dispositivo"""
+        print(f"[{descarga['codigo_interno']}] ⚠️  Endpoint sin soporte de cursor ({motivo}), usando offset")
+        self._endpoints_sin_cursor.add(descarga['api_base_url'])
+        descarga['paginacion'] = 'offset'
+
+    async def _productor_paginas(self, descarga, cola):
+        """
+        Descarga las páginas de un dispositivo y las deja en la cola.
+
+        En modo cursor cada página pide las filas posteriores a la clave
+        (fecha_insercion, desempate) más alta ya vista, por lo que no se
+        pierden ni duplican filas aunque lleguen inserciones durante la
+        descarga. En modo offset se usa limite/offset como antes.
+
+        El tamaño de cada página lo decide el ControladorPaquetes según la
+        latencia observada. Ante un timeout o un error reintentable se vuelve
+        a pedir la misma ventana con backoff exponencial (nunca se salta), y si
+        el circuito del endpoint está abierto se falla de inmediato.
+
+        La cola es acotada: si el consumidor va atrasado, el productor espera
+        antes de pedir más páginas (backpressure).
+        """
+        codigo_interno = descarga['codigo_interno']
+        api_base_url = descarga['api_base_url']
+        offset = 0
+        cursor = descarga['cursor_inicial']
+        paquete_num = descarga['paquete_base']
+        paquetes_pedidos = 0
+        intentos = 0
+
+        try:
+            while not descarga['detener'].is_set():
+                limite_tiempo = descarga.get('limite_tiempo')
+                if limite_tiempo is not None and time.monotonic() >= limite_tiempo:
+                    print(f"[{codigo_interno}] ⏰ Presupuesto de tiempo agotado, el resto queda para la próxima ejecución")
+                    descarga['interrumpida'] = True
+                    break
+                paquetes_pedidos += 1
+                if descarga['max_paquetes'] and paquetes_pedidos > descarga['max_paquetes']:
+                    print(f"[{codigo_interno}] ⚠️  Alcanzado límite de seguridad de {descarga['max_paquetes']} paquetes")
+                    descarga['interrumpida'] = True
+                    break
+
+                limite = self.controlador.limite(api_base_url)
+                modo_cursor = descarga['paginacion'] == 'cursor'
+                if modo_cursor:
+                    api_url = self._construir_url(descarga, limite, cursor=cursor)
+                    print(f"[{codigo_interno}] 📦 Paquete {paquete_num + 1}: {limite} registros desde cursor {cursor or 'inicial'}")
+                else:
+                    api_url = self._construir_url(descarga, limite, offset=offset)
+                    print(f"[{codigo_interno}] 📦 Paquete {paquete_num + 1}: registros {offset + 1} al {offset + limite}")
+
+                ruta_parcial = os.path.join(descarga['fecha_folder'],
+                                            f"{descarga['prefijo_parcial']}_paquete_{paquete_num + 1:03d}.parcial")
+                circuito = self._circuito(api_base_url)
+                if not circuito.permitir():
+                    raise CircuitoAbierto(f"circuito abierto para {api_base_url}")
+
+                retry_after = None
+                formato_ilegible = False
+                async with self.limitador.turno(api_url):
+                    inicio_peticion = time.perf_counter()
+                    resumen = None
+                    try:
+                        response = await self._get(api_url, {'Accept': cabecera_accept(descarga['formato_api'])})
+                    except (requests.Timeout, requests.ConnectionError) as e:
+                        print(f"[{codigo_interno}] ⚠️  Fallo de conexión: {e}")
+                        response = None
+                    espera_cabeceras = time.perf_counter() - inicio_peticion
+
+                    try:
+                        if response is not None and response.status_code == 200:
+                            try:
+                                formato = formato_respuesta(response)
+                                if formato == 'csv':
+                                    if descarga['formato_api'] != 'csv':
+                                        self._cambiar_a_csv(descarga, "respondió CSV")
+                                    resumen = await self._ejecutar_en_pool(
+                                        volcar_respuesta_csv, response, ruta_parcial, descarga['columna_desempate'],
+                                        64 * 1024, descarga.get('indice'))
+                                else:
+                                    resumen = await self._ejecutar_en_pool(
+                                        volcar_respuesta_formato, response, ruta_parcial, formato,
+                                        descarga['columna_desempate'], descarga.get('indice'))
+                                resumen['bytes_recibidos'] = bytes_en_red(response, resumen['bytes_recibidos'])
+                                descarga['claves_pendientes'].update(resumen['claves'])
+                            except (requests.Timeout, requests.ConnectionError,
+                                    requests.exceptions.ChunkedEncodingError):
+                                # El cuerpo se cortó a mitad de camino: tratarlo como timeout
+                                response = None
+                                if os.path.exists(ruta_parcial):
+                                    os.remove(ruta_parcial)
+                            except ValueError as e:
+                                if formato == 'csv':
+                                    raise
+                                # Cuerpo NDJSON/Arrow ilegible: repetir la página en CSV
+                                if os.path.exists(ruta_parcial):
+                                    os.remove(ruta_parcial)
+                                self._cambiar_a_csv(descarga, f"respuesta ilegible: {e}")
+                                formato_ilegible = True
+                        elif response is not None and response.status_code in (429, 503) and (
+                                response.status_code == 429 or 'Retry-After' in response.headers):
+                            retry_after = segundos_retry_after(response.headers.get('Retry-After'))
+                            self.limitador.pausar(api_url, retry_after)
+                        elif response is not None and response.status_code != 524:
+                            print(f"[{codigo_interno}] ❌ Error HTTP {response.status_code}: {response.reason}")
+                            print(f"[{codigo_interno}] 📄 Contenido de error: {response.text[:500]}")
+                    finally:
+                        if response is not None:
+                            response.close()
+                    latencia = time.perf_counter() - inicio_peticion
+
+                self.metricas.registrar_peticion(codigo_interno, api_base_url, latencia,
+                                                 response.status_code if response is not None else 'timeout')
+                self.metricas.agregar_tiempo(codigo_interno, 'red', espera_cabeceras)
+                if resumen is not None:
+                    self.metricas.registrar_recepcion(codigo_interno, resumen['bytes_recibidos'], resumen['filas'])
+                    for fase, segundos in resumen['tiempos'].items():
+                        self.metricas.agregar_tiempo(codigo_interno, fase, segundos)
+
+                if formato_ilegible:
+                    circuito.registrar_exito()
+                    continue
+
+                if retry_after is not None:
+                    # El servidor pidió esperar: el host ya quedó en pausa, repetir la misma ventana
+                    circuito.registrar_exito()
+                    intentos += 1
+                    descarga['reintentos'] += 1
+                    self.metricas.registrar_reintento(codigo_interno)
+                    print(f"[{codigo_interno}] 🚦 HTTP {response.status_code}, host en pausa {retry_after:.1f}s")
+                    if intentos > self.politica.max_reintentos:
+                        raise ReintentosAgotados(f"{intentos - 1} reintentos agotados por HTTP {response.status_code}")
+                    continue
+
+                if response is not None and response.status_code != 200:
+                    if descarga['formato_api'] != 'csv' and response.status_code in [400, 406, 415]:
+                        circuito.registrar_exito()
+                        self._cambiar_a_csv(descarga, f"HTTP {response.status_code}")
+                        continue
+                    if modo_cursor and cursor is not None and response.status_code in [400, 422]:
+                        circuito.registrar_exito()
+                        self._cambiar_a_offset(descarga, f"HTTP {response.status_code}")
+                        continue
+                    if not self.politica.es_reintentable(response.status_code):
+                        circuito.registrar_exito()
+                        response.raise_for_status()
+
+                if response is None or response.status_code != 200:
+                    # Timeout, error de conexión o error reintentable: misma ventana con backoff
+                    circuito.registrar_fallo()
+                    intentos += 1
+                    descarga['reintentos'] += 1
+                    self.metricas.registrar_reintento(codigo_interno)
+                    motivo = 'timeout' if response is None else f"HTTP {response.status_code}"
+                    if response is None or response.status_code == 524:
+                        # Paquete posiblemente demasiado grande para el servidor
+                        limite_nuevo = self.controlador.registrar_timeout(api_base_url, limite)
+                        motivo += f", paquete reducido a {limite_nuevo}"
+                    if intentos > self.politica.max_reintentos:
+                        raise ReintentosAgotados(f"{intentos - 1} reintentos agotados ({motivo})")
+                    espera = self.politica.espera(intentos)
+                    print(f"[{codigo_interno}] 🔁 Reintento {intentos}/{self.politica.max_reintentos} "
+                          f"en {espera:.1f}s ({motivo}, {latencia:.1f}s)")
+                    await asyncio.sleep(espera)
+                    continue
+
+                circuito.registrar_exito()
+                intentos = 0
+
+                filas = resumen['filas']
+                if filas == 0:
+                    os.remove(ruta_parcial)
+                    print(f"[{codigo_interno}] 📭 No hay más datos disponibles (respuesta vacía)")
+                    break
+
+                self.controlador.registrar_exito(api_base_url, latencia, filas, limite)
+                if modo_cursor:
+                    if resumen['clave_primera'] is None:
+                        self._cambiar_a_offset(descarga, f"sin columna {descarga['columna_desempate']}")
+                    elif cursor is not None and clave_cursor(resumen['clave_primera']) <= clave_cursor(cursor):
+                        # El servidor ignoró el cursor y devolvió filas ya vistas:
+                        # continuar en modo offset desde las filas ya recibidas
+                        os.remove(ruta_parcial)
+                        self._descartar_claves(descarga, resumen['claves'])
+                        self._cambiar_a_offset(descarga, "cursor ignorado")
+                        offset = descarga['filas_encoladas']
+                        continue
+                    else:
+                        cursor = resumen['clave_maxima']
+
+                descarga['filas_encoladas'] += filas
+                descarga['duplicados'] += resumen['duplicados']
+                if registros_escritos(resumen) > 0:
+                    paquete_num += 1
+                    await cola.put((paquete_num, ruta_parcial, resumen))
+                else:
+                    os.remove(ruta_parcial)
+                    print(f"[{codigo_interno}] ♻️  Página sin filas nuevas ({filas} duplicadas descartadas)")
+
+                # Si el paquete tiene menos registros que el límite, es el último
+                if filas < limite:
+                    break
+
+                offset += filas
+        finally:
+            await cola.put(None)
+
+    def _confirmar_paquete(self, descarga, paquete_num, ruta_parcial, resumen):
+        """
+        Da nombre definitivo a un paquete ya escrito en disco.
+
+        El paquete se anota en el diario antes del rename, de modo que un corte
+        entre ambos pasos se completa en la siguiente ejecución.
+
+        Returns:
+            tuple: (nombre de archivo, última fecha_insercion en formato config o None)
+        """
+        inicio = time.perf_counter()
+        if self.formato == 'parquet':
+            resultado = self._confirmar_paquete_parquet(descarga, paquete_num, ruta_parcial, resumen)
+        else:
+            resultado = self._confirmar_paquete_csv(descarga, paquete_num, ruta_parcial, resumen)
+        self.metricas.agregar_tiempo(descarga['codigo_interno'], 'disco', time.perf_counter() - inicio)
+        return resultado
+
+    def _confirmar_paquete_csv(self, descarga, paquete_num, ruta_parcial, resumen):
+        """Anota el paquete CSV en el diario y le da su nombre definitivo"""
+        codigo_interno = descarga['codigo_interno']
+        fecha_datos = normalizar_fecha_insercion(resumen['fecha_max'])
+
+        if fecha_datos is not None:
+            fecha_max = fecha_datos.strftime('%Y-%m-%dT%H:%M:%S')
+            filename = f"{codigo_interno}_paquete_{paquete_num:03d}_{fecha_datos.strftime('%Y%m%d')}.csv"
+        else:
+            # Si no se puede obtener la fecha, usar timestamp actual como fallback
+            fecha_max = None
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{codigo_interno}_paquete_{paquete_num:03d}_{timestamp}.csv"
+
+        # El paquete no se parsea con pandas: solo se revisa la cabecera contra el esquema
+        self.esquemas.revisar_columnas(clave_esquema(descarga['api_base_url'], codigo_interno),
+                                       resumen.get('columnas'))
+        # Los paquetes de un rezago no dejan cursor: la reanudación normal sigue desde la marca de agua
+        cursor = None if descarga.get('rezago') else resumen['clave_maxima']
+        descarga['diario'].registrar(descarga['carpeta'], os.path.basename(ruta_parcial), filename,
+                                     paquete_num, registros_escritos(resumen), resumen['bytes'],
+                                     fecha_max, cursor, rezago=descarga.get('postergado'))
+        os.replace(ruta_parcial, os.path.join(descarga['fecha_folder'], filename))
+        if descarga.get('indice') is not None:
+            descarga['indice'].confirmar(resumen.get('claves'))
+            descarga['claves_pendientes'].difference_update(resumen.get('claves') or ())
+        return filename, fecha_max
+
+    def _confirmar_paquete_parquet(self, descarga, paquete_num, ruta_parcial, resumen):
+        """
+        Agrega un paquete CSV ya escrito al almacén Parquet, un archivo por día de medición.
+
+        Para cada día que toca el paquete se escribe como .parcial el Parquet
+        del día con las filas nuevas agregadas (proyecto/dispositivo/día/
+        CODIGO_YYYYMMDD.parquet), se anotan todos en una sola entrada del
+        diario y recién entonces reemplazan a los anteriores; el CSV de paso
+        se elimina.
+
+        Returns:
+            tuple: (archivos de día actualizados, última fecha_insercion en formato config o None)
+        """
+        codigo_interno = descarga['codigo_interno']
+        fecha_datos = normalizar_fecha_insercion(resumen['fecha_max'])
+        fecha_max = fecha_datos.strftime('%Y-%m-%dT%H:%M:%S') if fecha_datos is not None else None
+        dispositivo_folder = os.path.dirname(descarga['fecha_folder'])
+
+        renombres = []
+        paquete = particionar_paquete(ruta_parcial, descarga['carpeta'], self.esquemas,
+                                      clave_esquema(descarga['api_base_url'], codigo_interno))
+        for dia, df in paquete.items():
+            carpeta_dia = os.path.join(dispositivo_folder, dia)
+            os.makedirs(carpeta_dia, exist_ok=True)
+            archivo = f"{codigo_interno}_{dia.replace('-', '')}.parquet"
+            parcial = archivo + '.parcial'
+            anexar_dia(os.path.join(carpeta_dia, archivo), df, os.path.join(carpeta_dia, parcial))
+            renombres.append([dia, parcial, archivo])
+
+        cursor = None if descarga.get('rezago') else resumen['clave_maxima']
+        descarga['diario'].registrar(descarga['carpeta'], os.path.basename(ruta_parcial), None,
+                                     paquete_num, registros_escritos(resumen), resumen['bytes'],
+                                     fecha_max, cursor, archivos=renombres, rezago=descarga.get('postergado'))
+        for dia, parcial, archivo in renombres:
+            carpeta_dia = os.path.join(dispositivo_folder, dia)
+            os.replace(os.path.join(carpeta_dia, parcial), os.path.join(carpeta_dia, archivo))
+        os.remove(ruta_parcial)
+        if descarga.get('indice') is not None:
+            descarga['indice'].confirmar(resumen.get('claves'))
+            descarga['claves_pendientes'].difference_update(resumen.get('claves') or ())
+        return ', '.join(archivo for _, _, archivo in renombres), fecha_max
+
+    def _registrar_confirmado(self, descarga, filename, fecha_max, resumen, avanzar_marca=True):
+        """Contabiliza un paquete ya confirmado en disco y en el estado"""
+        codigo_interno = descarga['codigo_interno']
+        registros = registros_escritos(resumen)
+        self.estado.registrar_paquete(codigo_interno, registros, fecha_max if avanzar_marca else None)
+        self.metricas.registrar_paquete(codigo_interno, registros)
+        self.archivos_creados.append(filename)
+        descarga['archivos'].append(filename)
+        descarga['total_registros'] += registros
+        if fecha_max and (descarga['ultima_fecha'] is None or fecha_max > descarga['ultima_fecha']):
+            descarga['ultima_fecha'] = fecha_max
+        print(f"[{codigo_interno}] 💾 Paquete guardado: {filename} ({registros} registros, {resumen['bytes']:,} bytes)")
+
+    async def _consumidor_paquetes(self, descarga, cola):
+        """Confirma los paquetes escritos mientras el productor descarga el siguiente"""
+        while True:
+            item = await cola.get()
+            if item is None:
+                break
+            paquete_num, ruta_parcial, resumen = item
+
+            filename, fecha_max = await self._ejecutar_en_pool(
+                self._confirmar_paquete, descarga, paquete_num, ruta_parcial, resumen)
+            # Con un tramo postergado la marca avanza recién en _postergar_tramo
+            self._registrar_confirmado(descarga, filename, fecha_max, resumen,
+                                       avanzar_marca=not descarga.get('postergado'))
+
+    async def _ejecutar_pipeline(self, descarga, consumidor):
+        """
+        Pipeline productor/consumidor: se descarga la página N+1 mientras se
+        procesa la página N.
+        """
+        cola = asyncio.Queue(maxsize=self.paginas_en_vuelo)
+        productor = asyncio.ensure_future(self._productor_paginas(descarga, cola))
+        try:
+            await consumidor(descarga, cola)
+        finally:
+            if not productor.done():
+                # El consumidor terminó antes de tiempo: cancelar al productor
+                # vaciando la cola por si quedó bloqueado en un put
+                descarga['detener'].set()
+                productor.cancel()
+                while not productor.done():
+                    while not cola.empty():
+                        cola.get_nowait()
+                    await asyncio.sleep(0.01)
+            if not productor.cancelled():
+                await productor
+
+    async def _pedir(self, descarga, api_url, headers=None):
+        """
+        GET de una petición suelta (sin paginar) con la misma política que las
+        páginas: circuito del endpoint, turno del limitador, pausa ante
+        Retry-After y reintentos con backoff ante timeouts y errores
+        reintentables.
+
+        Returns:
+            requests.Response: Respuesta exitosa (el llamador la cierra)
+        """
+        codigo_interno = descarga['codigo_interno']
+        api_base_url = descarga['api_base_url']
+        circuito = self._circuito(api_base_url)
+        intentos = 0
+        while True:
+            if not circuito.permitir():
+                raise CircuitoAbierto(f"circuito abierto para {api_base_url}")
+            retry_after = None
+            async with self.limitador.turno(api_url):
+                inicio = time.perf_counter()
+                try:
+                    response = await self._get(api_url, headers)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    print(f"[{codigo_interno}] ⚠️  Fallo de conexión: {e}")
+                    response = None
+                if response is not None and response.status_code in (429, 503) and (
+                        response.status_code == 429 or 'Retry-After' in response.headers):
+                    retry_after = segundos_retry_after(response.headers.get('Retry-After'))
+                    self.limitador.pausar(api_url, retry_after)
+            self.metricas.registrar_peticion(codigo_interno, api_base_url, time.perf_counter() - inicio,
+                                             response.status_code if response is not None else 'timeout')
+
+            if response is not None and retry_after is None and (
+                    response.status_code == 200 or not self.politica.es_reintentable(response.status_code)):
+                circuito.registrar_exito()
+                if response.status_code >= 400:
+                    response.close()
+                    response.raise_for_status()
+                return response
+
+            motivo = 'timeout' if response is None else f"HTTP {response.status_code}"
+            if response is not None:
+                response.close()
+            intentos += 1
+            descarga['reintentos'] += 1
+            self.metricas.registrar_reintento(codigo_interno)
+            if intentos > self.politica.max_reintentos:
+                raise ReintentosAgotados(f"{intentos - 1} reintentos agotados ({motivo})")
+            if retry_after is not None:
+                # El host ya quedó en pausa: repetir sin contar un fallo del endpoint
+                circuito.registrar_exito()
+                print(f"[{codigo_interno}] 🚦 {motivo}, host en pausa {retry_after:.1f}s")
+                continue
+            circuito.registrar_fallo()
+            espera = self.politica.espera(intentos)
+            print(f"[{codigo_interno}] 🔁 Reintento {intentos}/{self.politica.max_reintentos} "
+                  f"en {espera:.1f}s ({motivo})")
+            await asyncio.sleep(espera)
+
+    async def _sondear_inicio_historia(self, descarga):
+        """
+        Pide un único registro desde fecha_inicio para conocer la primera
+        fecha_insercion real del dispositivo.
+
+        Returns:
+            datetime: Primera fecha con datos, o None si el dispositivo no tiene datos
+        """
+        api_url = self._construir_url(descarga, 1, offset=0, formato='csv')
+        response = await self._pedir(descarga, api_url)
+        try:
+            texto = response.text
+        finally:
+            response.close()
+        filas = list(csv.DictReader(StringIO(texto.strip())))
+        if not filas:
+            return None
+        return normalizar_fecha_insercion(filas[0].get('fecha_insercion'))
+
+    async def _descargar_ventana(self, descarga, indice, inicio_ventana, fin_ventana, staging, semaforo, abortar):
+        """
+        Descarga una ventana [inicio, fin) de la historia a la carpeta de staging.
+
+        Returns:
+            list: (ruta_parcial, resumen) de cada paquete de la ventana, en orden
+        """
+        ventana = dict(descarga)
+        ventana.update({
+            'fecha_inicio': inicio_ventana.strftime('%Y-%m-%dT%H:%M:%S'),
+            'fecha_fin': (fin_ventana - timedelta(seconds=1)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'fecha_folder': staging,
+            'prefijo_parcial': f"v{indice:05d}",
+            'paquete_base': 0,
+            'cursor_inicial': None,
+            'detener': asyncio.Event(),
+            'filas_encoladas': 0,
+            'reintentos': 0,
+            'duplicados': 0,
+        })
+        paquetes = []
+
+        async def recolectar(ventana, cola):
+            while not abortar.is_set():
+                item = await cola.get()
+                if item is None:
+                    break
+                _, ruta_parcial, resumen = item
+                fecha_min = normalizar_fecha_insercion(resumen['fecha_min'])
+                fecha_max = normalizar_fecha_insercion(resumen['fecha_max'])
+                if ((fecha_min is not None and fecha_min < inicio_ventana)
+                        or (fecha_max is not None and fecha_max >= fin_ventana)):
+                    # Cortar también las demás ventanas: el resultado se descarta
+                    abortar.set()
+                    raise FinVentanaIgnorado(f"filas fuera de {ventana['fecha_inicio']} - {ventana['fecha_fin']}")
+                paquetes.append((ruta_parcial, resumen))
+
+        async with semaforo:
+            if abortar.is_set():
+                return paquetes
+            try:
+                await self._ejecutar_pipeline(ventana, recolectar)
+            finally:
+                descarga['reintentos'] += ventana['reintentos']
+                descarga['duplicados'] += ventana['duplicados']
+        return paquetes
+
+    async def _backfill_dispositivo(self, descarga):
+        """
+        Carga la historia completa de un dispositivo nuevo por ventanas de tiempo.
+
+        Las ventanas (dias_ventana días cada una) se descargan en paralelo a
+        una carpeta de staging y luego se cosen en orden cronológico, cada
+        una en la carpeta de fecha de su día de inicio, pasando por el diario. La marca de agua se
+        actualiza una sola vez al final y solo hasta la última ventana
+        contigua completa, así una ventana fallida se vuelve a pedir en la
+        próxima ejecución.
+
+        Returns:
+            bool: False si el endpoint no respeta la ventana y hay que usar el modo secuencial
+        """
+        codigo_interno = descarga['codigo_interno']
+        primera_fecha = await self._sondear_inicio_historia(descarga)
+        if primera_fecha is None:
+            return True
+
+        inicio = primera_fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+        fin = datetime.now() + timedelta(days=1)
+        paso = timedelta(days=self.dias_ventana)
+        ventanas = []
+        while inicio < fin:
+            ventanas.append((inicio, min(inicio + paso, fin)))
+            inicio += paso
+        print(f"[{codigo_interno}] 🗂️  Backfill desde {primera_fecha}: {len(ventanas)} ventanas de "
+              f"{self.dias_ventana} días ({self.ventanas_en_paralelo} en paralelo)")
+
+        dispositivo_folder = os.path.dirname(descarga['fecha_folder'])
+        staging = os.path.join(dispositivo_folder, '_backfill')
+        os.makedirs(staging, exist_ok=True)
+        semaforo = asyncio.Semaphore(self.ventanas_en_paralelo)
+        abortar = asyncio.Event()
+        resultados = await asyncio.gather(
+            *(self._descargar_ventana(descarga, i, ini, fin_v, staging, semaforo, abortar)
+              for i, (ini, fin_v) in enumerate(ventanas)),
+            return_exceptions=True)
+
+        if any(isinstance(r, FinVentanaIgnorado) for r in resultados):
+            print(f"[{codigo_interno}] ⚠️  El endpoint no respeta la ventana de fechas, se usa la descarga secuencial")
+            shutil.rmtree(staging, ignore_errors=True)
+            self._descartar_claves(descarga)
+            descarga['duplicados'] = 0
+            return False
+
+        # Coser en orden las ventanas contiguas completas, cada una en la carpeta de su día de inicio
+        carpeta_sondeo = descarga['fecha_folder']
+        ultima_fecha = None
+        for (inicio_ventana, _), resultado in zip(ventanas, resultados):
+            if isinstance(resultado, BaseException):
+                print(f"[{codigo_interno}] ❌ Ventana desde {inicio_ventana:%Y-%m-%d} falló ({resultado}); "
+                      f"el resto se reintentará en la próxima ejecución")
+                break
+            if not resultado:
+                continue
+            descarga['carpeta'] = inicio_ventana.strftime('%Y-%m-%d')
+            descarga['fecha_folder'] = os.path.join(dispositivo_folder, descarga['carpeta'])
+            os.makedirs(descarga['fecha_folder'], exist_ok=True)
+            paquete_num = descarga['diario'].siguiente_paquete(descarga['carpeta']) - 1
+            for ruta_staging, resumen in resultado:
+                paquete_num += 1
+                ruta_parcial = os.path.join(descarga['fecha_folder'],
+                                            f"{codigo_interno}_paquete_{paquete_num:03d}.parcial")
+                os.replace(ruta_staging, ruta_parcial)
+                filename, fecha_max = await self._ejecutar_en_pool(
+                    self._confirmar_paquete, descarga, paquete_num, ruta_parcial, resumen)
+                self._registrar_confirmado(descarga, filename, fecha_max, resumen, avanzar_marca=False)
+                if fecha_max and (ultima_fecha is None or fecha_max > ultima_fecha):
+                    ultima_fecha = fecha_max
+
+        if ultima_fecha:
+            self.estado.avanzar_marca(codigo_interno, ultima_fecha)
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.listdir(carpeta_sondeo):
+            # La carpeta de FECHA_INICIO_HISTORIA que se creó para la descarga quedó sin uso
+            os.rmdir(carpeta_sondeo)
+        return True
+
+    def _nueva_descarga(self, dispositivo, dispositivo_folder, diario, fecha_inicio, carpeta, cursor_inicial):
+        """Estado de una descarga de un dispositivo desde fecha_inicio hacia la carpeta de fecha"""
+        fecha_folder = os.path.join(dispositivo_folder, carpeta)
+        os.makedirs(fecha_folder, exist_ok=True)
+        codigo_interno = dispositivo['codigo_interno']
+        return {
+            'proyecto': dispositivo['proyecto'],
+            'codigo_interno': codigo_interno,
+            'api_base_url': self.obtener_api_base(dispositivo),
+            'fecha_inicio': fecha_inicio,
+            'fecha_folder': fecha_folder,
+            'carpeta': carpeta,
+            'diario': diario,
+            'prefijo_parcial': codigo_interno,
+            'paquete_base': diario.siguiente_paquete(carpeta) - 1,
+            'cursor_inicial': cursor_inicial,
+            'max_paquetes': self.max_paquetes,
+            'archivos': [],
+            'total_registros': 0,
+            'ultima_fecha': None,
+            'detener': asyncio.Event(),
+            'paginacion': self.modo_paginacion(dispositivo),
+            'formato_api': self.formato_api_dispositivo(dispositivo),
+            'columna_desempate': dispositivo.get('columna_desempate', COLUMNA_DESEMPATE_DEFECTO),
+            'filas_encoladas': 0,
+            'reintentos': 0,
+            'duplicados': 0,
+            'indice': self._indice(codigo_interno, dispositivo_folder),
+            # Claves reservadas por paquetes de esta descarga (y de sus ventanas) aún sin confirmar
+            'claves_pendientes': set(),
+        }
+
+    def _indice(self, codigo_interno, dispositivo_folder):
+        """
+        Índice de dedup del dispositivo (se mantiene en memoria entre ciclos y
+        lo comparte el receptor push desde su hilo escritor)
+        """
+        if not self.dedup:
+            return None
+        with self._lock_indices:
+            if codigo_interno not in self._indices:
+                self._indices[codigo_interno] = IndiceDedup(dispositivo_folder, self.horizonte_dedup_dias)
+            return self._indices[codigo_interno]
+
+    @staticmethod
+    def _descartar_claves(descarga, claves=None):
+        """
+        Olvidar en el índice las claves de paquetes descartados: las entregadas
+        o, sin claves, todas las que esta descarga reservó y no confirmó. Las
+        de otras descargas o del receptor push del mismo dispositivo quedan.
+        """
+        if descarga.get('indice') is None:
+            return
+        claves = set(descarga['claves_pendientes'] if claves is None else claves)
+        descarga['indice'].descartar_pendientes(claves)
+        descarga['claves_pendientes'].difference_update(claves)
+
+    def _diario(self, codigo_interno, dispositivo_folder):
+        """
+        Diario del dispositivo (se mantiene en memoria entre ciclos y lo
+        comparte el receptor push); al abrirlo se completan o descartan los
+        paquetes que quedaron a medias en un corte anterior, y la
+        recuperación se repite después de cada error del dispositivo
+        (_procesar_dispositivo).
+        """
+        with self._lock_diarios:
+            if codigo_interno not in self._diarios:
+                diario = DiarioDescargas(dispositivo_folder)
+                completados, eliminados = diario.recuperar()
+                if completados or eliminados:
+                    print(f"[{codigo_interno}] 📓 Diario recuperado: {completados} paquetes confirmados, "
+                          f"{eliminados} parciales descartados")
+                self._diarios[codigo_interno] = diario
+            return self._diarios[codigo_interno]
+
+    def _postergar_tramo(self, descarga):
+        """
+        Anota el rezago de una descarga de recientes y avanza la marca de agua
+        en una sola transacción, ya confirmados los paquetes recientes. Si la
+        descarga se cortó sin confirmar nada no se anota nada: la próxima
+        ejecución vuelve a empezar desde la marca.
+        """
+        desde, hasta = descarga['postergado']
+        marca = descarga['ultima_fecha']
+        if descarga.get('terminada') and not descarga.get('interrumpida'):
+            # Ya se bajó todo lo posterior al corte
+            marca = max(marca or hasta, hasta)
+        elif marca is None:
+            return
+        self.estado.agregar_rezago(descarga['codigo_interno'], desde, hasta, marca=marca)
+        print(f"[{descarga['codigo_interno']}] ⏩ Rezago {desde} → {hasta} postergado")
+
+    def _cerrar_descarga(self, descarga):
+        """Contabilizar duplicados y olvidar claves de paquetes que no se confirmaron"""
+        codigo_interno = descarga['codigo_interno']
+        self.reintentos[codigo_interno] = self.reintentos.get(codigo_interno, 0) + descarga['reintentos']
+        self.duplicados[codigo_interno] = self.duplicados.get(codigo_interno, 0) + descarga['duplicados']
+        self._descartar_claves(descarga)
+
+    async def descargar_dispositivo(self, dispositivo, limite_tiempo=None):
+        """
+        Descarga por paquetes los datos nuevos de un dispositivo.
+
+        Args:
+            dispositivo (dict): Dispositivo de config.json
+            limite_tiempo (float): time.monotonic() en que se deja de pedir páginas
+
+        Returns:
+            list: Archivos CSV creados para el dispositivo
+        """
+        proyecto = dispositivo['proyecto']
+        codigo_interno = dispositivo['codigo_interno']
+        api_base_url = self.obtener_api_base(dispositivo)
+        sem_endpoint = self._semaforo_endpoint(api_base_url)
+
+        async with self._sem_global, sem_endpoint:
+            dispositivo_folder = os.path.join(self.output_folder, f"proyecto_{proyecto}", codigo_interno)
+            os.makedirs(dispositivo_folder, exist_ok=True)
+            print(f"\n🔄 [{codigo_interno}] Procesando (Proyecto {proyecto}) vía {api_base_url}")
+
+            self.estado.iniciar_dispositivo(dispositivo)
+
+            diario = self._diario(codigo_interno, dispositivo_folder)
+
+            fecha_inicio, fecha_inicio_carpeta, origen = self.determinar_fecha_inicio(
+                dispositivo, dispositivo_folder, diario)
+
+            # Reanudar justo después del último paquete confirmado
+            ultimo = diario.ultimo()
+            cursor_inicial = tuple(ultimo['cursor']) if ultimo and ultimo.get('cursor') else None
+
+            postergado = None
+            if self.presupuesto is not None:
+                corte = datetime.now().replace(microsecond=0) - timedelta(hours=self.horas_recientes)
+                if parsear_fecha_config(fecha_inicio) < corte:
+                    # Datos recientes primero; el tramo atrasado se anota como rezago
+                    # junto con la marca cuando los recientes ya están confirmados
+                    hasta = corte.strftime('%Y-%m-%dT%H:%M:%S')
+                    postergado = (fecha_inicio, hasta)
+                    print(f"[{codigo_interno}] ⏩ Priorizando datos desde {hasta}; "
+                          f"{fecha_inicio} → {hasta} queda para después")
+                    fecha_inicio, fecha_inicio_carpeta = hasta, corte.strftime('%Y-%m-%d')
+                    cursor_inicial = None
+                    origen = 'recientes'
+
+            descarga = self._nueva_descarga(dispositivo, dispositivo_folder, diario,
+                                            fecha_inicio, fecha_inicio_carpeta, cursor_inicial)
+            descarga['limite_tiempo'] = limite_tiempo
+            descarga['postergado'] = postergado
+            inicio = time.perf_counter()
+
+            try:
+                hecho = False
+                if origen == 'sin_datos' and self.backfill and dispositivo.get('backfill', True):
+                    hecho = await self._backfill_dispositivo(descarga)
+                if not hecho:
+                    await self._ejecutar_pipeline(descarga, self._consumidor_paquetes)
+                descarga['terminada'] = True
+            finally:
+                if postergado:
+                    self._postergar_tramo(descarga)
+                self._cerrar_descarga(descarga)
+
+            duracion = time.perf_counter() - inicio
+
+            if not descarga['archivos']:
+                print(f"[{codigo_interno}] ℹ️  No hay nuevos datos ({duracion:.1f}s)")
+                self.estado.finalizar_dispositivo(codigo_interno, 'sin_datos', duracion)
+                return descarga['archivos']
+
+            print(f"[{codigo_interno}] 📊 Resumen: {len(descarga['archivos'])} archivos, "
+                  f"{descarga['total_registros']} registros total ({duracion:.1f}s)")
+
+            if descarga['ultima_fecha']:
+                print(f"[{codigo_interno}] 📅 Estado actualizado: última fecha = {descarga['ultima_fecha']}")
+            else:
+                print(f"[{codigo_interno}] ⚠️  No se pudo determinar la última fecha")
+            self.estado.finalizar_dispositivo(codigo_interno, 'ok', duracion)
+            return descarga['archivos']
+
+    async def _consumidor_rezago(self, descarga, cola):
+        """Confirma los paquetes de un rezago y acorta el tramo pendiente en el estado"""
+        hasta = parsear_fecha_config(descarga['rezago']['hasta'])
+        completo = False
+        while True:
+            item = await cola.get()
+            if item is None:
+                break
+            paquete_num, ruta_parcial, resumen = item
+
+            fecha_max = normalizar_fecha_insercion(resumen['fecha_max'])
+            completo = fecha_max is not None and fecha_max >= hasta
+            if completo:
+                # La página cruzó el corte: quitar las filas que ya bajó la fase de recientes
+                claves = resumen['claves']
+                resumen = await self._ejecutar_en_pool(
+                    recortar_paquete_csv, ruta_parcial, hasta, descarga['columna_desempate'])
+                resumen['claves'] = claves
+                if resumen['filas'] == 0:
+                    os.remove(ruta_parcial)
+                    break
+
+            filename, fecha_max = await self._ejecutar_en_pool(
+                self._confirmar_paquete, descarga, paquete_num, ruta_parcial, resumen)
+            self._registrar_confirmado(descarga, filename, fecha_max, resumen, avanzar_marca=False)
+            if fecha_max:
+                self.estado.avanzar_rezago(descarga['rezago']['id'], fecha_max)
+            if completo:
+                break
+        # Si el productor terminó sin cortar, el servidor ya no tiene filas en el tramo
+        descarga['rezago_completo'] = completo or not descarga.get('interrumpida')
+
+    async def rellenar_rezagos(self, dispositivo, limite_tiempo=None):
+        """
+        Descarga los tramos postergados de un dispositivo, del más antiguo al
+        más reciente, hasta agotar el tiempo.
+
+        Returns:
+            list: Archivos CSV creados
+        """
+        codigo_interno = dispositivo['codigo_interno']
+        archivos = []
+        for rezago in self.estado.rezagos(codigo_interno):
+            if limite_tiempo is not None and time.monotonic() >= limite_tiempo:
+                break
+            async with self._sem_global, self._semaforo_endpoint(self.obtener_api_base(dispositivo)):
+                dispositivo_folder = os.path.join(self.output_folder, f"proyecto_{dispositivo['proyecto']}",
+                                                  codigo_interno)
+                diario = self._diario(codigo_interno, dispositivo_folder)
+                desde = rezago['desde']
+                print(f"[{codigo_interno}] ⏪ Rellenando rezago {desde} → {rezago['hasta']}")
+                descarga = self._nueva_descarga(dispositivo, dispositivo_folder, diario,
+                                                desde, desde[:10], None)
+                descarga['rezago'] = rezago
+                descarga['fecha_fin'] = rezago['hasta']
+                descarga['limite_tiempo'] = limite_tiempo
+                try:
+                    await self._ejecutar_pipeline(descarga, self._consumidor_rezago)
+                finally:
+                    self._cerrar_descarga(descarga)
+                archivos.extend(descarga['archivos'])
+                if descarga.get('rezago_completo'):
+                    self.estado.cerrar_rezago(rezago['id'])
+                    print(f"[{codigo_interno}] ✅ Rezago completo ({descarga['total_registros']} registros)")
+        return archivos
+
+    async def _procesar_rezagos(self, dispositivo, limite_tiempo):
+        """Como _procesar_dispositivo, para el relleno de rezagos"""
+        codigo_interno = dispositivo['codigo_interno']
+        try:
+            return await self.rellenar_rezagos(dispositivo, limite_tiempo)
+        except (CircuitoAbierto, ReintentosAgotados, requests.RequestException) as e:
+            print(f"[{codigo_interno}] ❌ Rezago interrumpido: {e}")
+        except Exception as e:
+            print(f"[{codigo_interno}] ❌ Error rellenando rezago: {e}")
+        return []
+
+    async def _procesar_dispositivo(self, dispositivo, limite_tiempo=None):
+        """
+        Envuelve la descarga para que el error de un dispositivo no afecte al resto.
+
+        Returns:
+            list: Archivos creados (vacía si hubo error)
+        """
+        codigo_interno = dispositivo.get('codigo_interno', '?')
+        inicio = time.perf_counter()
+        try:
+            return await self.descargar_dispositivo(dispositivo, limite_tiempo)
+        except CircuitoAbierto as e:
+            print(f"[{codigo_interno}] ⛔ Fallo rápido: {e}")
+            self.estado.finalizar_dispositivo(codigo_interno, 'circuito_abierto', time.perf_counter() - inicio, str(e))
+        except ReintentosAgotados as e:
+            print(f"[{codigo_interno}] ❌ Descarga detenida: {e} (se reanudará desde la última fecha guardada)")
+            self.estado.finalizar_dispositivo(codigo_interno, 'error', time.perf_counter() - inicio, str(e))
+        except requests.RequestException as e:
+            print(f"[{codigo_interno}] ❌ Error de API: {e}")
+            self.estado.finalizar_dispositivo(codigo_interno, 'error', time.perf_counter() - inicio, str(e))
+        except Exception as e:
+            print(f"[{codigo_interno}] ❌ Error procesando: {e}")
+            self.estado.finalizar_dispositivo(codigo_interno, 'error', time.perf_counter() - inicio, str(e))
+        # El diario sigue abierto: completar o descartar lo que quedó a medias
+        if codigo_interno in self._diarios:
+            self._diarios[codigo_interno].recuperar()
+        return []
+
+    def _circuito(self, api_url):
+        """Circuit breaker del endpoint (se crea al primer uso)"""
+        if api_url not in self.circuitos:
+            self.circuitos[api_url] = Circuito(api_url, self.umbral_circuito, self.enfriamiento_circuito)
+        return self.circuitos[api_url]
+
+    def resumen_ejecucion(self):
+        """Estado de los circuitos por endpoint y reintentos por dispositivo"""
+        return {
+            'circuitos': {url: c.resumen() for url, c in self.circuitos.items()},
+            'reintentos': dict(self.reintentos),
+            'limitador': self.limitador.resumen(),
+            'diferidos': list(self.diferidos),
+            'duplicados': dict(self.duplicados),
+        }
+
+    def _semaforo_endpoint(self, api_url):
+        """Semáforo del endpoint (se crea al primer uso dentro del event loop)"""
+        if api_url not in self._sem_endpoints:
+            self._sem_endpoints[api_url] = asyncio.Semaphore(self.max_por_endpoint)
+        return self._sem_endpoints[api_url]
+
+    def abrir(self):
+        """Crear la sesión HTTP y el pool de hilos (se mantienen entre ciclos)"""
+        self._sesion = self.crear_sesion()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrencia * 2)
+
+    def cerrar(self):
+        """Liberar la sesión HTTP y el pool de hilos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._sesion is not None:
+            self._sesion.close()
+            self._sesion = None
+
+    def preparar_loop(self):
+        """Reiniciar las primitivas asyncio; se llama al comenzar cada event loop"""
+        self.limitador.reiniciar()
+        self._sem_global = asyncio.Semaphore(self.max_concurrencia)
+        self._sem_endpoints = {}
+
+    async def _ejecutar_async(self, dispositivos, limite_tiempo=None):
+        """
+        Lanza la descarga de todos los dispositivos en paralelo y luego, con
+        el tiempo que quede, rellena los rezagos pendientes.
+        """
+        self.preparar_loop()
+        await asyncio.gather(*(self._procesar_dispositivo(d, limite_tiempo) for d in dispositivos))
+
+        con_rezago = {r['codigo_interno'] for r in self.estado.rezagos()}
+        pendientes = [d for d in dispositivos if d['codigo_interno'] in con_rezago]
+        if pendientes:
+            if limite_tiempo is not None:
+                restante = max(0.0, limite_tiempo - time.monotonic())
+                print(f"\n⏪ Rellenando rezagos de {len(pendientes)} dispositivos ({restante:.0f}s disponibles)")
+            else:
+                print(f"\n⏪ Rellenando rezagos de {len(pendientes)} dispositivos")
+            await asyncio.gather(*(self._procesar_rezagos(d, limite_tiempo) for d in pendientes))
+
+    def imprimir_diferidos(self):
+        """Informar los tramos que quedaron para la próxima ejecución"""
+        self.diferidos = self.estado.rezagos()
+        if not self.diferidos:
+            return
+        print(f"⏳ Diferido para la próxima ejecución ({len(self.diferidos)} tramos):")
+        for rezago in self.diferidos:
+            print(f"   • {rezago['codigo_interno']}: {rezago['desde']} → {rezago['hasta']}")
+
+    def imprimir_resumen(self):
+        """Imprimir contadores de tasa, circuitos y reintentos"""
+        resumen = self.resumen_ejecucion()
+        for host, contadores in resumen['limitador'].items():
+            print(f"🚦 {host}: {contadores['esperas']} esperas por tasa, {contadores['pausas']} pausas por Retry-After")
+        for url, circuito in resumen['circuitos'].items():
+            print(f"🔌 {url}: circuito {circuito['estado']} ({circuito['fallos_total']} fallos, "
+                  f"{circuito['aperturas']} aperturas, {circuito['rechazos']} rechazos)")
+        con_reintentos = {codigo: n for codigo, n in resumen['reintentos'].items() if n}
+        if con_reintentos:
+            print("🔁 Reintentos: " + ", ".join(f"{codigo}={n}" for codigo, n in sorted(con_reintentos.items())))
+        con_duplicados = {codigo: n for codigo, n in resumen['duplicados'].items() if n}
+        if con_duplicados:
+            print(f"🧹 Duplicados descartados ({sum(con_duplicados.values())}): "
+                  + ", ".join(f"{codigo}={n}" for codigo, n in sorted(con_duplicados.items())))
+
+    def guardar_metricas(self):
+        """Escribir las métricas acumuladas (JSON y textfile de Prometheus)"""
+        try:
+            ruta_json, ruta_prom = self.metricas.guardar()
+            print(f"📈 Métricas guardadas en {ruta_json} y {ruta_prom}")
+        except OSError as e:
+            print(f"⚠️  No se pudieron guardar las métricas: {e}")
+
+    def ejecutar(self):
+        """
+        Ejecuta una colección completa sobre todos los dispositivos configurados.
+
+        Returns:
+            list: Lista de archivos CSV creados
+        """
+        self.archivos_creados = []
+        dispositivos = self.leer_dispositivos()
+        os.makedirs(self.output_folder, exist_ok=True)
+        self.estado.importar_config(dispositivos)
+
+        print(f"📡 Procesando {len(dispositivos)} dispositivos desde {self.config_path} "
+              f"(concurrencia: {self.max_concurrencia} global, {self.max_por_endpoint} por endpoint)")
+
+        inicio = time.perf_counter()
+        limite_tiempo = None
+        if self.presupuesto is not None:
+            limite_tiempo = time.monotonic() + self.presupuesto
+            print(f"⏱️  Presupuesto de tiempo: {self.presupuesto:.0f}s (primero las últimas "
+                  f"{self.horas_recientes}h de cada dispositivo)")
+        self.metricas.iniciar_ejecucion()
+        self.abrir()
+        try:
+            asyncio.run(self._ejecutar_async(dispositivos, limite_tiempo))
+        finally:
+            self.cerrar()
+            self.metricas.finalizar_ejecucion()
+
+        # Las marcas de agua ya quedaron en el estado; guardar tamaños de paquete y esquemas aprendidos
+        self.controlador.guardar()
+        self.esquemas.guardar()
+        self.imprimir_resumen()
+        self.imprimir_diferidos()
+        self.guardar_metricas()
+
+        print(f"\n✅ Colección completada: {len(self.archivos_creados)} archivos creados "
+              f"en {time.perf_counter() - inicio:.1f}s")
+        return self.archivos_creados
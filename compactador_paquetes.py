@@ -0,0 +1,218 @@
+import os
+import re
+import glob
+import json
+import argparse
+from datetime import datetime, date, timedelta
+
+import pandas as pd
+
+# Columnas que identifican una medición (mismas que el índice de dedup del colector)
+COLUMNAS_CLAVE = ['codigo_interno', 'fecha', 'fecha_insercion']
+PATRON_PAQUETE = re.compile(r'_(?:paquete|push)_\d+_(\d{8})')
+# Paquetes del colector y del receptor push
+PATRONES_ARCHIVO = ('*_paquete_*.csv', '*_push_*.csv')
+
+
+class CompactadorPaquetes:
+    """
+    Compacta los paquetes CSV de días cerrados en un archivo por dispositivo y día.
+
+    Los paquetes de datos/proyecto_X/CODIGO/<fecha>/ se reparten por día de
+    medición y se fusionan en datos/proyecto_X/CODIGO/<día>/CODIGO_dia_YYYYMMDD.csv,
+    ordenados por fecha_insercion y fecha y sin mediciones repetidas. Si el
+    archivo del día ya existe (compactación anterior) se fusiona con él.
+
+    Un paquete se compacta solo si su última fecha_insercion (la fecha en su
+    nombre) es anterior al cierre: el día más reciente con datos del
+    dispositivo (o hoy) menos dias_margen. El colector solo escribe paquetes
+    nuevos y los renombra al terminar, así que puede seguir corriendo
+    mientras se compacta.
+
+    Cada archivo de día se escribe en un temporal y se renombra; los
+    paquetes de origen se borran recién después de escribir los días y el
+    manifiesto (manifest_compactacion.json). Si el proceso se corta antes,
+    la siguiente compactación los vuelve a fusionar sin duplicar filas.
+    """
+
+    NOMBRE_MANIFIESTO = 'manifest_compactacion.json'
+
+    def __init__(self, datos_folder='datos', dias_margen=1, borrar_origen=True):
+        self.datos_folder = datos_folder
+        self.dias_margen = dias_margen
+        self.borrar_origen = borrar_origen
+
+    @staticmethod
+    def fecha_paquete(ruta):
+        """Fecha (última fecha_insercion) en el nombre del paquete o None"""
+        coincidencia = PATRON_PAQUETE.search(os.path.basename(ruta))
+        if not coincidencia:
+            return None
+        try:
+            return datetime.strptime(coincidencia.group(1), '%Y%m%d').date()
+        except ValueError:
+            return None
+
+    def escanear_dispositivos(self):
+        """Carpetas de dispositivo (proyecto_X/CODIGO) bajo la carpeta de datos"""
+        return sorted(d for d in glob.glob(os.path.join(self.datos_folder, 'proyecto_*', '*')) if os.path.isdir(d))
+
+    def paquetes_cerrados(self, dispositivo_folder):
+        """
+        Paquetes CSV del dispositivo (del colector o del receptor push) que
+        pertenecen a días cerrados.
+
+        Returns:
+            tuple: (lista de rutas, fecha de cierre)
+        """
+        paquetes = {}
+        rutas = [r for patron in PATRONES_ARCHIVO for r in glob.glob(os.path.join(dispositivo_folder, '*', patron))]
+        for ruta in rutas:
+            fecha = self.fecha_paquete(ruta)
+            if fecha is not None:
+                paquetes[ruta] = fecha
+        if not paquetes:
+            return [], None
+        cierre = min(date.today(), max(paquetes.values())) - timedelta(days=self.dias_margen)
+        return sorted(r for r, fecha in paquetes.items() if fecha < cierre), cierre
+
+    def cargar_manifiesto(self, dispositivo_folder):
+        ruta = os.path.join(dispositivo_folder, self.NOMBRE_MANIFIESTO)
+        if not os.path.exists(ruta):
+            return {'dias': {}}
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def escribir_atomico(ruta, escribir):
+        """Escribe con escribir(f) en un temporal, fuerza a disco y renombra"""
+        ruta_tmp = ruta + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8', newline='') as f:
+            escribir(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_tmp, ruta)
+
+    @staticmethod
+    def ordenar_y_deduplicar(df):
+        """Ordena por fecha_insercion y fecha y quita mediciones repetidas"""
+        orden = [c for c in ('fecha_insercion', 'fecha') if c in df.columns]
+        if orden:
+            df = df.sort_values(orden, kind='stable', key=lambda c: pd.to_datetime(c, errors='coerce'))
+        clave = [c for c in COLUMNAS_CLAVE if c in df.columns]
+        df = df.drop_duplicates(subset=clave if len(clave) == len(COLUMNAS_CLAVE) else None)
+        return df.reset_index(drop=True)
+
+    def compactar_dispositivo(self, dispositivo_folder):
+        """
+        Compacta los días cerrados de un dispositivo.
+
+        Returns:
+            dict: dias, paquetes, filas y duplicados eliminados
+        """
+        codigo_interno = os.path.basename(dispositivo_folder)
+        paquetes, cierre = self.paquetes_cerrados(dispositivo_folder)
+        resultado = {'dias': 0, 'paquetes': len(paquetes), 'filas': 0, 'duplicados': 0}
+        if not paquetes:
+            return resultado
+
+        print(f"  📱 {codigo_interno}: {len(paquetes)} paquetes anteriores a {cierre}")
+
+        # Repartir las filas de cada paquete por día de medición
+        por_dia = {}
+        fuentes = {}
+        leidos = []  # solo estos se incorporan a los archivos diarios y se borran
+        for ruta in paquetes:
+            try:
+                df = pd.read_csv(ruta, dtype=str, keep_default_na=False)
+            except Exception as e:
+                print(f"    ⚠️ Error leyendo {ruta}: {e} (se deja sin compactar)")
+                continue
+            leidos.append(ruta)
+            if df.empty:
+                continue
+            columna_dia = 'fecha' if 'fecha' in df.columns else 'fecha_insercion'
+            dias = pd.to_datetime(df[columna_dia], errors='coerce').dt.strftime('%Y-%m-%d')
+            dias = dias.fillna(self.fecha_paquete(ruta).strftime('%Y-%m-%d'))
+            for dia, grupo in df.groupby(dias):
+                por_dia.setdefault(dia, []).append(grupo)
+                fuentes.setdefault(dia, []).append({
+                    'ruta': os.path.relpath(ruta, dispositivo_folder),
+                    'bytes': os.path.getsize(ruta),
+                    'filas': len(grupo),
+                })
+
+        resultado['paquetes'] = len(leidos)
+        manifiesto = self.cargar_manifiesto(dispositivo_folder)
+        for dia, partes in sorted(por_dia.items()):
+            carpeta_dia = os.path.join(dispositivo_folder, dia)
+            os.makedirs(carpeta_dia, exist_ok=True)
+            archivo = f"{codigo_interno}_dia_{dia.replace('-', '')}.csv"
+            ruta_dia = os.path.join(carpeta_dia, archivo)
+            if os.path.exists(ruta_dia):
+                partes = [pd.read_csv(ruta_dia, dtype=str, keep_default_na=False)] + partes
+
+            df_dia = pd.concat(partes, ignore_index=True)
+            filas_entrada = len(df_dia)
+            df_dia = self.ordenar_y_deduplicar(df_dia)
+            self.escribir_atomico(ruta_dia, lambda f: df_dia.to_csv(f, index=False))
+
+            entrada = manifiesto['dias'].setdefault(dia, {'archivo': os.path.join(dia, archivo), 'fuentes': []})
+            # Con --conservar los mismos paquetes vuelven a pasar: una fuente por ruta
+            por_ruta = {fuente['ruta']: fuente for fuente in entrada['fuentes'] + fuentes[dia]}
+            entrada['fuentes'] = [por_ruta[ruta] for ruta in sorted(por_ruta)]
+            entrada['filas'] = len(df_dia)
+            entrada['actualizado'] = datetime.now().isoformat(timespec='seconds')
+            resultado['dias'] += 1
+            resultado['filas'] += len(df_dia)
+            resultado['duplicados'] += filas_entrada - len(df_dia)
+
+        self.escribir_atomico(os.path.join(dispositivo_folder, self.NOMBRE_MANIFIESTO),
+                              lambda f: json.dump(manifiesto, f, ensure_ascii=False, indent=2))
+
+        if self.borrar_origen:
+            for ruta in leidos:
+                os.remove(ruta)
+            # Quitar carpetas de fecha que quedaron vacías
+            for carpeta in {os.path.dirname(r) for r in leidos}:
+                if os.path.isdir(carpeta) and not os.listdir(carpeta):
+                    os.rmdir(carpeta)
+
+        print(f"     ✅ {resultado['dias']} días compactados ({resultado['filas']:,} filas, "
+              f"{resultado['duplicados']} duplicados eliminados)")
+        return resultado
+
+    def ejecutar(self):
+        """
+        Compacta todos los dispositivos de la carpeta de datos.
+
+        Returns:
+            dict: Totales de días, paquetes, filas y duplicados
+        """
+        print("🗜️  INICIANDO COMPACTACIÓN DE PAQUETES")
+        print("=" * 50)
+        totales = {'dias': 0, 'paquetes': 0, 'filas': 0, 'duplicados': 0}
+        for dispositivo_folder in self.escanear_dispositivos():
+            try:
+                resultado = self.compactar_dispositivo(dispositivo_folder)
+            except Exception as e:
+                print(f"  ❌ Error compactando {dispositivo_folder}: {e}")
+                continue
+            for clave in totales:
+                totales[clave] += resultado[clave]
+
+        print(f"\n📦 {totales['paquetes']} paquetes → {totales['dias']} archivos diarios "
+              f"({totales['filas']:,} filas, {totales['duplicados']} duplicados eliminados)")
+        return totales
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta los paquetes CSV de días cerrados en archivos diarios")
+    parser.add_argument('--datos', default='datos', help="Carpeta de datos del colector")
+    parser.add_argument('--dias-margen', type=int, default=1,
+                        help="Días antes del último día con datos que se consideran abiertos")
+    parser.add_argument('--conservar', action='store_true', help="No borrar los paquetes de origen")
+    args = parser.parse_args()
+
+    CompactadorPaquetes(args.datos, args.dias_margen, borrar_origen=not args.conservar).ejecutar()
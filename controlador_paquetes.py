@@ -0,0 +1,71 @@
+import os
+import json
+
+
+class ControladorPaquetes:
+    """
+    Ajusta el tamaño de paquete (parámetro limite) de cada endpoint.
+
+    Mientras las respuestas llegan por debajo de la latencia objetivo el
+    tamaño se duplica; si se acercan al objetivo se reduce un poco, y ante un
+    524 o un timeout se reduce a la mitad y se marca un techo para no volver a
+    crecer hasta el tamaño que falló. Los tamaños aprendidos se guardan en un
+    archivo JSON para reutilizarlos en la siguiente ejecución.
+    """
+
+    def __init__(self, archivo_estado='limites_endpoints.json', limite_inicial=100,
+                 limite_min=50, limite_max=5000, latencia_objetivo=20.0):
+        self.archivo_estado = archivo_estado
+        self.limite_inicial = limite_inicial
+        self.limite_min = limite_min
+        self.limite_max = limite_max
+        self.latencia_objetivo = latencia_objetivo
+        self.endpoints = self.cargar()
+
+    def cargar(self):
+        """Cargar los límites aprendidos en ejecuciones anteriores"""
+        if not self.archivo_estado or not os.path.exists(self.archivo_estado):
+            return {}
+        try:
+            with open(self.archivo_estado, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  No se pudieron leer los límites de paquete ({e}), usando valores iniciales")
+            return {}
+
+    def guardar(self):
+        """Guardar los límites aprendidos para la próxima ejecución"""
+        if not self.archivo_estado:
+            return
+        with open(self.archivo_estado, 'w', encoding='utf-8') as f:
+            json.dump(self.endpoints, f, indent=4, ensure_ascii=False)
+
+    def _estado(self, api_url):
+        if api_url not in self.endpoints:
+            self.endpoints[api_url] = {'limite': self.limite_inicial, 'techo': self.limite_max}
+        return self.endpoints[api_url]
+
+    def limite(self, api_url):
+        """Tamaño de paquete a usar en la próxima petición al endpoint"""
+        estado = self._estado(api_url)
+        return max(self.limite_min, min(int(estado['limite']), int(estado['techo']), self.limite_max))
+
+    def registrar_exito(self, api_url, latencia, filas, limite_usado):
+        """
+        Registra una respuesta correcta y ajusta el tamaño.
+
+        Solo se crece cuando el paquete vino lleno; un paquete parcial no dice
+        nada sobre cuánto tardaría uno más grande.
+        """
+        estado = self._estado(api_url)
+        if latencia > self.latencia_objetivo:
+            estado['limite'] = max(self.limite_min, int(limite_usado * 0.75))
+        elif filas >= limite_usado and latencia < self.latencia_objetivo / 2:
+            estado['limite'] = min(int(estado['techo']), self.limite_max, limite_usado * 2)
+
+    def registrar_timeout(self, api_url, limite_usado):
+        """Registra un 524/timeout: reduce el tamaño a la mitad y fija un techo"""
+        estado = self._estado(api_url)
+        estado['techo'] = max(self.limite_min, int(limite_usado * 0.8))
+        estado['limite'] = max(self.limite_min, limite_usado // 2)
+        return estado['limite']
@@ -2,6 +2,7 @@ import pandas as pd
 import os
 from datetime import datetime, timedelta, date
 import glob
+from almacen_parquet import leer_archivo_datos
 
 def encontrar_dias_faltantes():
     """
@@ -19,13 +20,14 @@ def encontrar_dias_faltantes():
         ruta_carpeta = os.path.join(carpeta_datos, carpeta)
         
         if os.path.isdir(ruta_carpeta):
-            # Buscar archivos CSV en la carpeta
+            # Buscar archivos CSV en la carpeta y Parquet en sus carpetas por día
             archivos_csv = glob.glob(os.path.join(ruta_carpeta, "*.csv"))
+            archivos_csv += glob.glob(os.path.join(ruta_carpeta, "**", "*.parquet"), recursive=True)
             
             for archivo_csv in archivos_csv:
                 try:
-                    # Leer el archivo CSV
-                    df = pd.read_csv(archivo_csv)
+                    # Leer el archivo CSV o Parquet
+                    df = leer_archivo_datos(archivo_csv)
                     
                     # Verificar que existan las columnas necesarias
                     if 'fecha' not in df.columns or 'codigo_interno' not in df.columns or 'fecha_insercion' not in df.columns:
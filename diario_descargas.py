@@ -0,0 +1,167 @@
+import os
+import json
+import glob
+import threading
+from datetime import datetime
+
+
+class DiarioDescargas:
+    """
+    Diario de escritura anticipada (write-ahead) de los paquetes de un dispositivo.
+
+    Cada paquete se escribe primero como archivo .parcial; luego se agrega
+    al diario una línea con el nombre definitivo, los registros, la última
+    fecha_insercion y el cursor, y recién entonces se renombra al nombre
+    final. Si el proceso muere en cualquier punto, recuperar() completa los
+    renombres ya anotados y elimina los .parcial huérfanos, y la siguiente
+    ejecución reanuda desde el último paquete confirmado.
+
+    Un paquete guardado en Parquet se agrega al archivo de cada día que
+    toca: la entrada lleva en 'archivos' los renombres [carpeta, parcial,
+    archivo] de cada día (el parcial reemplaza al archivo del día) y el
+    .parcial CSV original se descarta.
+
+    Las entradas de paquetes push llevan origen='push' y no cuentan para
+    ultimo() ni siguiente_paquete(). Una misma instancia se puede compartir
+    entre hilos (colector y receptor push en el mismo proceso); el último
+    número de paquete de cada carpeta se busca en disco una sola vez y
+    luego lo mantiene registrar(), así una consulta sin datos nuevos no
+    recorre la carpeta de fecha.
+    """
+
+    NOMBRE_ARCHIVO = 'diario_descargas.jsonl'
+
+    def __init__(self, dispositivo_folder, max_entradas=500, nombre_archivo=NOMBRE_ARCHIVO):
+        self.dispositivo_folder = dispositivo_folder
+        self.ruta = os.path.join(dispositivo_folder, nombre_archivo)
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._numeros = {}
+        self.entradas = self.leer()
+
+    def leer(self):
+        """Leer las entradas confirmadas (se ignora una última línea incompleta)"""
+        entradas = []
+        if not os.path.exists(self.ruta):
+            return entradas
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    entradas.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    # Línea cortada por un corte del proceso: nunca se confirmó
+                    continue
+        return entradas
+
+    def recuperar(self, patron='*.parcial'):
+        """
+        Dejar el disco consistente con el diario tras un posible corte.
+
+        Args:
+            patron (str): Archivos en vuelo a revisar en las carpetas de fecha
+                ('*.parcial' del colector, '*.push' del receptor push)
+
+        Returns:
+            tuple: (renombres completados, parciales eliminados)
+        """
+        entradas = list(self.entradas)
+        anotados = {(e['carpeta'], e['parcial']): (e['archivo'], False) for e in entradas
+                    if e.get('parcial') and e.get('archivo')}
+        for entrada in entradas:
+            for carpeta, parcial, archivo in entrada.get('archivos') or []:
+                anotados[(carpeta, parcial)] = (archivo, True)
+        completados = eliminados = 0
+
+        for ruta_parcial in glob.glob(os.path.join(self.dispositivo_folder, '*', patron)):
+            carpeta = os.path.basename(os.path.dirname(ruta_parcial))
+            archivo, reemplaza = anotados.get((carpeta, os.path.basename(ruta_parcial)), (None, False))
+            ruta_final = os.path.join(os.path.dirname(ruta_parcial), archivo) if archivo else None
+            if ruta_final and (reemplaza or not os.path.exists(ruta_final)):
+                os.replace(ruta_parcial, ruta_final)
+                completados += 1
+            else:
+                os.remove(ruta_parcial)
+                eliminados += 1
+
+        return completados, eliminados
+
+    def ultimo(self):
+        """Última entrada confirmada del colector (sin contar paquetes push) o None"""
+        return next((e for e in reversed(list(self.entradas)) if e.get('origen') != 'push'), None)
+
+    def siguiente_paquete(self, carpeta):
+        """Número del próximo paquete en la carpeta de fecha (no pisa paquetes previos)"""
+        with self._lock:
+            if carpeta not in self._numeros:
+                numeros = [e['paquete'] for e in self.entradas
+                           if e.get('carpeta') == carpeta and e.get('origen') != 'push']
+                archivos = 0
+                for ruta in glob.glob(os.path.join(self.dispositivo_folder, carpeta, '*')):
+                    nombre = os.path.basename(ruta)
+                    if nombre.endswith('.parquet'):
+                        # Los Parquet de día no llevan número: cada uno cuenta como un paquete, así
+                        # la numeración no vuelve a empezar cuando el diario ya se recortó
+                        archivos += 1
+                    elif '_paquete_' in nombre and nombre.endswith('.csv'):
+                        archivos += 1
+                        try:
+                            numeros.append(int(nombre.split('_paquete_')[1].split('_')[0]))
+                        except (IndexError, ValueError):
+                            continue
+                self._numeros[carpeta] = max(numeros + [archivos])
+            return self._numeros[carpeta] + 1
+
+    def registrar(self, carpeta, parcial, archivo, paquete, registros, bytes_escritos,
+                  fecha_max=None, cursor=None, archivos=None, origen=None, rezago=None):
+        """
+        Anotar de forma durable un paquete antes de darle su nombre definitivo.
+
+        rezago ([desde, hasta]) es el tramo postergado por una descarga de
+        recientes que todavía no se anotó en el estado.
+        """
+        entrada = {
+            'carpeta': carpeta,
+            'parcial': parcial,
+            'archivo': archivo,
+            'paquete': paquete,
+            'registros': registros,
+            'bytes': bytes_escritos,
+            'fecha_max': fecha_max,
+            'cursor': list(cursor) if cursor else None,
+            'confirmado': datetime.now().isoformat(timespec='seconds'),
+        }
+        if archivos:
+            entrada['archivos'] = archivos
+        if origen:
+            entrada['origen'] = origen
+        if rezago:
+            entrada['rezago'] = list(rezago)
+        with self._lock:
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.entradas.append(entrada)
+            if carpeta in self._numeros and origen != 'push':
+                self._numeros[carpeta] = max(self._numeros[carpeta], paquete)
+            if len(self.entradas) > self.max_entradas * 2:
+                self._compactar()
+        return entrada
+
+    def compactar(self):
+        """Reescribir el diario con las últimas entradas (archivo temporal y rename)"""
+        with self._lock:
+            self._compactar()
+
+    def _compactar(self):
+        self.entradas = self.entradas[-self.max_entradas:]
+        ruta_tmp = self.ruta + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            for entrada in self.entradas:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_tmp, self.ruta)
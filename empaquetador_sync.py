@@ -0,0 +1,306 @@
+import io
+import os
+import re
+import glob
+import json
+import time
+import tarfile
+import argparse
+from datetime import datetime, date, timedelta
+
+from sincronizador_onedrive import hash_archivo
+
+try:
+    import zstandard
+    ZSTD_DISPONIBLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_DISPONIBLE = False
+
+# Carpetas de fecha del colector y del compactador: proyecto_X/CODIGO/YYYY-MM-DD/
+PATRON_CARPETA_FECHA = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+EXTENSIONES_DATOS = ('.csv', '.parquet')
+EXTENSIONES_PAQUETE = {'gz': '.tar.gz', 'zst': '.tar.zst'}
+# Índice de cada archivo empaquetado, primer miembro del tar
+MIEMBRO_INDICE = '__indice__.json'
+
+
+def _abrir_escritura(ruta, compresion, nivel=None):
+    """Abre un tar de escritura comprimido; devuelve (tar, objetos a cerrar después del tar)"""
+    if compresion == 'zst':
+        f = open(ruta, 'wb')
+        escritor = zstandard.ZstdCompressor(level=nivel or 10).stream_writer(f)
+        return tarfile.open(fileobj=escritor, mode='w|'), [escritor, f]
+    return tarfile.open(ruta, mode='w:gz', compresslevel=nivel or 6), []
+
+
+def _abrir_lectura(ruta):
+    """Abre un tar comprimido (gzip o zstd según la extensión) para leerlo en secuencia"""
+    if ruta.endswith(EXTENSIONES_PAQUETE['zst']):
+        if not ZSTD_DISPONIBLE:
+            raise ImportError("zstandard no está instalado: no se pueden leer paquetes .tar.zst")
+        f = open(ruta, 'rb')
+        lector = zstandard.ZstdDecompressor().stream_reader(f)
+        return tarfile.open(fileobj=lector, mode='r|'), [lector, f]
+    return tarfile.open(ruta, mode='r|gz'), []
+
+
+def extraer_paquete(ruta_paquete, destino, verificar=True):
+    """
+    Restaura los archivos de un paquete en destino (la carpeta de datos).
+
+    Con verificar se comprueba tamaño y hash de cada archivo contra el
+    índice que viaja dentro del paquete.
+
+    Returns:
+        list: Rutas relativas restauradas
+    """
+    tar, extra = _abrir_lectura(ruta_paquete)
+    indice = None
+    restaurados = []
+    try:
+        for miembro in tar:
+            if miembro.name == MIEMBRO_INDICE:
+                indice = json.loads(tar.extractfile(miembro).read())
+                continue
+            tar.extract(miembro, destino, filter='data')
+            restaurados.append(miembro.name)
+    finally:
+        tar.close()
+        for objeto in extra:
+            objeto.close()
+
+    if verificar and indice is not None:
+        for relativa in restaurados:
+            esperado = indice['archivos'].get(relativa)
+            ruta = os.path.join(destino, *relativa.split('/'))
+            if esperado is None or os.path.getsize(ruta) != esperado['bytes'] or hash_archivo(ruta) != esperado['hash']:
+                raise ValueError(f"{relativa} no coincide con el índice de {os.path.basename(ruta_paquete)}")
+    return restaurados
+
+
+class EmpaquetadorSync:
+    """
+    Empaqueta los días (o meses) cerrados de la carpeta de datos en archivos
+    tar comprimidos para sincronizarlos en lugar de cientos de CSV sueltos.
+
+    Se genera un paquete por proyecto y periodo con todos los archivos de
+    datos de sus carpetas de fecha (proyecto_X/CODIGO/YYYY-MM-DD/):
+    salida/proyecto_X/proyecto_X_YYYY-MM-DD.tar.gz (o _YYYY-MM con
+    agrupacion='mes', o .tar.zst si zstandard está instalado). Un periodo
+    está cerrado cuando termina antes de hoy menos dias_margen.
+
+    salida/indice_sync.json guarda por paquete los archivos que contiene
+    (tamaño, mtime y hash); si un periodo cerrado recibe o cambia archivos
+    (compactación, descargas atrasadas) su paquete se vuelve a armar, y si
+    no, no se toca. Cada paquete lleva además su propio índice como primer
+    miembro para que extraer_paquete pueda verificar lo restaurado sin el
+    índice general. Los archivos de datos originales no se modifican, así
+    que salida es una segunda copia local (comprimida) de los periodos
+    cerrados; se conserva porque el índice compara contra ella para no
+    volver a armar los paquetes, y puede apuntar a otro disco.
+    """
+
+    NOMBRE_INDICE = 'indice_sync.json'
+
+    def __init__(self, datos_folder='datos', salida='paquetes_sync', agrupacion='dia', compresion='gz',
+                 dias_margen=1, nivel=None):
+        if agrupacion not in ('dia', 'mes'):
+            raise ValueError(f"agrupacion desconocida: {agrupacion}")
+        if compresion not in EXTENSIONES_PAQUETE:
+            raise ValueError(f"compresion desconocida: {compresion}")
+        if compresion == 'zst' and not ZSTD_DISPONIBLE:
+            print("⚠️  zstandard no está instalado: los paquetes se comprimirán con gzip")
+            compresion = 'gz'
+        self.datos_folder = datos_folder
+        self.salida = salida
+        self.agrupacion = agrupacion
+        self.compresion = compresion
+        self.dias_margen = dias_margen
+        self.nivel = nivel
+        self.ruta_indice = os.path.join(salida, self.NOMBRE_INDICE)
+        self.indice = self.cargar_indice()
+
+    def cargar_indice(self):
+        if not os.path.exists(self.ruta_indice):
+            return {'paquetes': {}}
+        with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def guardar_indice(self):
+        """Escribe el índice en un temporal y lo renombra"""
+        os.makedirs(self.salida, exist_ok=True)
+        self.indice['actualizado'] = datetime.now().isoformat(timespec='seconds')
+        ruta_tmp = self.ruta_indice + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.indice, f, indent=1, ensure_ascii=False)
+        os.replace(ruta_tmp, self.ruta_indice)
+
+    def periodo(self, dia):
+        """Periodo de un día: 'YYYY-MM-DD' o 'YYYY-MM' según la agrupación"""
+        return dia.isoformat() if self.agrupacion == 'dia' else dia.strftime('%Y-%m')
+
+    def fin_periodo(self, dia):
+        """Último día del periodo que contiene dia"""
+        if self.agrupacion == 'dia':
+            return dia
+        siguiente = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return siguiente - timedelta(days=1)
+
+    def periodos_cerrados(self):
+        """
+        Archivos de datos de los periodos cerrados, por proyecto y periodo.
+
+        Returns:
+            dict: {(proyecto, periodo): [rutas relativas a datos_folder con '/']}
+        """
+        cierre = date.today() - timedelta(days=self.dias_margen)
+        periodos = {}
+        for carpeta in glob.glob(os.path.join(self.datos_folder, 'proyecto_*', '*', '*')):
+            nombre = os.path.basename(carpeta)
+            if not os.path.isdir(carpeta) or not PATRON_CARPETA_FECHA.match(nombre):
+                continue
+            try:
+                dia = datetime.strptime(nombre, '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            if self.fin_periodo(dia) >= cierre:
+                continue
+            proyecto = os.path.basename(os.path.dirname(os.path.dirname(carpeta)))
+            for archivo in sorted(os.listdir(carpeta)):
+                if archivo.endswith(EXTENSIONES_DATOS):
+                    relativa = os.path.relpath(os.path.join(carpeta, archivo), self.datos_folder)
+                    periodos.setdefault((proyecto, self.periodo(dia)), []).append(relativa.replace(os.sep, '/'))
+        return {clave: sorted(rutas) for clave, rutas in sorted(periodos.items())}
+
+    def _firma(self, rutas):
+        firma = {}
+        for relativa in rutas:
+            stat = os.stat(os.path.join(self.datos_folder, *relativa.split('/')))
+            firma[relativa] = {'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        return firma
+
+    def armar_paquete(self, proyecto, periodo, rutas):
+        """
+        Escribe el paquete de un proyecto y periodo (temporal y rename).
+
+        Returns:
+            dict: Entrada del índice para el paquete
+        """
+        nombre = f"{proyecto}/{proyecto}_{periodo}{EXTENSIONES_PAQUETE[self.compresion]}"
+        destino = os.path.join(self.salida, *nombre.split('/'))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+        archivos = {}
+        for relativa, firma in self._firma(rutas).items():
+            archivos[relativa] = dict(firma, hash=hash_archivo(os.path.join(self.datos_folder, *relativa.split('/'))))
+        indice_paquete = json.dumps({'proyecto': proyecto, 'periodo': periodo, 'archivos': archivos},
+                                    indent=1, ensure_ascii=False).encode('utf-8')
+
+        ruta_tmp = destino + '.tmp'
+        tar, extra = _abrir_escritura(ruta_tmp, self.compresion, self.nivel)
+        try:
+            info = tarfile.TarInfo(MIEMBRO_INDICE)
+            info.size = len(indice_paquete)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(indice_paquete))
+            for relativa in rutas:
+                tar.add(os.path.join(self.datos_folder, *relativa.split('/')), arcname=relativa, recursive=False)
+        finally:
+            tar.close()
+            for objeto in extra:
+                objeto.close()
+        os.replace(ruta_tmp, destino)
+
+        return {
+            'proyecto': proyecto,
+            'periodo': periodo,
+            'compresion': self.compresion,
+            'archivos': archivos,
+            'bytes_originales': sum(a['bytes'] for a in archivos.values()),
+            'bytes_comprimidos': os.path.getsize(destino),
+            'creado': datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def empaquetar(self):
+        """
+        Arma los paquetes de los periodos cerrados que faltan o cambiaron.
+
+        Returns:
+            dict: paquetes (armados), sin_cambios, archivos, bytes_originales y bytes_comprimidos
+        """
+        print("📦 EMPAQUETANDO PERIODOS CERRADOS PARA SINCRONIZAR")
+        print("=" * 50)
+        resumen = {'paquetes': 0, 'sin_cambios': 0, 'archivos': 0, 'bytes_originales': 0, 'bytes_comprimidos': 0}
+        paquetes = self.indice['paquetes']
+        por_periodo = {(p['proyecto'], p['periodo']): nombre for nombre, p in paquetes.items()}
+
+        for (proyecto, periodo), rutas in self.periodos_cerrados().items():
+            anterior = por_periodo.get((proyecto, periodo))
+            firma = self._firma(rutas)
+            if anterior is not None and os.path.exists(os.path.join(self.salida, *anterior.split('/'))):
+                registrados = {r: {'bytes': a['bytes'], 'mtime_ns': a['mtime_ns']}
+                               for r, a in paquetes[anterior]['archivos'].items()}
+                if registrados == firma:
+                    resumen['sin_cambios'] += 1
+                    continue
+            try:
+                entrada = self.armar_paquete(proyecto, periodo, rutas)
+            except Exception as e:
+                print(f"  ❌ Error empaquetando {proyecto} {periodo}: {e}")
+                continue
+            nombre = f"{proyecto}/{proyecto}_{periodo}{EXTENSIONES_PAQUETE[self.compresion]}"
+            if anterior is not None and anterior != nombre:
+                # Cambió la compresión: el paquete viejo queda reemplazado por el nuevo
+                paquetes.pop(anterior, None)
+                ruta_anterior = os.path.join(self.salida, *anterior.split('/'))
+                if os.path.exists(ruta_anterior):
+                    os.remove(ruta_anterior)
+            paquetes[nombre] = entrada
+            resumen['paquetes'] += 1
+            resumen['archivos'] += len(rutas)
+            resumen['bytes_originales'] += entrada['bytes_originales']
+            resumen['bytes_comprimidos'] += entrada['bytes_comprimidos']
+            print(f"  🗜️  {nombre}: {len(rutas)} archivos, {entrada['bytes_originales']:,} → "
+                  f"{entrada['bytes_comprimidos']:,} bytes")
+
+        if resumen['paquetes']:
+            self.guardar_indice()
+        proporcion = (resumen['bytes_comprimidos'] / resumen['bytes_originales']
+                      if resumen['bytes_originales'] else 0)
+        print(f"✅ {resumen['paquetes']} paquetes armados ({resumen['archivos']} archivos, "
+              f"{proporcion:.1%} del tamaño original), {resumen['sin_cambios']} sin cambios")
+        return resumen
+
+    def archivos_empaquetados(self):
+        """Rutas relativas a datos_folder que ya viajan dentro de un paquete al día"""
+        empaquetados = set()
+        for nombre, paquete in self.indice['paquetes'].items():
+            if not os.path.exists(os.path.join(self.salida, *nombre.split('/'))):
+                continue
+            for relativa, archivo in paquete['archivos'].items():
+                ruta = os.path.join(self.datos_folder, *relativa.split('/'))
+                if os.path.exists(ruta) and os.stat(ruta).st_mtime_ns == archivo['mtime_ns']:
+                    empaquetados.add(relativa)
+        return empaquetados
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Empaqueta días o meses cerrados en tar comprimidos para sincronizar, o los restaura")
+    parser.add_argument('--datos', default='datos', help="Carpeta de datos del colector")
+    parser.add_argument('--salida', default='paquetes_sync', help="Carpeta de los paquetes y su índice")
+    parser.add_argument('--agrupacion', choices=['dia', 'mes'], default='dia')
+    parser.add_argument('--compresion', choices=sorted(EXTENSIONES_PAQUETE), default='gz')
+    parser.add_argument('--dias-margen', type=int, default=1, help="Días recientes que se consideran abiertos")
+    parser.add_argument('--extraer', nargs='+', metavar='PAQUETE', default=None,
+                        help="Restaurar estos paquetes en --datos en lugar de empaquetar")
+    args = parser.parse_args()
+
+    if args.extraer:
+        for ruta_paquete in args.extraer:
+            restaurados = extraer_paquete(ruta_paquete, args.datos)
+            print(f"📂 {os.path.basename(ruta_paquete)}: {len(restaurados)} archivos restaurados en {args.datos}")
+    else:
+        EmpaquetadorSync(args.datos, args.salida, args.agrupacion, args.compresion, args.dias_margen).empaquetar()
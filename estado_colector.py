@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class EstadoColector:
+    """
+    Almacén SQLite del estado del colector.
+
+    Guarda por dispositivo la marca de agua (última fecha_insercion
+    descargada), el estado de la última ejecución, los contadores de paquetes
+    y registros, los tiempos y los tramos postergados (rezagos). Cada
+    paquete se registra en su propia transacción, así un corte a mitad de
+    ejecución no pierde el avance de los dispositivos ya procesados y
+    config.json queda como configuración estática.
+    """
+
+    def __init__(self, ruta_db='estado_colector.db'):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute('PRAGMA synchronous=NORMAL')
+        self.crear_tablas()
+
+    def crear_tablas(self):
+        """Crear las tablas si no existen"""
+        with self._lock, self._conexion:
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS dispositivos (
+                    codigo_interno TEXT PRIMARY KEY,
+                    proyecto INTEGER,
+                    api_url TEXT,
+                    ultima_fecha TEXT,
+                    estado TEXT,
+                    error TEXT,
+                    ultimo_inicio TEXT,
+                    ultimo_fin TEXT,
+                    duracion_ultima REAL,
+                    paquetes_ultima INTEGER DEFAULT 0,
+                    registros_ultima INTEGER DEFAULT 0,
+                    paquetes_total INTEGER DEFAULT 0,
+                    registros_total INTEGER DEFAULT 0
+                )
+            """)
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS rezagos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    codigo_interno TEXT NOT NULL,
+                    desde TEXT NOT NULL,
+                    hasta TEXT NOT NULL,
+                    creado TEXT
+                )
+            """)
+
+    def cerrar(self):
+        """Cerrar la conexión a la base de datos"""
+        with self._lock:
+            self._conexion.close()
+
+    def importar_config(self, dispositivos):
+        """
+        Importa las ultima_fecha existentes en config.json.
+
+        Solo se importan los dispositivos que aún no están en la base, por lo
+        que la importación ocurre una única vez por dispositivo.
+
+        Returns:
+            int: Cantidad de dispositivos importados
+        """
+        importados = 0
+        with self._lock, self._conexion:
+            for dispositivo in dispositivos:
+                cursor = self._conexion.execute(
+                    "INSERT OR IGNORE INTO dispositivos (codigo_interno, proyecto, api_url, ultima_fecha) "
+                    "VALUES (?, ?, ?, ?)",
+                    (dispositivo['codigo_interno'], dispositivo.get('proyecto'),
+                     dispositivo.get('api_url'), dispositivo.get('ultima_fecha')))
+                importados += cursor.rowcount
+        if importados:
+            print(f"📥 Importados {importados} dispositivos desde la configuración al estado del colector")
+        return importados
+
+    def obtener_ultima_fecha(self, codigo_interno):
+        """Marca de agua del dispositivo o None si no tiene"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT ultima_fecha FROM dispositivos WHERE codigo_interno = ?",
+                (codigo_interno,)).fetchone()
+        return fila[0] if fila else None
+
+    def iniciar_dispositivo(self, dispositivo):
+        """Marcar el inicio de la descarga de un dispositivo"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO dispositivos (codigo_interno) VALUES (?)",
+                (dispositivo['codigo_interno'],))
+            self._conexion.execute(
+                "UPDATE dispositivos SET proyecto = ?, api_url = ?, estado = 'en_curso', error = NULL, "
+                "ultimo_inicio = ?, paquetes_ultima = 0, registros_ultima = 0 WHERE codigo_interno = ?",
+                (dispositivo.get('proyecto'), dispositivo.get('api_url'),
+                 datetime.now().isoformat(timespec='seconds'), dispositivo['codigo_interno']))
+
+    def registrar_paquete(self, codigo_interno, registros, fecha_max=None):
+        """
+        Registrar un paquete confirmado y avanzar la marca de agua.
+
+        La marca de agua solo avanza (nunca retrocede) dentro de la misma
+        transacción que actualiza los contadores.
+        """
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE dispositivos SET "
+                "paquetes_ultima = paquetes_ultima + 1, registros_ultima = registros_ultima + ?, "
+                "paquetes_total = paquetes_total + 1, registros_total = registros_total + ?, "
+                "ultima_fecha = CASE WHEN ? IS NOT NULL AND (ultima_fecha IS NULL OR ? > ultima_fecha) "
+                "THEN ? ELSE ultima_fecha END "
+                "WHERE codigo_interno = ?",
+                (registros, registros, fecha_max, fecha_max, fecha_max, codigo_interno))
+
+    def avanzar_marca(self, codigo_interno, fecha):
+        """Avanzar la marca de agua sin contar paquetes (recuperación desde el diario)"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO dispositivos (codigo_interno) VALUES (?)", (codigo_interno,))
+            self._conexion.execute(
+                "UPDATE dispositivos SET ultima_fecha = ? "
+                "WHERE codigo_interno = ? AND (ultima_fecha IS NULL OR ultima_fecha < ?)",
+                (fecha, codigo_interno, fecha))
+
+    def agregar_rezago(self, codigo_interno, desde, hasta, marca=None):
+        """
+        Anotar un tramo [desde, hasta) que quedó sin descargar porque se
+        priorizaron los datos más recientes.
+
+        Con marca, la marca de agua avanza hasta ella en la misma transacción:
+        nunca queda por delante de un tramo que no se anotó.
+        """
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO rezagos (codigo_interno, desde, hasta, creado) VALUES (?, ?, ?, ?)",
+                (codigo_interno, desde, hasta, datetime.now().isoformat(timespec='seconds')))
+            if marca is not None:
+                self._conexion.execute(
+                    "INSERT OR IGNORE INTO dispositivos (codigo_interno) VALUES (?)", (codigo_interno,))
+                self._conexion.execute(
+                    "UPDATE dispositivos SET ultima_fecha = ? "
+                    "WHERE codigo_interno = ? AND (ultima_fecha IS NULL OR ultima_fecha < ?)",
+                    (marca, codigo_interno, marca))
+
+    def rezagos(self, codigo_interno=None):
+        """Tramos pendientes (del más antiguo al más reciente) como lista de diccionarios"""
+        consulta = "SELECT id, codigo_interno, desde, hasta, creado FROM rezagos"
+        parametros = ()
+        if codigo_interno is not None:
+            consulta += " WHERE codigo_interno = ?"
+            parametros = (codigo_interno,)
+        with self._lock:
+            cursor = self._conexion.execute(consulta + " ORDER BY codigo_interno, desde", parametros)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def avanzar_rezago(self, id_rezago, desde):
+        """Acortar un tramo pendiente; se elimina cuando ya no queda nada por descargar"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE rezagos SET desde = ? WHERE id = ? AND desde < ?", (desde, id_rezago, desde))
+            self._conexion.execute("DELETE FROM rezagos WHERE id = ? AND desde >= hasta", (id_rezago,))
+
+    def cerrar_rezago(self, id_rezago):
+        """Eliminar un tramo pendiente ya completo"""
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM rezagos WHERE id = ?", (id_rezago,))
+
+    def finalizar_dispositivo(self, codigo_interno, estado, duracion=None, error=None):
+        """Registrar el resultado de la descarga de un dispositivo"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE dispositivos SET estado = ?, error = ?, ultimo_fin = ?, duracion_ultima = ? "
+                "WHERE codigo_interno = ?",
+                (estado, error, datetime.now().isoformat(timespec='seconds'), duracion, codigo_interno))
+
+    def resumen(self):
+        """Estado de todos los dispositivos como lista de diccionarios"""
+        with self._lock:
+            cursor = self._conexion.execute("SELECT * FROM dispositivos ORDER BY proyecto, codigo_interno")
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
@@ -0,0 +1,136 @@
+import io
+import json
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+    import pyarrow.ipc as ipc
+    ARROW_DISPONIBLE = True
+except ImportError:
+    pa = pc = pcsv = ipc = None
+    ARROW_DISPONIBLE = False
+
+# Formato de la API (parámetro formato=) y su Content-Type
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+FORMATOS_API = tuple(TIPOS_CONTENIDO)
+
+
+def cabecera_accept(formato):
+    """Cabecera Accept que pide formato y acepta CSV como alternativa"""
+    if formato == 'csv':
+        return TIPOS_CONTENIDO['csv']
+    return f"{TIPOS_CONTENIDO[formato]}, {TIPOS_CONTENIDO['csv']};q=0.5"
+
+
+def formato_respuesta(response):
+    """Formato real de una respuesta según su Content-Type (CSV si no se reconoce)"""
+    tipo = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    for formato, tipo_formato in TIPOS_CONTENIDO.items():
+        if tipo == tipo_formato:
+            return formato
+    return 'csv'
+
+
+def bytes_en_red(response, defecto):
+    """
+    Bytes leídos del socket para el cuerpo (comprimidos si vino con gzip).
+
+    urllib3 lleva la cuenta en raw.tell(); si no está disponible se usa defecto.
+    """
+    try:
+        return int(response.raw.tell()) or defecto
+    except (AttributeError, TypeError, ValueError):
+        return defecto
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return str(valor)
+
+
+class LectorBloques(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un iterador de bloques (response.iter_content),
+    para leer el cuerpo a medida que llega sin perder la descompresión ni las
+    excepciones de requests. Acumula el tiempo esperando la red (segundos)
+    y los bytes recibidos (leidos).
+    """
+
+    def __init__(self, bloques):
+        self._bloques = iter(bloques)
+        self._resto = memoryview(b'')
+        self.segundos = 0.0
+        self.leidos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._resto:
+            inicio = time.perf_counter()
+            bloque = next(self._bloques, None)
+            self.segundos += time.perf_counter() - inicio
+            if bloque is None:
+                return 0
+            self._resto = memoryview(bloque)
+            self.leidos += len(bloque)
+        n = min(len(destino), len(self._resto))
+        destino[:n] = self._resto[:n]
+        self._resto = self._resto[n:]
+        return n
+
+
+def filas_ndjson(lineas):
+    """
+    Recorre un cuerpo NDJSON (un objeto JSON por línea) sin leerlo completo.
+
+    Yields:
+        tuple: (cabecera, fila como lista de texto en el orden de la cabecera)
+    """
+    cabecera = None
+    for linea in lineas:
+        if not linea.strip():
+            continue
+        objeto = json.loads(linea)
+        if cabecera is None:
+            cabecera = list(objeto)
+        yield cabecera, [_texto(objeto.get(columna)) for columna in cabecera]
+
+
+def abrir_arrow(fuente):
+    """
+    Abre un stream Arrow IPC para leerlo por lotes con sus columnas tipadas.
+
+    Returns:
+        RecordBatchStreamReader o None si el cuerpo está vacío
+    """
+    if not ARROW_DISPONIBLE:
+        raise ImportError("pyarrow no está instalado: no se pueden leer respuestas Arrow")
+    if isinstance(fuente, (bytes, bytearray)):
+        fuente = io.BufferedReader(io.BytesIO(fuente))
+    if not fuente.peek(1):
+        return None
+    return ipc.open_stream(fuente)
+
+
+def texto_columna(columna):
+    """Columna Arrow como lista de texto ('YYYY-MM-DD HH:MM:SS' en fechas, '' en nulos)"""
+    if not pa.types.is_string(columna.type):
+        columna = pc.cast(columna, pa.string())
+    return pc.fill_null(columna, '').to_pylist()
+
+
+def escribir_csv_arrow(lote, f, cabecera=True):
+    """Escribe un lote Arrow como CSV directamente desde sus columnas tipadas"""
+    pcsv.write_csv(lote, f, pcsv.WriteOptions(include_header=cabecera))
@@ -0,0 +1,126 @@
+import os
+import time
+import struct
+import hashlib
+import threading
+
+
+class IndiceDedup:
+    """
+    Índice de deduplicación de mediciones de un dispositivo.
+
+    Cada medición se identifica por (codigo_interno, fecha, fecha_insercion);
+    como el índice es por dispositivo, en disco se guarda solo un hash de 64
+    bits de (fecha, fecha_insercion) junto con el momento en que se confirmó,
+    en registros binarios de tamaño fijo (indice_dedup.bin).
+
+    Las claves de un paquete quedan "pendientes" mientras el paquete está en
+    vuelo, así otro paquete del mismo dispositivo tampoco las repite; pasan a
+    confirmadas cuando el paquete recibe su nombre definitivo y se descartan
+    si el paquete se pierde. Al cargar se olvidan las claves confirmadas hace
+    más de horizonte_dias: los duplicados aparecen al volver a pedir los
+    bordes de descargas recientes, no de descargas de hace meses.
+
+    El archivo solo crece por anexado, así que refrescar() suma lo que otro
+    proceso (el receptor push corriendo aparte) confirmó desde la última
+    lectura.
+    """
+
+    NOMBRE_ARCHIVO = 'indice_dedup.bin'
+    _REGISTRO = struct.Struct('<Qq')
+
+    def __init__(self, dispositivo_folder, horizonte_dias=30):
+        self.ruta = os.path.join(dispositivo_folder, self.NOMBRE_ARCHIVO)
+        self.horizonte = horizonte_dias * 86400
+        self._lock = threading.Lock()
+        self.confirmadas = {}
+        self.pendientes = set()
+        self._leidos = 0
+        self._inodo = None
+        self.cargar()
+
+    @staticmethod
+    def clave(fecha, fecha_insercion):
+        """Hash estable de 64 bits de una medición"""
+        texto = f"{fecha}\x1f{fecha_insercion}".encode('utf-8')
+        return int.from_bytes(hashlib.blake2b(texto, digest_size=8).digest(), 'little')
+
+    def cargar(self):
+        """Leer el índice desde disco, descartando las claves fuera del horizonte"""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'rb') as f:
+            datos = f.read()
+        # Un corte a mitad de escritura puede dejar un registro incompleto al final
+        datos = datos[:len(datos) - len(datos) % self._REGISTRO.size]
+        registros = dict(self._REGISTRO.iter_unpack(datos))
+        corte = time.time() - self.horizonte
+        self.confirmadas = {clave: ts for clave, ts in registros.items() if ts >= corte}
+        self._leidos, self._inodo = len(datos), os.stat(self.ruta).st_ino
+        if len(self.confirmadas) * 2 < len(registros):
+            self.compactar()
+
+    def compactar(self):
+        """Reescribir el archivo solo con las claves vigentes (temporal y rename)"""
+        ruta_tmp = self.ruta + '.tmp'
+        with open(ruta_tmp, 'wb') as f:
+            f.write(b''.join(self._REGISTRO.pack(c, ts) for c, ts in self.confirmadas.items()))
+            f.flush()
+            os.fsync(f.fileno())
+            tamano = f.tell()
+        os.replace(ruta_tmp, self.ruta)
+        self._leidos, self._inodo = tamano, os.stat(self.ruta).st_ino
+
+    def refrescar(self):
+        """
+        Sumar las claves que otro proceso anexó al archivo desde la última lectura.
+
+        Returns:
+            int: Registros leídos
+        """
+        try:
+            info = os.stat(self.ruta)
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            if info.st_ino != self._inodo or info.st_size < self._leidos:
+                # El otro proceso compactó el archivo: leerlo entero otra vez
+                self._leidos, self._inodo = 0, info.st_ino
+            if info.st_size - self._leidos < self._REGISTRO.size:
+                return 0
+            with open(self.ruta, 'rb') as f:
+                f.seek(self._leidos)
+                datos = f.read(info.st_size - self._leidos)
+            # Un registro que el otro proceso todavía está escribiendo queda para la próxima
+            datos = datos[:len(datos) - len(datos) % self._REGISTRO.size]
+            self._leidos += len(datos)
+            self.confirmadas.update(self._REGISTRO.iter_unpack(datos))
+        return len(datos) // self._REGISTRO.size
+
+    def es_duplicado(self, clave):
+        return clave in self.confirmadas or clave in self.pendientes
+
+    def reservar(self, claves):
+        """Marcar como pendientes las claves de un paquete recién escrito"""
+        with self._lock:
+            self.pendientes.update(claves)
+
+    def confirmar(self, claves):
+        """Pasar a confirmadas las claves de un paquete ya renombrado y guardarlas"""
+        if not claves:
+            return
+        ahora = int(time.time())
+        with self._lock:
+            for clave in claves:
+                self.pendientes.discard(clave)
+                self.confirmadas[clave] = ahora
+            with open(self.ruta, 'ab') as f:
+                f.write(b''.join(self._REGISTRO.pack(c, ahora) for c in claves))
+
+    def descartar_pendientes(self, claves):
+        """Olvidar las claves de paquetes que nunca se confirmaron"""
+        with self._lock:
+            self.pendientes.difference_update(claves)
+
+    def __len__(self):
+        return len(self.confirmadas)
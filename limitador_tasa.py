@@ -0,0 +1,113 @@
+import asyncio
+import time
+import contextlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+def segundos_retry_after(valor, defecto=5.0):
+    """
+    Interpreta la cabecera Retry-After (segundos o fecha HTTP).
+
+    Returns:
+        float: Segundos a esperar antes de volver a llamar al host
+    """
+    if not valor:
+        return defecto
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return defecto
+
+
+class LimitadorTasa:
+    """
+    Limitador de peticiones por host para el colector.
+
+    Cada host tiene un token bucket (peticiones por segundo con ráfaga
+    acotada) y un tope de peticiones en vuelo. Cuando el servidor responde 429
+    o 503 con Retry-After, el host queda en pausa durante ese tiempo para
+    todos los dispositivos que lo comparten.
+
+    Los valores por host se pueden ajustar con por_host, por ejemplo:
+    {'api-sensores.cmasccp.cl': {'rps': 8, 'max_en_vuelo': 6}}
+    """
+
+    def __init__(self, rps=4.0, max_en_vuelo=4, rafaga=None, por_host=None):
+        self.rps = rps
+        self.max_en_vuelo = max_en_vuelo
+        self.rafaga = rafaga
+        self.por_host = por_host or {}
+        self._hosts = {}
+
+    def reiniciar(self):
+        """Descartar el estado asyncio (se llama al comenzar cada event loop)"""
+        self._hosts = {}
+
+    @staticmethod
+    def host_de(url):
+        return urlparse(url).netloc
+
+    def _estado(self, host):
+        if host not in self._hosts:
+            config = self.por_host.get(host, {})
+            rps = float(config.get('rps', self.rps))
+            rafaga = float(config.get('rafaga', self.rafaga or max(1.0, rps)))
+            self._hosts[host] = {
+                'rps': rps,
+                'rafaga': rafaga,
+                'tokens': rafaga,
+                'ultimo': time.monotonic(),
+                'pausa_hasta': 0.0,
+                'semaforo': asyncio.Semaphore(int(config.get('max_en_vuelo', self.max_en_vuelo))),
+                'esperas': 0,
+                'pausas': 0,
+            }
+        return self._hosts[host]
+
+    async def _esperar_token(self, estado):
+        """Esperar hasta que haya un token disponible y el host no esté en pausa"""
+        while True:
+            ahora = time.monotonic()
+            if estado['pausa_hasta'] > ahora:
+                await asyncio.sleep(estado['pausa_hasta'] - ahora)
+                continue
+            if estado['rps'] <= 0:
+                return
+            estado['tokens'] = min(estado['rafaga'],
+                                   estado['tokens'] + (ahora - estado['ultimo']) * estado['rps'])
+            estado['ultimo'] = ahora
+            if estado['tokens'] >= 1:
+                estado['tokens'] -= 1
+                return
+            estado['esperas'] += 1
+            await asyncio.sleep((1 - estado['tokens']) / estado['rps'])
+
+    @contextlib.asynccontextmanager
+    async def turno(self, url):
+        """Reserva un lugar en vuelo y un token del host de la URL"""
+        estado = self._estado(self.host_de(url))
+        async with estado['semaforo']:
+            await self._esperar_token(estado)
+            yield
+
+    def pausar(self, url, segundos):
+        """Pausar todas las peticiones al host (respuesta 429/503 con Retry-After)"""
+        estado = self._estado(self.host_de(url))
+        estado['pausa_hasta'] = max(estado['pausa_hasta'], time.monotonic() + segundos)
+        estado['pausas'] += 1
+        # Vaciar el bucket para no lanzar una ráfaga al terminar la pausa
+        estado['tokens'] = 0.0
+        estado['ultimo'] = estado['pausa_hasta']
+
+    def resumen(self):
+        """Contadores por host (esperas por token y pausas por Retry-After)"""
+        return {host: {'esperas': e['esperas'], 'pausas': e['pausas']} for host, e in self._hosts.items()}
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+# Límites superiores (segundos) de los buckets de latencia; el último es +Inf
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+FASES = ('red', 'parseo', 'disco')
+
+
+class HistogramaLatencia:
+    """Histograma acumulativo de latencias al estilo Prometheus"""
+
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, segundos):
+        for i, limite in enumerate(self.buckets):
+            if segundos <= limite:
+                self.conteos[i] += 1
+                break
+        else:
+            self.conteos[-1] += 1
+        self.suma += segundos
+        self.cuenta += 1
+
+    def acumulados(self):
+        """Pares (le, cantidad acumulada) incluyendo +Inf"""
+        total = 0
+        pares = []
+        for limite, conteo in zip(list(self.buckets) + ['+Inf'], self.conteos):
+            total += conteo
+            pares.append((limite, total))
+        return pares
+
+    def percentil(self, p):
+        """Estimación del percentil p (0-100): límite del bucket que lo contiene"""
+        if not self.cuenta:
+            return None
+        objetivo = self.cuenta * p / 100
+        for limite, acumulado in self.acumulados():
+            if acumulado >= objetivo:
+                return limite
+        return '+Inf'
+
+    def resumen(self):
+        return {
+            'cuenta': self.cuenta,
+            'suma_segundos': round(self.suma, 6),
+            'promedio_segundos': round(self.suma / self.cuenta, 6) if self.cuenta else None,
+            'p50': self.percentil(50),
+            'p99': self.percentil(99),
+            'buckets': {str(le): n for le, n in self.acumulados()},
+        }
+
+
+def _etiquetas(**etiquetas):
+    """Etiquetas Prometheus escapadas: {clave="valor",...}"""
+    partes = []
+    for clave, valor in etiquetas.items():
+        texto = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{texto}"')
+    return '{' + ','.join(partes) + '}'
+
+
+class MetricasColector:
+    """
+    Métricas de ejecución del colector.
+
+    Registra por dispositivo y por endpoint la latencia de cada petición
+    (histograma), las peticiones por código HTTP, bytes y filas recibidas,
+    paquetes y filas escritas, reintentos, y el tiempo repartido entre red
+    (esperar cabeceras y cuerpo), parseo del CSV y disco (escritura, fsync,
+    diario y rename). Los contadores son acumulativos durante la vida del
+    proceso, así en modo servicio se comportan como contadores Prometheus.
+
+    Al final de cada ejecución se escriben metricas_colector.json y
+    metricas_colector.prom (formato del textfile collector de node_exporter)
+    en el directorio indicado, ambos con escritura atómica.
+    """
+
+    NOMBRE_JSON = 'metricas_colector.json'
+    NOMBRE_PROMETHEUS = 'metricas_colector.prom'
+
+    def __init__(self, directorio='.'):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self.latencia_dispositivo = {}
+        self.latencia_endpoint = {}
+        self.peticiones = {}
+        self.dispositivos = {}
+        self.inicio_ejecucion = None
+        self.duracion_ultima = None
+        self.ejecuciones = 0
+
+    def _dispositivo(self, codigo_interno):
+        if codigo_interno not in self.dispositivos:
+            self.dispositivos[codigo_interno] = {
+                'bytes_recibidos': 0, 'filas_recibidas': 0, 'paquetes_escritos': 0,
+                'filas_escritas': 0, 'reintentos': 0, 'tiempo': {fase: 0.0 for fase in FASES},
+            }
+        return self.dispositivos[codigo_interno]
+
+    def iniciar_ejecucion(self):
+        self.inicio_ejecucion = time.perf_counter()
+
+    def finalizar_ejecucion(self, duracion=None):
+        """Cerrar una ejecución (o un ciclo del modo servicio, entregando su duración)"""
+        if duracion is None and self.inicio_ejecucion is not None:
+            duracion = time.perf_counter() - self.inicio_ejecucion
+        with self._lock:
+            self.duracion_ultima = duracion
+            self.ejecuciones += 1
+
+    def registrar_peticion(self, codigo_interno, endpoint, segundos, estado):
+        """Una petición terminada; estado es el código HTTP o 'timeout'"""
+        with self._lock:
+            self.latencia_dispositivo.setdefault(codigo_interno, HistogramaLatencia()).observar(segundos)
+            self.latencia_endpoint.setdefault(endpoint, HistogramaLatencia()).observar(segundos)
+            clave = (endpoint, str(estado))
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+
+    def registrar_recepcion(self, codigo_interno, bytes_recibidos, filas):
+        with self._lock:
+            dispositivo = self._dispositivo(codigo_interno)
+            dispositivo['bytes_recibidos'] += bytes_recibidos
+            dispositivo['filas_recibidas'] += filas
+
+    def registrar_paquete(self, codigo_interno, filas):
+        with self._lock:
+            dispositivo = self._dispositivo(codigo_interno)
+            dispositivo['paquetes_escritos'] += 1
+            dispositivo['filas_escritas'] += filas
+
+    def registrar_reintento(self, codigo_interno):
+        with self._lock:
+            self._dispositivo(codigo_interno)['reintentos'] += 1
+
+    def agregar_tiempo(self, codigo_interno, fase, segundos):
+        with self._lock:
+            self._dispositivo(codigo_interno)['tiempo'][fase] += segundos
+
+    def resumen(self):
+        """Todas las métricas como diccionario serializable a JSON"""
+        with self._lock:
+            return {
+                'generado': datetime.now().isoformat(timespec='seconds'),
+                'ejecuciones': self.ejecuciones,
+                'duracion_ultima_segundos': round(self.duracion_ultima, 3) if self.duracion_ultima else None,
+                'endpoints': {
+                    endpoint: {
+                        'latencia': histograma.resumen(),
+                        'peticiones': {estado: n for (e, estado), n in sorted(self.peticiones.items())
+                                       if e == endpoint},
+                    } for endpoint, histograma in sorted(self.latencia_endpoint.items())
+                },
+                'dispositivos': {
+                    codigo: dict(contadores, tiempo={f: round(s, 6) for f, s in contadores['tiempo'].items()},
+                                 latencia=self.latencia_dispositivo[codigo].resumen()
+                                 if codigo in self.latencia_dispositivo else None)
+                    for codigo, contadores in sorted(self.dispositivos.items())
+                },
+            }
+
+    def texto_prometheus(self):
+        """Métricas en formato de exposición de texto de Prometheus"""
+        lineas = []
+
+        def histograma(nombre, ayuda, etiqueta, histogramas):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for valor, h in sorted(histogramas.items()):
+                for le, acumulado in h.acumulados():
+                    lineas.append(f"{nombre}_bucket{_etiquetas(**{etiqueta: valor, 'le': le})} {acumulado}")
+                lineas.append(f"{nombre}_sum{_etiquetas(**{etiqueta: valor})} {h.suma:.6f}")
+                lineas.append(f"{nombre}_count{_etiquetas(**{etiqueta: valor})} {h.cuenta}")
+
+        def contador(nombre, ayuda, clave):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} counter")
+            for codigo, contadores in sorted(self.dispositivos.items()):
+                lineas.append(f"{nombre}{_etiquetas(dispositivo=codigo)} {contadores[clave]}")
+
+        with self._lock:
+            histograma('colector_latencia_endpoint_segundos', 'Latencia de las peticiones por endpoint',
+                       'endpoint', self.latencia_endpoint)
+            histograma('colector_latencia_dispositivo_segundos', 'Latencia de las peticiones por dispositivo',
+                       'dispositivo', self.latencia_dispositivo)
+
+            lineas.append("# HELP colector_peticiones_total Peticiones por endpoint y código HTTP")
+            lineas.append("# TYPE colector_peticiones_total counter")
+            for (endpoint, estado), n in sorted(self.peticiones.items()):
+                lineas.append(f"colector_peticiones_total{_etiquetas(endpoint=endpoint, estado=estado)} {n}")
+
+            contador('colector_bytes_recibidos_total', 'Bytes recibidos de la API', 'bytes_recibidos')
+            contador('colector_filas_recibidas_total', 'Filas recibidas de la API', 'filas_recibidas')
+            contador('colector_paquetes_escritos_total', 'Paquetes confirmados en disco', 'paquetes_escritos')
+            contador('colector_filas_escritas_total', 'Filas escritas (sin duplicados)', 'filas_escritas')
+            contador('colector_reintentos_total', 'Reintentos de peticiones', 'reintentos')
+
+            lineas.append("# HELP colector_tiempo_segundos_total Tiempo por fase (red, parseo, disco)")
+            lineas.append("# TYPE colector_tiempo_segundos_total counter")
+            for codigo, contadores in sorted(self.dispositivos.items()):
+                for fase, segundos in contadores['tiempo'].items():
+                    lineas.append(f"colector_tiempo_segundos_total{_etiquetas(dispositivo=codigo, fase=fase)} "
+                                  f"{segundos:.6f}")
+
+            lineas.append("# HELP colector_ejecuciones_total Ejecuciones completadas")
+            lineas.append("# TYPE colector_ejecuciones_total counter")
+            lineas.append(f"colector_ejecuciones_total {self.ejecuciones}")
+            if self.duracion_ultima is not None:
+                lineas.append("# HELP colector_duracion_ultima_segundos Duración de la última ejecución")
+                lineas.append("# TYPE colector_duracion_ultima_segundos gauge")
+                lineas.append(f"colector_duracion_ultima_segundos {self.duracion_ultima:.3f}")
+            lineas.append("# HELP colector_ultima_ejecucion_timestamp_segundos Fin de la última ejecución (epoch)")
+            lineas.append("# TYPE colector_ultima_ejecucion_timestamp_segundos gauge")
+            lineas.append(f"colector_ultima_ejecucion_timestamp_segundos {time.time():.0f}")
+        return '\n'.join(lineas) + '\n'
+
+    @staticmethod
+    def _escribir_atomico(ruta, contenido):
+        ruta_tmp = ruta + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(ruta_tmp, ruta)
+
+    def guardar(self):
+        """
+        Escribe las métricas en JSON y en formato Prometheus.
+
+        Returns:
+            tuple: (ruta del JSON, ruta del archivo .prom)
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta_json = os.path.join(self.directorio, self.NOMBRE_JSON)
+        ruta_prom = os.path.join(self.directorio, self.NOMBRE_PROMETHEUS)
+        self._escribir_atomico(ruta_json, json.dumps(self.resumen(), indent=4, ensure_ascii=False))
+        self._escribir_atomico(ruta_prom, self.texto_prometheus())
+        return ruta_json, ruta_prom
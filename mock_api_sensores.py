@@ -0,0 +1,390 @@
+import io
+import csv
+import gzip
+import json
+import time
+import random
+import bisect
+import argparse
+import threading
+import itertools
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from formatos_api import ARROW_DISPONIBLE, TIPOS_CONTENIDO, pa, pc, ipc
+
+ENDPOINTS = ('/listarUltimasMediciones', '/listarDatosEstructuradosV2')
+COLUMNAS = ['id', 'id_proyecto', 'codigo_interno', 'id_sesion', 'fecha', 'fecha_insercion',
+            'temperatura', 'humedad', 'presion', 'bateria']
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+COLUMNAS_ENTERAS = ('id', 'id_proyecto', 'id_sesion')
+COLUMNAS_FECHA = ('fecha', 'fecha_insercion')
+# Por debajo de este tamaño no vale la pena comprimir la respuesta
+MIN_BYTES_GZIP = 1024
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano; None si no hay valores"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))]
+
+
+def parsear_fecha(texto):
+    """Fecha de un parámetro de consulta ('YYYY-MM-DD', con hora, con 'T' o espacio)"""
+    return datetime.fromisoformat(texto.strip().replace('Z', ''))
+
+
+class DispositivoSimulado:
+    """
+    Mediciones sintéticas de un dispositivo, ordenadas por (fecha_insercion, id).
+
+    La historia se genera con una medición cada intervalo_minutos y un
+    retraso de inserción aleatorio; algunos tramos simulan un equipo sin
+    conexión que luego sube de golpe sus mediciones (misma fecha_insercion).
+    Las inserciones concurrentes se materializan al consultar: desde la
+    última consulta se agregan inserciones_por_segundo filas por segundo con
+    fecha_insercion actual, como haría la base real mientras el colector pagina.
+    """
+
+    def __init__(self, proyecto, codigo_interno, ids, dias=30, intervalo_minutos=10,
+                 inserciones_por_segundo=0.0, semilla=0):
+        self.proyecto = proyecto
+        self.codigo_interno = codigo_interno
+        self._ids = ids
+        self.intervalo = timedelta(minutes=intervalo_minutos)
+        self.inserciones_por_segundo = inserciones_por_segundo
+        self._random = random.Random(f"{semilla}:{proyecto}:{codigo_interno}")
+        self._lock = threading.Lock()
+        self.claves = []
+        self.filas = []
+        self._generar_historia(dias)
+        self._ultima_insercion = time.time()
+        self._insercion_pendiente = 0.0
+
+    def _medicion(self, fecha, fecha_insercion):
+        r = self._random
+        return [self.proyecto, self.codigo_interno, 1,
+                fecha.strftime(FORMATO_FECHA), fecha_insercion.strftime(FORMATO_FECHA),
+                round(r.gauss(12, 5), 2), round(r.uniform(30, 95), 1),
+                round(r.gauss(1013, 4), 1), round(r.uniform(3.3, 4.2), 2)]
+
+    def _generar_historia(self, dias):
+        ahora = datetime.now().replace(microsecond=0)
+        fecha = ahora - timedelta(days=dias)
+        mediciones = []
+        subida_diferida = None
+        while fecha < ahora:
+            if subida_diferida is None and self._random.random() < 0.002:
+                # Equipo sin conexión: lo medido se sube junto más tarde
+                subida_diferida = min(ahora, fecha + timedelta(hours=self._random.uniform(1, 12)))
+            if subida_diferida is not None and fecha >= subida_diferida:
+                subida_diferida = None
+            insercion = subida_diferida or min(ahora, fecha + timedelta(seconds=self._random.uniform(1, 120)))
+            mediciones.append((insercion, fecha))
+            fecha += self.intervalo
+        mediciones.sort()
+        for insercion, fecha in mediciones:
+            self._agregar(fecha, insercion)
+
+    def _agregar(self, fecha, fecha_insercion):
+        id_fila = next(self._ids)
+        self.claves.append((fecha_insercion.replace(microsecond=0), id_fila))
+        self.filas.append([id_fila] + self._medicion(fecha, fecha_insercion))
+
+    def materializar_inserciones(self):
+        """Agregar las filas que la base habría recibido desde la última consulta"""
+        if self.inserciones_por_segundo <= 0:
+            return
+        with self._lock:
+            ahora = time.time()
+            self._insercion_pendiente += (ahora - self._ultima_insercion) * self.inserciones_por_segundo
+            self._ultima_insercion = ahora
+            nuevas = int(self._insercion_pendiente)
+            self._insercion_pendiente -= nuevas
+            insercion = datetime.now().replace(microsecond=0)
+            for _ in range(nuevas):
+                self._agregar(insercion - timedelta(seconds=self._random.uniform(0, 300)), insercion)
+
+    def consultar(self, fecha_inicio=None, fecha_fin=None, cursor=None):
+        """
+        Filas con fecha_insercion en [fecha_inicio, fecha_fin] (ambos inclusive)
+        y, si se entrega cursor (fecha_insercion, id), posteriores a él.
+        """
+        self.materializar_inserciones()
+        with self._lock:
+            desde = 0
+            if fecha_inicio is not None:
+                desde = bisect.bisect_left(self.claves, (fecha_inicio, -1))
+            if cursor is not None:
+                desde = max(desde, bisect.bisect_right(self.claves, cursor))
+            hasta = len(self.claves)
+            if fecha_fin is not None:
+                hasta = bisect.bisect_right(self.claves, (fecha_fin, float('inf')))
+            return self.filas[desde:hasta]
+
+
+class ApiSensoresSimulada:
+    """
+    Reemplazo local de la API de sensores para medir el colector sin salir a
+    api-sensores.cmasccp.cl.
+
+    Atiende listarUltimasMediciones y listarDatosEstructuradosV2 con los
+    mismos parámetros (tabla, disp.id_proyecto, disp.codigo_interno, limite,
+    offset, fecha_inicio, fecha_fin, order_by, formato=csv) y, salvo
+    con soporte_cursor=False, los parámetros de cursor del colector. Cada
+    dispositivo consultado se genera la primera vez que se pide.
+
+    Latencia y errores son configurables: cada respuesta tarda
+    latencia + latencia_por_fila * filas (con jitter), una fracción de las
+    peticiones responde 404 o 524, y las páginas de más de max_filas filas
+    responden 524 como el proxy de la API real ante consultas demasiado
+    largas. Además de formato=csv atiende formato=ndjson y, con pyarrow,
+    formato=arrow (stream IPC con columnas tipadas); un formato fuera de
+    formatos responde 400. Con gzip=True las respuestas de más de 1 KB se
+    comprimen si el cliente envía Accept-Encoding: gzip.
+    GET /_estadisticas devuelve peticiones, códigos, filas y
+    percentiles de latencia (con ?reiniciar=1 los pone en cero).
+    """
+
+    def __init__(self, dias=30, intervalo_minutos=10, latencia=0.05, latencia_por_fila=0.0,
+                 jitter=0.2, prob_404=0.0, prob_524=0.0, max_filas=None,
+                 inserciones_por_segundo=0.0, soporte_cursor=True, formatos=('csv', 'ndjson', 'arrow'),
+                 gzip=True, semilla=0):
+        self.dias = dias
+        self.intervalo_minutos = intervalo_minutos
+        self.latencia = latencia
+        self.latencia_por_fila = latencia_por_fila
+        self.jitter = jitter
+        self.prob_404 = prob_404
+        self.prob_524 = prob_524
+        self.max_filas = max_filas
+        self.inserciones_por_segundo = inserciones_por_segundo
+        self.soporte_cursor = soporte_cursor
+        self.formatos = {f for f in formatos if f != 'arrow' or ARROW_DISPONIBLE}
+        self.gzip = gzip
+        self.semilla = semilla
+        self._random = random.Random(semilla)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.dispositivos = {}
+        self.reiniciar_estadisticas()
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self.peticiones = 0
+            self.por_estado = {}
+            self.filas_servidas = 0
+            self.bytes_servidos = 0
+            self.latencias = []
+            self.inicio = time.monotonic()
+
+    def estadisticas(self):
+        """Contadores y percentiles de latencia (ms) desde el último reinicio"""
+        with self._lock:
+            latencias = [l * 1000 for l in self.latencias]
+            return {
+                'peticiones': self.peticiones,
+                'por_estado': {str(k): v for k, v in sorted(self.por_estado.items())},
+                'filas': self.filas_servidas,
+                'bytes': self.bytes_servidos,
+                'segundos': round(time.monotonic() - self.inicio, 3),
+                'latencia_ms': {
+                    'p50': percentil(latencias, 50),
+                    'p90': percentil(latencias, 90),
+                    'p99': percentil(latencias, 99),
+                    'max': max(latencias) if latencias else None,
+                },
+            }
+
+    def registrar(self, estado, filas, tamano, duracion):
+        with self._lock:
+            self.peticiones += 1
+            self.por_estado[estado] = self.por_estado.get(estado, 0) + 1
+            self.filas_servidas += filas
+            self.bytes_servidos += tamano
+            self.latencias.append(duracion)
+
+    def dispositivo(self, proyecto, codigo_interno):
+        clave = (proyecto, codigo_interno)
+        with self._lock:
+            if clave not in self.dispositivos:
+                self.dispositivos[clave] = DispositivoSimulado(
+                    proyecto, codigo_interno, self._ids, self.dias, self.intervalo_minutos,
+                    self.inserciones_por_segundo, self.semilla)
+            return self.dispositivos[clave]
+
+    def _esperar(self, filas):
+        demora = self.latencia + self.latencia_por_fila * filas
+        if demora > 0:
+            time.sleep(demora * self._random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def responder(self, ruta, parametros):
+        """
+        Atiende una consulta.
+
+        Returns:
+            tuple: (código HTTP, content-type, cuerpo en bytes, filas)
+        """
+        if ruta not in ENDPOINTS:
+            return 404, 'text/plain', b'Ruta no encontrada', 0
+        try:
+            if parametros.get('tabla', 'datos') != 'datos':
+                raise ValueError(f"tabla no soportada: {parametros['tabla']}")
+            proyecto = int(parametros.get('disp.id_proyecto', 1))
+            codigo_interno = parametros.get('disp.codigo_interno')
+            limite = int(parametros.get('limite', 25))
+            offset = int(parametros.get('offset', 0))
+            fecha_inicio = parsear_fecha(parametros['fecha_inicio']) if parametros.get('fecha_inicio') else None
+            fecha_fin = parsear_fecha(parametros['fecha_fin']) if parametros.get('fecha_fin') else None
+            cursor = None
+            if self.soporte_cursor and parametros.get('cursor_fecha_insercion'):
+                cursor = (parsear_fecha(parametros['cursor_fecha_insercion']),
+                          int(parametros.get('cursor_desempate', 0)))
+            order_by = parametros.get('order_by', 'fecha_insercion')
+            if order_by not in COLUMNAS:
+                raise ValueError(f"order_by no soportado: {order_by}")
+            formato = parametros.get('formato', 'json')
+            if formato != 'json' and formato not in self.formatos:
+                raise ValueError(f"formato no soportado: {formato}")
+        except (KeyError, ValueError) as e:
+            return 400, 'text/plain', f"Parámetro inválido: {e}".encode('utf-8'), 0
+
+        sorteo = self._random.random()
+        if sorteo < self.prob_404:
+            self._esperar(0)
+            return 404, 'text/plain', b'Not Found', 0
+        if sorteo < self.prob_404 + self.prob_524 or (self.max_filas is not None and limite > self.max_filas):
+            self._esperar(limite)
+            return 524, 'text/plain', b'A timeout occurred', 0
+
+        if codigo_interno:
+            filas = self.dispositivo(proyecto, codigo_interno).consultar(fecha_inicio, fecha_fin, cursor)
+        else:
+            filas = [f for (p, _), d in list(self.dispositivos.items()) if p == proyecto
+                     for f in d.consultar(fecha_inicio, fecha_fin, cursor)]
+            filas.sort(key=lambda f: (f[5], f[0]))
+        if order_by != 'fecha_insercion':
+            indice = COLUMNAS.index(order_by)
+            filas = sorted(filas, key=lambda f: (f[indice], f[0]))
+        pagina = filas[offset:offset + limite]
+        self._esperar(len(pagina))
+
+        if formato == 'csv':
+            if not pagina:
+                return 200, TIPOS_CONTENIDO['csv'], b'', 0
+            salida = io.StringIO()
+            escritor = csv.writer(salida, lineterminator='\n')
+            escritor.writerow(COLUMNAS)
+            escritor.writerows(pagina)
+            return 200, TIPOS_CONTENIDO['csv'], salida.getvalue().encode('utf-8'), len(pagina)
+        if formato == 'ndjson':
+            cuerpo = ''.join(json.dumps(dict(zip(COLUMNAS, f)), ensure_ascii=False) + '\n' for f in pagina)
+            return 200, TIPOS_CONTENIDO['ndjson'], cuerpo.encode('utf-8'), len(pagina)
+        if formato == 'arrow':
+            return 200, TIPOS_CONTENIDO['arrow'], self._cuerpo_arrow(pagina), len(pagina)
+        cuerpo = json.dumps([dict(zip(COLUMNAS, f)) for f in pagina], ensure_ascii=False)
+        return 200, 'application/json', cuerpo.encode('utf-8'), len(pagina)
+
+    @staticmethod
+    def _cuerpo_arrow(pagina):
+        """Página como stream Arrow IPC con enteros, fechas y decimales tipados"""
+        if not pagina:
+            return b''
+        columnas = {}
+        for i, nombre in enumerate(COLUMNAS):
+            valores = [f[i] for f in pagina]
+            if nombre in COLUMNAS_ENTERAS:
+                columnas[nombre] = pa.array(valores, type=pa.int64())
+            elif nombre in COLUMNAS_FECHA:
+                columnas[nombre] = pc.strptime(pa.array(valores, type=pa.string()),
+                                               format=FORMATO_FECHA, unit='s')
+            elif nombre == 'codigo_interno':
+                columnas[nombre] = pa.array(valores, type=pa.string())
+            else:
+                columnas[nombre] = pa.array(valores, type=pa.float64())
+        tabla = pa.table(columnas)
+        salida = io.BytesIO()
+        with ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue()
+
+    def crear_servidor(self, host='127.0.0.1', puerto=8084):
+        api = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def enviar(self, estado, tipo, cuerpo):
+                comprimir = (api.gzip and len(cuerpo) >= MIN_BYTES_GZIP
+                             and 'gzip' in self.headers.get('Accept-Encoding', ''))
+                if comprimir:
+                    cuerpo = gzip.compress(cuerpo, compresslevel=5)
+                self.send_response(estado)
+                self.send_header('Content-Type', tipo)
+                if comprimir:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+                return len(cuerpo)
+
+            def do_GET(self):
+                inicio = time.perf_counter()
+                url = urlparse(self.path)
+                parametros = dict(parse_qsl(url.query))
+                if url.path == '/_estadisticas':
+                    datos = api.estadisticas()
+                    if parametros.get('reiniciar') == '1':
+                        api.reiniciar_estadisticas()
+                    self.enviar(200, 'application/json', json.dumps(datos).encode('utf-8'))
+                    return
+                estado, tipo, cuerpo, filas = api.responder(url.path, parametros)
+                enviados = self.enviar(estado, tipo, cuerpo)
+                api.registrar(estado, filas, enviados, time.perf_counter() - inicio)
+
+        servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        servidor.daemon_threads = True
+        return servidor
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API de sensores simulada para pruebas de carga del colector")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8084)
+    parser.add_argument('--dias', type=float, default=30, help="Días de historia por dispositivo")
+    parser.add_argument('--intervalo-minutos', type=float, default=10, help="Minutos entre mediciones")
+    parser.add_argument('--latencia', type=float, default=0.05, help="Segundos base por respuesta")
+    parser.add_argument('--latencia-por-fila', type=float, default=0.0, help="Segundos adicionales por fila")
+    parser.add_argument('--prob-404', type=float, default=0.0, help="Fracción de respuestas 404")
+    parser.add_argument('--prob-524', type=float, default=0.0, help="Fracción de respuestas 524")
+    parser.add_argument('--max-filas', type=int, default=None, help="Páginas más grandes responden 524")
+    parser.add_argument('--inserciones', type=float, default=0.0,
+                        help="Filas nuevas por segundo y dispositivo mientras corre el servidor")
+    parser.add_argument('--sin-cursor', action='store_true', help="Ignorar los parámetros de cursor")
+    parser.add_argument('--formatos', default='csv,ndjson,arrow',
+                        help="Formatos aceptados en formato= además de json (los demás responden 400)")
+    parser.add_argument('--sin-gzip', action='store_true', help="No comprimir respuestas")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    api = ApiSensoresSimulada(
+        dias=args.dias, intervalo_minutos=args.intervalo_minutos, latencia=args.latencia,
+        latencia_por_fila=args.latencia_por_fila, prob_404=args.prob_404, prob_524=args.prob_524,
+        max_filas=args.max_filas, inserciones_por_segundo=args.inserciones,
+        soporte_cursor=not args.sin_cursor, formatos=[f.strip() for f in args.formatos.split(',') if f.strip()],
+        gzip=not args.sin_gzip, semilla=args.semilla)
+    servidor = api.crear_servidor(args.host, args.puerto)
+    print(f"🧪 API simulada en http://{args.host}:{args.puerto} ({', '.join(ENDPOINTS)})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 API simulada detenida")
+    finally:
+        servidor.server_close()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from colector_async import parsear_fecha_config
+
+
+class PlanificadorColector:
+    """
+    Modo servicio (daemon) del colector.
+
+    En lugar de lanzar un proceso nuevo desde cron en cada corrida, mantiene
+    vivo un ColectorAsync con su sesión HTTP (conexiones keep-alive ya
+    abiertas), su pool de hilos, el estado SQLite y los tamaños de paquete
+    aprendidos, y consulta cada dispositivo según su propio intervalo. El
+    diario de cada dispositivo también queda abierto durante todo el
+    servicio, así una consulta sin datos nuevos no lo relee ni recorre sus
+    carpetas.
+
+    En cada ciclo se lanzan solo los dispositivos que ya cumplieron su
+    intervalo, ordenados por antigüedad de su marca de agua (el más atrasado
+    primero). Los dispositivos que responden sin datos nuevos espacian sus
+    consultas hasta intervalo_max, y vuelven a su intervalo normal en cuanto
+    llegan datos. config.json solo se vuelve a leer si cambió en disco.
+
+    El intervalo de un dispositivo se puede fijar en config.json con la clave
+    'intervalo_segundos'.
+    """
+
+    def __init__(self, colector, intervalo=300, intervalo_max=3600, tick=1.0, max_ciclos=None):
+        self.colector = colector
+        self.intervalo = intervalo
+        self.intervalo_max = max(intervalo, intervalo_max)
+        self.tick = tick
+        self.max_ciclos = max_ciclos
+        self.dispositivos = []
+        self.proxima_consulta = {}
+        self.intervalo_actual = {}
+        self.en_curso = {}
+        self.ciclos = 0
+        self._mtime_config = None
+
+    def recargar_config(self):
+        """Releer config.json solo si cambió desde la última lectura"""
+        mtime = os.path.getmtime(self.colector.config_path)
+        if mtime == self._mtime_config:
+            return False
+        self.dispositivos = self.colector.leer_dispositivos()
+        self.colector.estado.importar_config(self.dispositivos)
+        self._mtime_config = mtime
+        codigos = {d['codigo_interno'] for d in self.dispositivos}
+        # Olvidar dispositivos quitados de la configuración
+        for codigo in list(self.proxima_consulta):
+            if codigo not in codigos:
+                del self.proxima_consulta[codigo]
+                self.intervalo_actual.pop(codigo, None)
+        print(f"📋 Configuración cargada: {len(self.dispositivos)} dispositivos")
+        return True
+
+    def intervalo_base(self, dispositivo):
+        return float(dispositivo.get('intervalo_segundos', self.intervalo))
+
+    def antiguedad(self, dispositivo):
+        """
+        Segundos desde la marca de agua del dispositivo.
+
+        Returns:
+            float: Antigüedad de los datos (infinito si nunca se descargó)
+        """
+        marca = self.colector.estado.obtener_ultima_fecha(dispositivo['codigo_interno'])
+        if not marca:
+            return float('inf')
+        try:
+            return (datetime.now() - parsear_fecha_config(marca)).total_seconds()
+        except (TypeError, ValueError):
+            return float('inf')
+
+    def dispositivos_pendientes(self, ahora):
+        """Dispositivos que cumplieron su intervalo, del más atrasado al más reciente"""
+        pendientes = [
+            d for d in self.dispositivos
+            if d['codigo_interno'] not in self.en_curso
+            and self.proxima_consulta.get(d['codigo_interno'], 0.0) <= ahora
+        ]
+        return sorted(pendientes, key=self.antiguedad, reverse=True)
+
+    def _reprogramar(self, dispositivo, archivos):
+        """Fijar la próxima consulta según si el dispositivo trajo datos nuevos"""
+        codigo_interno = dispositivo['codigo_interno']
+        base = self.intervalo_base(dispositivo)
+        if archivos:
+            intervalo = base
+        else:
+            intervalo = min(self.intervalo_max, self.intervalo_actual.get(codigo_interno, base) * 2)
+        self.intervalo_actual[codigo_interno] = intervalo
+        self.proxima_consulta[codigo_interno] = time.monotonic() + intervalo
+
+    async def _consultar(self, dispositivo):
+        try:
+            archivos = await self.colector._procesar_dispositivo(dispositivo)
+        finally:
+            self.en_curso.pop(dispositivo['codigo_interno'], None)
+        self._reprogramar(dispositivo, archivos)
+        return archivos
+
+    async def _lote(self, numero, pendientes, tareas):
+        """Esperar un lote de consultas y resumirlo"""
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*tareas, return_exceptions=True)
+        archivos = sum(len(r) for r in resultados if isinstance(r, list))
+        con_datos = sum(1 for r in resultados if isinstance(r, list) and r)
+        # En modo servicio la lista del colector no se devuelve: no dejarla crecer
+        self.colector.archivos_creados.clear()
+        # Persistir los tamaños de paquete, los esquemas aprendidos y las métricas entre ciclos
+        await self.colector._ejecutar_en_pool(self.colector.controlador.guardar)
+        await self.colector._ejecutar_en_pool(self.colector.esquemas.guardar)
+        self.colector.metricas.finalizar_ejecucion(time.perf_counter() - inicio)
+        await self.colector._ejecutar_en_pool(self.colector.metricas.guardar)
+        print(f"⏱️  Ciclo {numero}: {len(pendientes)} dispositivos consultados, {con_datos} con datos nuevos, "
+              f"{archivos} archivos ({time.perf_counter() - inicio:.1f}s)")
+
+    def _ciclo(self):
+        """
+        Lanzar los dispositivos pendientes sin esperar a que terminen, así un
+        dispositivo lento no retrasa la consulta de los demás.
+
+        Returns:
+            asyncio.Future: Lote lanzado o None si no había pendientes
+        """
+        pendientes = self.dispositivos_pendientes(time.monotonic())
+        if not pendientes:
+            return None
+        self.ciclos += 1
+        tareas = []
+        for dispositivo in pendientes:
+            tarea = asyncio.ensure_future(self._consultar(dispositivo))
+            self.en_curso[dispositivo['codigo_interno']] = tarea
+            tareas.append(tarea)
+        return asyncio.ensure_future(self._lote(self.ciclos, pendientes, tareas))
+
+    async def _ejecutar_async(self):
+        self.colector.preparar_loop()
+        lotes = set()
+        try:
+            while self.max_ciclos is None or self.ciclos < self.max_ciclos:
+                try:
+                    self.recargar_config()
+                except (OSError, ValueError) as e:
+                    # Configuración a medio escribir: se conserva la anterior
+                    print(f"⚠️  No se pudo recargar la configuración: {e}")
+                lote = self._ciclo()
+                if lote is not None:
+                    lotes.add(lote)
+                    lote.add_done_callback(lotes.discard)
+                await asyncio.sleep(self.tick)
+        finally:
+            if lotes:
+                await asyncio.gather(*lotes, return_exceptions=True)
+
+    def ejecutar(self):
+        """Correr el planificador hasta Ctrl+C (o hasta max_ciclos)"""
+        print(f"🛰️  Colector en modo servicio (intervalo {self.intervalo:.0f}s, "
+              f"máximo {self.intervalo_max:.0f}s para dispositivos sin datos)")
+        os.makedirs(self.colector.output_folder, exist_ok=True)
+        self.colector.abrir()
+        try:
+            asyncio.run(self._ejecutar_async())
+        except KeyboardInterrupt:
+            print("\n🛑 Planificador detenido")
+        finally:
+            self.colector.cerrar()
+            self.colector.controlador.guardar()
+            self.colector.esquemas.guardar()
+            self.colector.imprimir_resumen()
@@ -0,0 +1,429 @@
+import io
+import os
+import csv
+import glob
+import json
+import time
+import queue
+import argparse
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from colector_async import normalizar_fecha_insercion, parsear_fecha_config
+from diario_descargas import DiarioDescargas
+from estado_colector import EstadoColector
+from indice_dedup import IndiceDedup
+
+RUTA_MEDICIONES = '/mediciones'
+COLUMNAS_OBLIGATORIAS = ('codigo_interno', 'fecha', 'fecha_insercion')
+MAX_ERRORES_INFORMADOS = 20
+
+
+class LoteInvalido(Exception):
+    """El cuerpo de la petición no se pudo interpretar como lote de mediciones"""
+
+
+def leer_lote(cuerpo, tipo_contenido):
+    """
+    Interpreta un lote en el mismo formato que devuelve la API: CSV con
+    cabecera o JSON (lista de objetos, u objeto con la lista en 'datos').
+
+    Returns:
+        list: Filas como diccionarios de texto
+    """
+    texto = cuerpo.decode('utf-8-sig')
+    if 'json' in tipo_contenido or texto.lstrip().startswith(('[', '{')):
+        try:
+            datos = json.loads(texto)
+        except json.JSONDecodeError as e:
+            raise LoteInvalido(f"JSON inválido: {e}")
+        if isinstance(datos, dict):
+            datos = datos.get('datos')
+        if not isinstance(datos, list) or not all(isinstance(f, dict) for f in datos):
+            raise LoteInvalido("se esperaba una lista de mediciones")
+        return [{k: '' if v is None else str(v) for k, v in f.items()} for f in datos]
+    lector = csv.DictReader(io.StringIO(texto))
+    if not lector.fieldnames:
+        return []
+    return [{k.strip(): (v or '') for k, v in f.items() if k is not None} for f in lector]
+
+
+class ReceptorPush:
+    """
+    Receptor HTTP de mediciones enviadas por los dispositivos (push).
+
+    Alternativa al sondeo de la API: acepta POST /mediciones con lotes en CSV
+    o JSON con las mismas columnas que devuelve la API, valida cada fila y las
+    guarda en el mismo almacén del colector (proyecto_X/CODIGO/<fecha>/) como
+    paquetes CODIGO_push_NNN_YYYYMMDD.csv. Cada paquete pasa por el diario de
+    descargas y, al confirmarse, se agrega al índice de dedup y avanza la
+    marca de agua del sondeo mientras las filas sigan a la marca sin huecos
+    mayores a hueco_marca segundos: un hueco mayor puede tener filas que
+    solo están en la API, y ese tramo lo sigue pidiendo el sondeo (las filas
+    que ya llegaron por push se descartan al volver a bajarlas). Las fechas
+    deben venir en el formato de la API.
+
+    Las filas validadas quedan en una cola en memoria acotada a
+    max_filas_cola; si está llena se responde 503 con Retry-After. Un hilo
+    escritor agrupa lo encolado por dispositivo y escribe un paquete por
+    dispositivo cada tamano_lote filas o cada intervalo_lote segundos. La
+    respuesta 202 confirma que el lote fue aceptado, no que ya esté en disco.
+
+    Con colector (ColectorAsync) se comparten su estado, sus diarios, sus
+    índices de dedup y sus métricas, para correr junto al modo servicio en
+    el mismo proceso. Sin colector el receptor usa su propio diario
+    (diario_push.jsonl) para no reescribir el del colector desde otro proceso;
+    el estado SQLite y los archivos indice_dedup.bin sí se comparten, y cada
+    proceso suma las claves que anexó el otro antes de deduplicar.
+    """
+
+    NOMBRE_DIARIO = 'diario_push.jsonl'
+
+    def __init__(self, output_folder='datos', estado=None, dispositivos=None, colector=None,
+                 host='127.0.0.1', puerto=8090, max_filas_cola=100000, tamano_lote=5000,
+                 intervalo_lote=2.0, max_bytes_peticion=50 * 1024 * 1024, token=None, hueco_marca=300):
+        self.colector = colector
+        self.output_folder = colector.output_folder if colector is not None else output_folder
+        self.estado = colector.estado if colector is not None else (estado or EstadoColector())
+        # Con la lista de dispositivos de config.json solo se aceptan esos códigos
+        self.proyectos = {d['codigo_interno']: d['proyecto'] for d in dispositivos} if dispositivos else None
+        self.host = host
+        self.puerto = puerto
+        self.max_filas_cola = max_filas_cola
+        self.tamano_lote = tamano_lote
+        self.intervalo_lote = intervalo_lote
+        self.max_bytes_peticion = max_bytes_peticion
+        self.token = token
+        self.hueco_marca = timedelta(seconds=hueco_marca)
+        self.cola = queue.Queue()
+        self._filas_en_cola = 0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._indices = {}
+        self._diarios = {}
+        self.contadores = {'lotes': 0, 'aceptadas': 0, 'rechazadas': 0, 'duplicadas': 0,
+                           'escritas': 0, 'paquetes': 0, 'saturado': 0}
+        self._servidor = None
+        self._hilos = []
+
+    def validar(self, filas, parametros):
+        """
+        Separa las filas válidas de las rechazadas.
+
+        El proyecto y el código pueden venir en cada fila (id_proyecto,
+        codigo_interno) o para todo el lote en la URL (disp.id_proyecto,
+        disp.codigo_interno), como en la API.
+
+        Returns:
+            tuple: (lista de (proyecto, codigo_interno, fila) válidas, lista de errores)
+        """
+        validas, errores = [], []
+        for numero, fila in enumerate(filas, start=1):
+            if not fila.get('codigo_interno') and parametros.get('disp.codigo_interno'):
+                fila['codigo_interno'] = parametros['disp.codigo_interno']
+            faltantes = [c for c in COLUMNAS_OBLIGATORIAS if not fila.get(c)]
+            if faltantes:
+                errores.append(f"fila {numero}: faltan {', '.join(faltantes)}")
+                continue
+            codigo_interno = fila['codigo_interno']
+            proyecto = fila.get('id_proyecto') or parametros.get('disp.id_proyecto')
+            if self.proyectos is not None:
+                if codigo_interno not in self.proyectos:
+                    errores.append(f"fila {numero}: dispositivo desconocido {codigo_interno}")
+                    continue
+                proyecto = proyecto or self.proyectos[codigo_interno]
+                if str(proyecto) != str(self.proyectos[codigo_interno]):
+                    errores.append(f"fila {numero}: {codigo_interno} no pertenece al proyecto {proyecto}")
+                    continue
+            if not proyecto:
+                errores.append(f"fila {numero}: falta id_proyecto")
+                continue
+            if normalizar_fecha_insercion(fila['fecha_insercion']) is None or \
+                    normalizar_fecha_insercion(fila['fecha']) is None:
+                errores.append(f"fila {numero}: fecha o fecha_insercion inválida")
+                continue
+            validas.append((str(proyecto), codigo_interno, fila))
+        return validas, errores
+
+    def encolar(self, validas):
+        """Encolar filas validadas; False si la cola no tiene espacio"""
+        with self._lock:
+            if self._filas_en_cola + len(validas) > self.max_filas_cola:
+                self.contadores['saturado'] += 1
+                return False
+            self._filas_en_cola += len(validas)
+        self.cola.put(validas)
+        return True
+
+    def _indice(self, codigo_interno, dispositivo_folder):
+        if self.colector is not None:
+            return self.colector._indice(codigo_interno, dispositivo_folder)
+        if codigo_interno not in self._indices:
+            self._indices[codigo_interno] = IndiceDedup(dispositivo_folder)
+        return self._indices[codigo_interno]
+
+    def _diario(self, codigo_interno, dispositivo_folder):
+        """Diario del dispositivo; al abrirlo se completan los paquetes push a medias"""
+        if codigo_interno not in self._diarios:
+            if self.colector is not None:
+                diario = self.colector._diario(codigo_interno, dispositivo_folder)
+            else:
+                diario = DiarioDescargas(dispositivo_folder, nombre_archivo=self.NOMBRE_DIARIO)
+            completados, eliminados = diario.recuperar('*.push')
+            if completados or eliminados:
+                print(f"[{codigo_interno}] 📓 Push recuperado: {completados} paquetes confirmados, "
+                      f"{eliminados} parciales descartados")
+            self._diarios[codigo_interno] = diario
+        return self._diarios[codigo_interno]
+
+    @staticmethod
+    def _siguiente_paquete(carpeta_fecha):
+        numeros = []
+        for ruta in glob.glob(os.path.join(carpeta_fecha, '*_push_*.csv')):
+            try:
+                numeros.append(int(os.path.basename(ruta).split('_push_')[1].split('_')[0]))
+            except (IndexError, ValueError):
+                continue
+        return max(numeros, default=0) + 1
+
+    def marca_contigua(self, codigo_interno, fechas):
+        """
+        Hasta dónde puede avanzar la marca de agua con las fechas de inserción
+        (ordenadas) de un paquete push ya confirmado.
+
+        Returns:
+            str: Nueva marca o None si las filas no siguen a la marca actual
+        """
+        marca = self.estado.obtener_ultima_fecha(codigo_interno)
+        if marca is None:
+            # Sin marca el sondeo todavía tiene que bajar la historia
+            return None
+        hasta = inicial = parsear_fecha_config(marca)
+        for fecha in fechas:
+            if fecha > hasta + self.hueco_marca:
+                break
+            hasta = max(hasta, fecha)
+        return hasta.strftime('%Y-%m-%dT%H:%M:%S') if hasta > inicial else None
+
+    def escribir_paquete(self, proyecto, codigo_interno, filas):
+        """
+        Escribe las filas nuevas de un dispositivo como un paquete push.
+
+        Returns:
+            str: Nombre del paquete o None si todas las filas ya estaban
+        """
+        dispositivo_folder = os.path.join(self.output_folder, f"proyecto_{proyecto}", codigo_interno)
+        os.makedirs(dispositivo_folder, exist_ok=True)
+        diario = self._diario(codigo_interno, dispositivo_folder)
+        indice = self._indice(codigo_interno, dispositivo_folder)
+        if indice is not None:
+            indice.refrescar()
+
+        filas = sorted(filas, key=lambda f: normalizar_fecha_insercion(f['fecha_insercion']))
+        nuevas, claves, vistas = [], [], set()
+        for fila in filas:
+            if indice is not None:
+                clave = indice.clave(fila['fecha'], fila['fecha_insercion'])
+                if clave in vistas or indice.es_duplicado(clave):
+                    continue
+                vistas.add(clave)
+                claves.append(clave)
+            nuevas.append(fila)
+        self.contadores['duplicadas'] += len(filas) - len(nuevas)
+        if not nuevas:
+            return None
+
+        fecha_min = normalizar_fecha_insercion(nuevas[0]['fecha_insercion'])
+        fecha_max = normalizar_fecha_insercion(nuevas[-1]['fecha_insercion'])
+        carpeta = fecha_min.strftime('%Y-%m-%d')
+        carpeta_fecha = os.path.join(dispositivo_folder, carpeta)
+        os.makedirs(carpeta_fecha, exist_ok=True)
+        numero = self._siguiente_paquete(carpeta_fecha)
+        filename = f"{codigo_interno}_push_{numero:03d}_{fecha_max.strftime('%Y%m%d')}.csv"
+        parcial = filename + '.push'
+
+        columnas = list(dict.fromkeys(c for fila in nuevas for c in fila))
+        with open(os.path.join(carpeta_fecha, parcial), 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.DictWriter(f, fieldnames=columnas, restval='', lineterminator='\n')
+            escritor.writeheader()
+            escritor.writerows(nuevas)
+            f.flush()
+            os.fsync(f.fileno())
+            tamano = f.tell()
+
+        diario.registrar(carpeta, parcial, filename, numero, len(nuevas), tamano,
+                         fecha_max.strftime('%Y-%m-%dT%H:%M:%S'), origen='push')
+        os.replace(os.path.join(carpeta_fecha, parcial), os.path.join(carpeta_fecha, filename))
+        if indice is not None:
+            indice.reservar(claves)
+            indice.confirmar(claves)
+        # Las duplicadas también cuentan para la continuidad: ya están en disco
+        marca = self.marca_contigua(codigo_interno,
+                                    [normalizar_fecha_insercion(f['fecha_insercion']) for f in filas])
+        self.estado.registrar_paquete(codigo_interno, len(nuevas), marca)
+        if self.colector is not None:
+            self.colector.metricas.registrar_paquete(codigo_interno, len(nuevas))
+        self.contadores['escritas'] += len(nuevas)
+        self.contadores['paquetes'] += 1
+        print(f"[{codigo_interno}] 📥 Paquete push guardado: {filename} ({len(nuevas)} registros)")
+        return filename
+
+    def _volcar(self, pendientes):
+        """Escribir un paquete por dispositivo con lo acumulado"""
+        por_dispositivo = {}
+        total = 0
+        for validas in pendientes:
+            for proyecto, codigo_interno, fila in validas:
+                por_dispositivo.setdefault((proyecto, codigo_interno), []).append(fila)
+                total += 1
+        for (proyecto, codigo_interno), filas in sorted(por_dispositivo.items()):
+            try:
+                self.escribir_paquete(proyecto, codigo_interno, filas)
+            except Exception as e:
+                print(f"[{codigo_interno}] ❌ Error guardando {len(filas)} filas push: {e}")
+        with self._lock:
+            self._filas_en_cola -= total
+
+    def _escritor(self):
+        """Hilo que junta lo encolado y lo escribe por lotes"""
+        pendientes, filas, primero = [], 0, None
+        while True:
+            espera = self.intervalo_lote if primero is None else max(0.0, primero + self.intervalo_lote - time.monotonic())
+            try:
+                validas = self.cola.get(timeout=espera)
+                pendientes.append(validas)
+                filas += len(validas)
+                primero = primero or time.monotonic()
+            except queue.Empty:
+                pass
+            vencido = primero is not None and time.monotonic() >= primero + self.intervalo_lote
+            if pendientes and (filas >= self.tamano_lote or vencido or self._detener.is_set()):
+                self._volcar(pendientes)
+                pendientes, filas, primero = [], 0, None
+            if self._detener.is_set() and self.cola.empty() and not pendientes:
+                break
+
+    def crear_servidor(self):
+        receptor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def responder(self, estado, datos, cabeceras=None):
+                cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+                self.send_response(estado)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                for clave, valor in (cabeceras or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def do_GET(self):
+                if urlparse(self.path).path != '/estado':
+                    self.responder(404, {'error': 'ruta no encontrada'})
+                    return
+                with receptor._lock:
+                    datos = dict(receptor.contadores, filas_en_cola=receptor._filas_en_cola)
+                self.responder(200, datos)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != RUTA_MEDICIONES:
+                    self.responder(404, {'error': 'ruta no encontrada'})
+                    return
+                if receptor.token and self.headers.get('Authorization') != f"Bearer {receptor.token}":
+                    self.responder(401, {'error': 'token inválido'})
+                    return
+                largo = int(self.headers.get('Content-Length') or 0)
+                if largo > receptor.max_bytes_peticion:
+                    self.close_connection = True
+                    self.responder(413, {'error': f"lote mayor a {receptor.max_bytes_peticion} bytes"})
+                    return
+                try:
+                    filas = leer_lote(self.rfile.read(largo), self.headers.get('Content-Type', ''))
+                except (LoteInvalido, UnicodeDecodeError, csv.Error) as e:
+                    self.responder(400, {'error': str(e)})
+                    return
+
+                validas, errores = receptor.validar(filas, dict(parse_qsl(url.query)))
+                if validas and not receptor.encolar(validas):
+                    self.responder(503, {'error': 'cola llena, reintentar'}, {'Retry-After': '1'})
+                    return
+                with receptor._lock:
+                    receptor.contadores['lotes'] += 1
+                    receptor.contadores['aceptadas'] += len(validas)
+                    receptor.contadores['rechazadas'] += len(errores)
+                self.responder(202 if validas else 400, {
+                    'aceptadas': len(validas),
+                    'rechazadas': len(errores),
+                    'errores': errores[:MAX_ERRORES_INFORMADOS],
+                })
+
+        servidor = ThreadingHTTPServer((self.host, self.puerto), Manejador)
+        servidor.daemon_threads = True
+        return servidor
+
+    def iniciar(self):
+        """Levantar el servidor y el hilo escritor en segundo plano"""
+        self._detener.clear()
+        self._servidor = self.crear_servidor()
+        self._hilos = [threading.Thread(target=self._escritor, name='receptor-push-escritor', daemon=True),
+                       threading.Thread(target=self._servidor.serve_forever, name='receptor-push-http', daemon=True)]
+        for hilo in self._hilos:
+            hilo.start()
+        print(f"📡 Receptor push escuchando en http://{self.host}:{self.puerto}{RUTA_MEDICIONES}")
+
+    def detener(self):
+        """Dejar de aceptar lotes y escribir lo que quede en la cola"""
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+        print(f"📥 Receptor push detenido: {self.contadores['escritas']} filas en {self.contadores['paquetes']} "
+              f"paquetes ({self.contadores['duplicadas']} duplicadas, {self.contadores['rechazadas']} rechazadas)")
+
+    def ejecutar(self):
+        """Correr el receptor hasta Ctrl+C"""
+        os.makedirs(self.output_folder, exist_ok=True)
+        self.iniciar()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n🛑 Deteniendo receptor push")
+        finally:
+            self.detener()
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receptor push de mediciones hacia el almacén del colector")
+    parser.add_argument('--config', default='config.json', help="Dispositivos aceptados (config.json)")
+    parser.add_argument('--datos', default='datos', help="Carpeta de datos del colector")
+    parser.add_argument('--estado', default='estado_colector.db', help="Base SQLite del estado del colector")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8090)
+    parser.add_argument('--token', default=os.environ.get('RECEPTOR_PUSH_TOKEN'),
+                        help="Token Bearer exigido a los emisores (o RECEPTOR_PUSH_TOKEN)")
+    parser.add_argument('--hueco-marca', type=int, default=300,
+                        help="Hueco máximo en segundos para que un paquete push avance la marca de agua")
+    args = parser.parse_args()
+
+    dispositivos = None
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            dispositivos = json.load(f)
+    receptor = ReceptorPush(args.datos, EstadoColector(args.estado), dispositivos,
+                            host=args.host, puerto=args.puerto, token=args.token,
+                            hueco_marca=args.hueco_marca)
+    receptor.ejecutar()
@@ -0,0 +1,96 @@
+import random
+import time
+
+
+class CircuitoAbierto(Exception):
+    """El endpoint tiene el circuito abierto: se falla sin hacer la petición"""
+
+
+class ReintentosAgotados(Exception):
+    """Se agotaron los reintentos para la misma ventana de datos"""
+
+
+class PoliticaReintentos:
+    """
+    Reintentos con backoff exponencial y jitter completo.
+
+    La espera del intento n es un valor aleatorio entre 0 y
+    min(maximo, base * 2**n), lo que evita que varios dispositivos que
+    fallaron a la vez vuelvan a golpear el endpoint al mismo tiempo.
+    """
+
+    # Códigos que se reintentan sobre la misma ventana (429 lo maneja el limitador)
+    CODIGOS_REINTENTABLES = {404, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+
+    def __init__(self, max_reintentos=5, base=1.0, maximo=60.0):
+        self.max_reintentos = max_reintentos
+        self.base = base
+        self.maximo = maximo
+
+    def es_reintentable(self, status_code):
+        return status_code in self.CODIGOS_REINTENTABLES
+
+    def espera(self, intento):
+        """Segundos a esperar antes del reintento número intento (desde 1)"""
+        return random.uniform(0, min(self.maximo, self.base * (2 ** max(0, intento - 1))))
+
+
+class Circuito:
+    """
+    Circuit breaker de un endpoint (api_url).
+
+    Tras umbral_fallos fallos consecutivos el circuito se abre y todas las
+    peticiones al endpoint fallan de inmediato durante enfriamiento segundos.
+    Luego pasa a semiabierto y deja pasar una sola petición de prueba: si
+    funciona se cierra, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, api_url, umbral_fallos=5, enfriamiento=120.0):
+        self.api_url = api_url
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self.estado = 'cerrado'
+        self.fallos_consecutivos = 0
+        self.fallos_total = 0
+        self.aperturas = 0
+        self.rechazos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+
+    def permitir(self):
+        """Indica si se puede hacer una petición al endpoint"""
+        if self.estado == 'abierto':
+            if time.monotonic() - self._abierto_desde < self.enfriamiento:
+                self.rechazos += 1
+                return False
+            self.estado = 'semiabierto'
+            self._prueba_en_curso = False
+        if self.estado == 'semiabierto':
+            if self._prueba_en_curso:
+                self.rechazos += 1
+                return False
+            self._prueba_en_curso = True
+        return True
+
+    def registrar_exito(self):
+        self.estado = 'cerrado'
+        self.fallos_consecutivos = 0
+        self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        self.fallos_consecutivos += 1
+        self.fallos_total += 1
+        self._prueba_en_curso = False
+        if self.estado == 'semiabierto' or self.fallos_consecutivos >= self.umbral_fallos:
+            if self.estado != 'abierto':
+                self.aperturas += 1
+            self.estado = 'abierto'
+            self._abierto_desde = time.monotonic()
+
+    def resumen(self):
+        return {
+            'estado': self.estado,
+            'fallos_total': self.fallos_total,
+            'aperturas': self.aperturas,
+            'rechazos': self.rechazos,
+        }
@@ -0,0 +1,561 @@
+import os
+import glob
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import posixpath
+import threading
+from datetime import datetime
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from requests.exceptions import HTTPError
+
+try:
+    from O365 import Account, FileSystemTokenBackend
+    O365_DISPONIBLE = True
+except ImportError:
+    Account = FileSystemTokenBackend = None
+    O365_DISPONIBLE = False
+
+# OneDrive exige fragmentos múltiplos de 320 KiB
+TAMANO_FRAGMENTO = 320 * 1024 * 16
+UMBRAL_SESION = 4 * 1024 * 1024
+# Archivos de datos del colector en todo el árbol proyecto_X/CODIGO/fecha/
+PATRONES_SYNC = ('**/*.csv', '**/*.parquet')
+
+
+def hash_archivo(ruta, tamano_bloque=1024 * 1024):
+    """Hash blake2b del contenido de un archivo, leído por bloques"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class BackendAlmacenamiento:
+    """
+    Interfaz del almacenamiento remoto que usa SincronizadorOneDrive.
+
+    Las carpetas se manejan con handles propios del backend: carpeta_raiz
+    entrega la raíz y obtener_carpeta busca o crea una subcarpeta; el
+    sincronizador los guarda en un CacheCarpetas para resolver cada carpeta
+    una sola vez. Los archivos pequeños se suben de una vez con
+    subir_archivo; los grandes con una sesión de subida (crear_sesion +
+    subir_fragmento) que se puede retomar en otra ejecución preguntando
+    offset_sesion. Las sesiones deben ser diccionarios serializables a JSON
+    porque se guardan en el manifiesto. Los métodos se llaman desde varios
+    hilos a la vez.
+    """
+
+    def carpeta_raiz(self):
+        """Handle de la carpeta raíz remota"""
+        raise NotImplementedError
+
+    def obtener_carpeta(self, padre, nombre, ruta):
+        """Handle de la subcarpeta nombre de padre (ruta relativa completa en ruta), creándola si no existe"""
+        raise NotImplementedError
+
+    def subir_archivo(self, ruta_local, carpeta, nombre):
+        """Sube un archivo completo reemplazando el existente. Returns: id remoto"""
+        raise NotImplementedError
+
+    def crear_sesion(self, carpeta, nombre, tamano):
+        """Abre una sesión de subida por fragmentos. Returns: dict de la sesión"""
+        raise NotImplementedError
+
+    def subir_fragmento(self, sesion, inicio, datos, tamano):
+        """Sube datos desde el byte inicio. Returns: id remoto si el archivo quedó completo, si no None"""
+        raise NotImplementedError
+
+    def offset_sesion(self, sesion):
+        """Siguiente byte que espera la sesión, o None si ya no existe (expiró o se completó)"""
+        raise NotImplementedError
+
+    def borrar(self, ruta_remota, id_remoto):
+        """Elimina un archivo remoto"""
+        raise NotImplementedError
+
+
+class BackendLocal(BackendAlmacenamiento):
+    """
+    Backend que replica en una carpeta local.
+
+    Sirve para probar y medir la sincronización sin conexión: latencia
+    agrega una espera por cada operación remota (simula el viaje de ida y
+    vuelta) y peticiones / bytes_subidos cuentan el tráfico. Los handles de
+    carpeta son rutas locales. Las sesiones de subida se guardan como .parte
+    en <directorio>/.sesiones, así una subida cortada se retoma en la
+    siguiente ejecución igual que con OneDrive.
+    """
+
+    CARPETA_SESIONES = '.sesiones'
+
+    def __init__(self, directorio, latencia=0.0):
+        self.directorio = directorio
+        self.latencia = latencia
+        self.peticiones = 0
+        self.bytes_subidos = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directorio, self.CARPETA_SESIONES), exist_ok=True)
+
+    def _peticion(self, bytes_subidos=0):
+        with self._lock:
+            self.peticiones += 1
+            self.bytes_subidos += bytes_subidos
+        if self.latencia > 0:
+            time.sleep(self.latencia)
+
+    def _id(self, destino):
+        return os.path.relpath(destino, self.directorio).replace(os.sep, '/')
+
+    def _parte(self, sesion):
+        return os.path.join(self.directorio, self.CARPETA_SESIONES, f"{sesion['id']}.parte")
+
+    def carpeta_raiz(self):
+        return self.directorio
+
+    def obtener_carpeta(self, padre, nombre, ruta):
+        self._peticion()
+        carpeta = os.path.join(padre, nombre)
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    def subir_archivo(self, ruta_local, carpeta, nombre):
+        self._peticion(os.path.getsize(ruta_local))
+        destino = os.path.join(carpeta, nombre)
+        shutil.copyfile(ruta_local, destino + '.tmp')
+        os.replace(destino + '.tmp', destino)
+        return self._id(destino)
+
+    def crear_sesion(self, carpeta, nombre, tamano):
+        self._peticion()
+        sesion = {'id': uuid.uuid4().hex, 'destino': os.path.join(carpeta, nombre), 'tamano': tamano}
+        open(self._parte(sesion), 'wb').close()
+        return sesion
+
+    def subir_fragmento(self, sesion, inicio, datos, tamano):
+        self._peticion(len(datos))
+        parte = self._parte(sesion)
+        if not os.path.exists(parte):
+            raise ValueError(f"La sesión {sesion['id']} no existe")
+        if os.path.getsize(parte) != inicio:
+            raise ValueError(f"Fragmento fuera de orden: se esperaba el byte {os.path.getsize(parte)}, llegó {inicio}")
+        with open(parte, 'ab') as f:
+            f.write(datos)
+        if inicio + len(datos) < tamano:
+            return None
+        os.replace(parte, sesion['destino'])
+        return self._id(sesion['destino'])
+
+    def offset_sesion(self, sesion):
+        self._peticion()
+        parte = self._parte(sesion)
+        return os.path.getsize(parte) if os.path.exists(parte) else None
+
+    def borrar(self, ruta_remota, id_remoto):
+        self._peticion()
+        destino = os.path.join(self.directorio, *ruta_remota.split('/'))
+        if os.path.exists(destino):
+            os.remove(destino)
+
+
+class BackendOneDrive(BackendAlmacenamiento):
+    """
+    Backend de OneDrive (Microsoft Graph) a través de O365.
+
+    La conexión se abre recién en la primera operación remota, así una
+    sincronización sin cambios no habla con OneDrive. La primera vez abre
+    el enlace de autenticación en el navegador y guarda el token en
+    token_path/token_filename. Las subidas grandes usan createUploadSession
+    de Graph; la URL de la sesión se guarda en el manifiesto y sigue siendo
+    válida por días, así que una subida cortada continúa desde el último
+    fragmento confirmado. O365 responde a una ruta inexistente con un
+    HTTPError 404, que aquí se trata como "no existe".
+    """
+
+    def __init__(self, credenciales, carpeta_raiz, token_path='.', token_filename='token.txt'):
+        if not O365_DISPONIBLE:
+            raise ImportError("O365 no está instalado: no se puede sincronizar con OneDrive")
+        self.credenciales = credenciales
+        self.nombre_raiz = carpeta_raiz.strip('/')
+        self.token_path = token_path
+        self.token_filename = token_filename
+        self._drive = None
+        self._raiz = None
+        self._lock = threading.Lock()
+
+    @property
+    def drive(self):
+        with self._lock:
+            if self._drive is None:
+                token_backend = FileSystemTokenBackend(token_path=self.token_path, token_filename=self.token_filename)
+                account = Account(self.credenciales, token_backend=token_backend)
+                # Autenticación inicial (solo la primera vez abrirá un link en el navegador)
+                if not account.is_authenticated:
+                    account.authenticate(scopes=['offline_access', 'Files.ReadWrite.All'])
+                self._drive = account.storage().get_default_drive()
+            return self._drive
+
+    def _buscar(self, ruta):
+        """Item en la ruta remota o None si no existe"""
+        try:
+            return self.drive.get_item_by_path(ruta)
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def carpeta_raiz(self):
+        if self._raiz is None:
+            raiz = self._buscar(f"/{self.nombre_raiz}")
+            if raiz is None:
+                raiz = self.drive.get_root_folder().create_child_folder(self.nombre_raiz)
+                print(f"📁 Carpeta '{self.nombre_raiz}' creada en OneDrive")
+            self._raiz = raiz
+        return self._raiz
+
+    def obtener_carpeta(self, padre, nombre, ruta):
+        carpeta = self._buscar(f"/{self.nombre_raiz}/{ruta}")
+        return carpeta if carpeta is not None else padre.create_child_folder(nombre)
+
+    def subir_archivo(self, ruta_local, carpeta, nombre):
+        item = carpeta.upload_file(ruta_local, conflict_behavior='replace')
+        return item.object_id if item is not None else None
+
+    def crear_sesion(self, carpeta, nombre, tamano):
+        url = carpeta.build_url(f"/items/{carpeta.object_id}:/{quote(nombre)}:/createUploadSession")
+        respuesta = carpeta.con.post(url, data={'item': {'@microsoft.graph.conflictBehavior': 'replace'}})
+        return {'url': respuesta.json()['uploadUrl'], 'tamano': tamano}
+
+    def subir_fragmento(self, sesion, inicio, datos, tamano):
+        fin = inicio + len(datos) - 1
+        respuesta = self.drive.con.naive_request(sesion['url'], 'PUT', data=datos, headers={
+            'Content-Length': str(len(datos)),
+            'Content-Range': f"bytes {inicio}-{fin}/{tamano}",
+        })
+        if respuesta.status_code in (200, 201):
+            return respuesta.json().get('id')
+        return None
+
+    def offset_sesion(self, sesion):
+        try:
+            respuesta = self.drive.con.naive_request(sesion['url'], 'GET')
+            rangos = respuesta.json().get('nextExpectedRanges') or []
+        except Exception:
+            return None
+        if not rangos:
+            return None
+        return int(rangos[0].split('-')[0])
+
+    def borrar(self, ruta_remota, id_remoto):
+        item = self.drive.get_item(id_remoto) if id_remoto else \
+            self._buscar(f"/{self.nombre_raiz}/{ruta_remota}")
+        if item is not None:
+            item.delete()
+
+
+class CacheCarpetas:
+    """
+    Handles de carpetas remotas ya resueltos, por ruta relativa.
+
+    Cada carpeta se busca (o crea) una sola vez por sincronización aunque
+    varios hilos suban archivos a ella al mismo tiempo: el primero la
+    resuelve y los demás esperan ese resultado en lugar de repetir la
+    búsqueda o crear la carpeta dos veces.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.carpetas = {}
+        self.resueltas = 0
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def obtener(self, ruta):
+        """Handle de la carpeta remota en ruta ('' es la raíz)"""
+        carpeta = self.carpetas.get(ruta)
+        if carpeta is not None:
+            return carpeta
+        padre = self.obtener(posixpath.dirname(ruta)) if ruta else None
+        with self._lock:
+            lock = self._locks.setdefault(ruta, threading.Lock())
+        with lock:
+            if ruta not in self.carpetas:
+                if ruta:
+                    self.carpetas[ruta] = self.backend.obtener_carpeta(padre, posixpath.basename(ruta), ruta)
+                else:
+                    self.carpetas[ruta] = self.backend.carpeta_raiz()
+                with self._lock:
+                    self.resueltas += 1
+        return self.carpetas[ruta]
+
+
+class SincronizadorOneDrive:
+    """
+    Sincronización incremental de una carpeta local con un almacenamiento remoto.
+
+    Se recorre todo el árbol local (por defecto los CSV y Parquet de
+    datos/proyecto_X/CODIGO/fecha/) y en el remoto se replica la misma
+    estructura de carpetas; los handles de carpeta se resuelven una vez y
+    quedan en un CacheCarpetas, y los archivos se suben en paralelo con
+    hasta trabajadores hilos.
+
+    Un manifiesto local guarda, por archivo, tamaño, mtime, hash del
+    contenido e id remoto de lo último que se subió. Al sincronizar solo se
+    hace stat de cada archivo: si tamaño y mtime coinciden con el manifiesto
+    no se lee ni se sube; si cambiaron se calcula el hash y se sube solo si
+    el contenido es distinto. Una sincronización sin cambios cuesta un
+    recorrido del árbol y ninguna petición remota.
+
+    Los archivos de más de umbral_sesion bytes se suben por fragmentos con
+    una sesión de subida que queda anotada en el manifiesto después de cada
+    fragmento; si el proceso se corta, la siguiente ejecución pregunta al
+    backend hasta dónde llegó y continúa desde ahí.
+
+    excluir es un conjunto de rutas relativas que no se sincronizan (por
+    ejemplo, las que ya viajan dentro de un paquete de EmpaquetadorSync) y
+    prefijo_remoto una subcarpeta del remoto donde se replica el árbol. Con
+    retirar_excluidos, las rutas de excluir que ya se habían subido se
+    borran del remoto y del manifiesto.
+    """
+
+    def __init__(self, local_folder, backend, manifiesto='sync_onedrive.json', patron=PATRONES_SYNC,
+                 umbral_sesion=UMBRAL_SESION, tamano_fragmento=TAMANO_FRAGMENTO, espejo=False, trabajadores=4,
+                 excluir=None, prefijo_remoto='', retirar_excluidos=False):
+        self.local_folder = local_folder
+        self.backend = backend
+        self.ruta_manifiesto = manifiesto
+        self.patrones = (patron,) if isinstance(patron, str) else tuple(patron)
+        self.excluir = set(excluir or ())
+        self.prefijo_remoto = prefijo_remoto.strip('/')
+        self.umbral_sesion = umbral_sesion
+        self.tamano_fragmento = tamano_fragmento
+        self.espejo = espejo
+        self.retirar_excluidos = retirar_excluidos
+        self.trabajadores = max(1, int(trabajadores))
+        self.carpetas = CacheCarpetas(backend)
+        self._lock = threading.Lock()
+        self.manifiesto = self.cargar_manifiesto()
+
+    def cargar_manifiesto(self):
+        """Leer el manifiesto de la última sincronización"""
+        vacio = {'archivos': {}, 'sesiones': {}}
+        if not os.path.exists(self.ruta_manifiesto):
+            return vacio
+        try:
+            with open(self.ruta_manifiesto, 'r', encoding='utf-8') as f:
+                return dict(vacio, **json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  No se pudo leer el manifiesto de sincronización ({e}), se revisarán todos los archivos")
+            return vacio
+
+    def guardar_manifiesto(self):
+        """Escribe el manifiesto en un temporal y lo renombra"""
+        with self._lock:
+            self.manifiesto['actualizado'] = datetime.now().isoformat(timespec='seconds')
+            ruta_tmp = self.ruta_manifiesto + '.tmp'
+            with open(ruta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifiesto, f, indent=1, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(ruta_tmp, self.ruta_manifiesto)
+
+    def escanear(self):
+        """
+        Archivos locales a sincronizar.
+
+        Returns:
+            dict: {ruta relativa con '/': (ruta local, os.stat_result)}
+        """
+        archivos = {}
+        for patron in self.patrones:
+            for ruta in glob.glob(os.path.join(self.local_folder, patron), recursive=True):
+                if not os.path.isfile(ruta):
+                    continue
+                relativa = os.path.relpath(ruta, self.local_folder).replace(os.sep, '/')
+                if relativa not in self.excluir:
+                    archivos[relativa] = (ruta, os.stat(ruta))
+        return archivos
+
+    def ruta_remota(self, relativa):
+        """Ruta en el remoto de una ruta relativa a la carpeta local"""
+        return posixpath.join(self.prefijo_remoto, relativa) if self.prefijo_remoto else relativa
+
+    def cambios(self, archivos):
+        """
+        Compara el escaneo con el manifiesto.
+
+        Returns:
+            tuple: (lista de (ruta relativa, ruta local, stat, hash o None) a subir,
+                    cantidad sin cambios, cantidad de entradas con mtime actualizado)
+        """
+        pendientes = []
+        sin_cambios = 0
+        actualizados = 0
+        registrados = self.manifiesto['archivos']
+        for relativa, (ruta, stat) in sorted(archivos.items()):
+            anterior = registrados.get(relativa)
+            if anterior and anterior['tamano'] == stat.st_size and anterior['mtime_ns'] == stat.st_mtime_ns:
+                sin_cambios += 1
+                continue
+            contenido = hash_archivo(ruta) if anterior else None
+            if anterior and anterior['tamano'] == stat.st_size and anterior['hash'] == contenido:
+                # Solo cambió el mtime (copia, touch): actualizar sin volver a subir
+                anterior['mtime_ns'] = stat.st_mtime_ns
+                sin_cambios += 1
+                actualizados += 1
+                continue
+            pendientes.append((relativa, ruta, stat, contenido))
+        return pendientes, sin_cambios, actualizados
+
+    def _subir_por_sesion(self, relativa, ruta, stat, contenido, carpeta):
+        """Sube un archivo grande por fragmentos, retomando una sesión anterior si sigue vigente"""
+        sesiones = self.manifiesto['sesiones']
+        with self._lock:
+            anterior = sesiones.get(relativa)
+        inicio = None
+        if anterior and anterior['tamano'] == stat.st_size and anterior['mtime_ns'] == stat.st_mtime_ns:
+            inicio = self.backend.offset_sesion(anterior['sesion'])
+            if inicio is not None:
+                print(f"   ↪️  Retomando {relativa} desde el byte {inicio:,}")
+                sesion = anterior['sesion']
+        if inicio is None:
+            inicio = 0
+            sesion = self.backend.crear_sesion(carpeta, posixpath.basename(relativa), stat.st_size)
+            with self._lock:
+                sesiones[relativa] = {'sesion': sesion, 'tamano': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                      'hash': contenido}
+            self.guardar_manifiesto()
+
+        id_remoto = None
+        with open(ruta, 'rb') as f:
+            f.seek(inicio)
+            # Se sube el tamaño del escaneo aunque el archivo siga creciendo
+            while inicio < stat.st_size:
+                datos = f.read(min(self.tamano_fragmento, stat.st_size - inicio))
+                if not datos:
+                    raise OSError(f"{relativa} se acortó durante la subida")
+                id_remoto = self.backend.subir_fragmento(sesion, inicio, datos, stat.st_size)
+                inicio += len(datos)
+                with self._lock:
+                    sesiones[relativa]['subido'] = inicio
+                self.guardar_manifiesto()
+        with self._lock:
+            sesiones.pop(relativa, None)
+        return id_remoto
+
+    def subir(self, relativa, ruta, stat, contenido=None):
+        """
+        Sube un archivo a la carpeta remota equivalente y lo anota en el manifiesto.
+
+        Returns:
+            int: Bytes subidos
+        """
+        contenido = contenido or hash_archivo(ruta)
+        carpeta = self.carpetas.obtener(posixpath.dirname(self.ruta_remota(relativa)))
+        if stat.st_size > self.umbral_sesion:
+            id_remoto = self._subir_por_sesion(relativa, ruta, stat, contenido, carpeta)
+        else:
+            id_remoto = self.backend.subir_archivo(ruta, carpeta, posixpath.basename(relativa))
+        with self._lock:
+            self.manifiesto['archivos'][relativa] = {
+                'tamano': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'hash': contenido,
+                'id_remoto': id_remoto,
+                'subido': datetime.now().isoformat(timespec='seconds'),
+            }
+        return stat.st_size
+
+    def sincronizar(self):
+        """
+        Sube los archivos nuevos o modificados desde la última sincronización.
+
+        Returns:
+            dict: revisados, sin_cambios, subidos, bytes, fallidos, borrados,
+                  carpetas (resueltas en el remoto) y segundos
+        """
+        inicio = time.perf_counter()
+        if not os.path.exists(self.local_folder):
+            raise FileNotFoundError(f"La carpeta local '{self.local_folder}' no existe")
+        archivos = self.escanear()
+        pendientes, sin_cambios, actualizados = self.cambios(archivos)
+        print(f"🔎 {len(archivos)} archivos revisados: {len(pendientes)} nuevos o modificados, {sin_cambios} sin cambios")
+
+        resumen = {'revisados': len(archivos), 'sin_cambios': sin_cambios, 'subidos': 0, 'bytes': 0,
+                   'fallidos': 0, 'borrados': 0}
+        if pendientes:
+            ultimo_guardado = time.monotonic()
+            with ThreadPoolExecutor(max_workers=self.trabajadores, thread_name_prefix='sync') as pool:
+                futuros = {}
+                for relativa, ruta, stat, contenido in pendientes:
+                    futuros[pool.submit(self.subir, relativa, ruta, stat, contenido)] = (relativa, stat)
+                for futuro in as_completed(futuros):
+                    relativa, stat = futuros[futuro]
+                    try:
+                        resumen['bytes'] += futuro.result()
+                        resumen['subidos'] += 1
+                        print(f"📤 Subido: {relativa} ({stat.st_size:,} bytes)")
+                    except Exception as e:
+                        print(f"❌ Error subiendo {relativa}: {e}")
+                        resumen['fallidos'] += 1
+                    # Guardar cada tanto para no repetir subidas si el proceso se corta
+                    if time.monotonic() - ultimo_guardado > 5:
+                        self.guardar_manifiesto()
+                        ultimo_guardado = time.monotonic()
+
+        sobrantes = set()
+        if self.espejo:
+            sobrantes = set(self.manifiesto['archivos']) - set(archivos)
+        elif self.retirar_excluidos:
+            sobrantes = set(self.manifiesto['archivos']) & self.excluir
+        for relativa in sorted(sobrantes):
+            try:
+                self.backend.borrar(self.ruta_remota(relativa), self.manifiesto['archivos'][relativa].get('id_remoto'))
+                del self.manifiesto['archivos'][relativa]
+                resumen['borrados'] += 1
+                print(f"🗑️  Borrado en remoto: {relativa}")
+            except Exception as e:
+                print(f"❌ Error borrando {relativa}: {e}")
+
+        if pendientes or actualizados or resumen['borrados']:
+            self.guardar_manifiesto()
+        resumen['carpetas'] = self.carpetas.resueltas
+        resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+        print(f"✅ Sincronización completada: {resumen['subidos']} archivos subidos ({resumen['bytes']:,} bytes), "
+              f"{resumen['fallidos']} con error, {resumen['borrados']} borrados, "
+              f"{resumen['carpetas']} carpetas remotas resueltas en {resumen['segundos']:.2f}s")
+        return resumen
+
+
+# ===== EJECUCIÓN PRINCIPAL =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sincronización incremental de la carpeta de datos con OneDrive o con una carpeta local")
+    parser.add_argument('--local', default='datos', help="Carpeta local a sincronizar")
+    parser.add_argument('--destino', default=None,
+                        help="Carpeta local que hace de remoto (sin esto se usa OneDrive con la configuración de app.py)")
+    parser.add_argument('--manifiesto', default='sync_onedrive.json')
+    parser.add_argument('--patron', nargs='+', default=list(PATRONES_SYNC),
+                        help="Patrones glob de archivos, relativos a --local")
+    parser.add_argument('--trabajadores', type=int, default=4, help="Subidas en paralelo")
+    parser.add_argument('--espejo', action='store_true', help="Borrar en remoto lo que ya no existe localmente")
+    parser.add_argument('--latencia', type=float, default=0.0,
+                        help="Con --destino, segundos de espera por operación remota (simula la red)")
+    args = parser.parse_args()
+
+    if args.destino:
+        backend = BackendLocal(args.destino, latencia=args.latencia)
+    else:
+        from app import CLIENT_ID, CLIENT_SECRET, ONEDRIVE_FOLDER
+        backend = BackendOneDrive((CLIENT_ID, CLIENT_SECRET), ONEDRIVE_FOLDER)
+    sincronizador = SincronizadorOneDrive(args.local, backend, manifiesto=args.manifiesto, patron=args.patron,
+                                          espejo=args.espejo, trabajadores=args.trabajadores)
+    sincronizador.sincronizar()
+    if isinstance(backend, BackendLocal):
+        print(f"📊 {backend.peticiones} operaciones remotas, {backend.bytes_subidos:,} bytes enviados")
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_api_sensores import ApiSensoresSimulada  # noqa: E402
+
+
+@pytest.fixture
+def api_simulada():
+    """
+    Levanta la API simulada en un hilo (puerto libre) y entrega una función
+    que la configura: iniciar(**opciones) -> (api, url del endpoint).
+    """
+    servidores = []
+
+    def iniciar(**opciones):
+        opciones.setdefault('latencia', 0.0)
+        opciones.setdefault('jitter', 0.0)
+        api = ApiSensoresSimulada(**opciones)
+        servidor = api.crear_servidor('127.0.0.1', 0)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        servidores.append(servidor)
+        return api, f"http://127.0.0.1:{servidor.server_address[1]}/listarUltimasMediciones"
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@pytest.fixture
+def config_dispositivos(tmp_path):
+    """Escribe un config.json con dispositivos sintéticos del endpoint indicado"""
+    def escribir(api_url, cantidad=2, **extra):
+        dispositivos = [dict({'proyecto': 1, 'codigo_interno': f"SIM-{i + 1:03d}", 'api_url': api_url}, **extra)
+                        for i in range(cantidad)]
+        ruta = tmp_path / 'config.json'
+        ruta.write_text(json.dumps(dispositivos, indent=4), encoding='utf-8')
+        return str(ruta)
+    return escribir
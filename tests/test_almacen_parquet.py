@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+
+from almacen_parquet import PARQUET_DISPONIBLE, anexar_dia, leer_archivo_datos, particionar_paquete, tipar_columnas
+from diario_descargas import DiarioDescargas
+
+pytestmark = pytest.mark.skipif(not PARQUET_DISPONIBLE, reason="requiere pyarrow")
+
+
+def escribir_paquete(ruta):
+    """Paquete CSV que cruza la medianoche, con enteros, decimales, texto y un valor vacío"""
+    filas = ['id,codigo_interno,fecha,fecha_insercion,temperatura,estado']
+    for i in range(20):
+        minutos = 23 * 60 + 30 + i * 5
+        fecha = pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=minutos)
+        temperatura = '' if i == 7 else f"{10 + i / 4:.2f}"
+        filas.append(f"{i + 1},0042,{fecha:%Y-%m-%d %H:%M:%S},{fecha + pd.Timedelta(seconds=40):%Y-%m-%d %H:%M:%S},"
+                     f"{temperatura},{'ok' if i % 3 else 'revisar'}")
+    ruta.write_text('\n'.join(filas) + '\n', encoding='utf-8')
+    return str(ruta)
+
+
+def guardar(dispositivo_folder, ruta_csv):
+    """Agrega el paquete al almacén como el colector: .parcial por día y rename"""
+    rutas = {}
+    for dia, df in particionar_paquete(ruta_csv, '2024-01-01').items():
+        carpeta = os.path.join(dispositivo_folder, dia)
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"0042_{dia.replace('-', '')}.parquet")
+        anexar_dia(ruta, df, ruta + '.parcial')
+        os.replace(ruta + '.parcial', ruta)
+        rutas[dia] = ruta
+    return rutas
+
+
+def test_paquete_csv_ida_y_vuelta_por_parquet(tmp_path):
+    ruta_csv = escribir_paquete(tmp_path / 'paquete.csv')
+    dispositivo_folder = str(tmp_path / 'proyecto_1' / '0042')
+    rutas = guardar(dispositivo_folder, ruta_csv)
+    assert sorted(rutas) == ['2024-01-01', '2024-01-02']
+
+    esperado = tipar_columnas(pd.read_csv(ruta_csv, dtype=str, keep_default_na=False, na_values=['']))
+    leido = pd.concat([leer_archivo_datos(rutas[dia]) for dia in sorted(rutas)], ignore_index=True)
+    pd.testing.assert_frame_equal(leido, esperado)
+    assert str(leido['codigo_interno'].dtype) == 'string' and (leido['codigo_interno'] == '0042').all()
+    assert pd.api.types.is_datetime64_any_dtype(leido['fecha_insercion'])
+    assert pd.api.types.is_integer_dtype(leido['id']) and leido['temperatura'].isna().sum() == 1
+
+    # Volver a agregar el mismo paquete a días que ya existen no cambia los archivos
+    guardar(dispositivo_folder, ruta_csv)
+    for dia, ruta in rutas.items():
+        pd.testing.assert_frame_equal(leer_archivo_datos(ruta), leido[leido['fecha'].dt.strftime('%Y-%m-%d') == dia]
+                                      .reset_index(drop=True))
+
+    # La numeración de paquetes no vuelve a 1 en una carpeta que solo tiene Parquet
+    assert DiarioDescargas(dispositivo_folder).siguiente_paquete('2024-01-01') == 2
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from cache_esquemas import CacheEsquemas, clave_esquema
+
+ENDPOINT = 'http://api/listarUltimasMediciones'
+
+
+def escribir_paquete(carpeta, nombre, columnas, filas):
+    ruta = carpeta / nombre
+    ruta.write_text(','.join(columnas) + '\n' + ''.join(','.join(fila) + '\n' for fila in filas), encoding='utf-8')
+    return str(ruta)
+
+
+def paquete_agua(carpeta, numero, valor_ph=None):
+    """Paquete de un dispositivo de agua: fecha, entero, decimal y una categoría"""
+    filas = [(f"2024-01-0{numero} 00:{i:02d}:00", str(numero * 100 + i), valor_ph or f"{7 + i / 100:.2f}",
+              'ok' if i % 2 else 'revisar') for i in range(10)]
+    return escribir_paquete(carpeta, f"agua_{numero}.csv", ['fecha', 'id', 'ph', 'estado'], filas)
+
+
+def test_aprende_en_n_paquetes_y_luego_fija_los_tipos(tmp_path):
+    cache = CacheEsquemas(None, paquetes_aprendizaje=3)
+    clave = clave_esquema(ENDPOINT, 'AGUA-01')
+    for numero in (1, 2):
+        cache.leer_csv(paquete_agua(tmp_path, numero), clave)
+        assert not cache.esquemas[clave]['fijo']
+    cache.leer_csv(paquete_agua(tmp_path, 3), clave)
+    esquema = cache.esquemas[clave]
+    assert esquema['fijo']
+    assert {n: c['tipo'] for n, c in esquema['columnas'].items()} == {
+        'fecha': 'fecha', 'id': 'entero', 'ph': 'decimal', 'estado': 'categoria'}
+
+    tipos = [cache.leer_csv(paquete_agua(tmp_path, numero), clave).dtypes for numero in (4, 5)]
+    pd.testing.assert_series_equal(tipos[0], tipos[1])
+    assert str(tipos[0]['id']) == 'Int64' and str(tipos[0]['ph']) == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(tipos[0]['fecha'])
+    assert not esquema['derivas']
+
+
+def test_informa_la_deriva_sin_forzar_valores(tmp_path, capsys):
+    cache = CacheEsquemas(None, paquetes_aprendizaje=1)
+    clave = clave_esquema(ENDPOINT, 'AGUA-01')
+    cache.leer_csv(paquete_agua(tmp_path, 1), clave)
+
+    df = cache.leer_csv(paquete_agua(tmp_path, 2, valor_ph='s/d'), clave)
+    # La columna que no calza queda como texto con sus valores, no como NaN
+    assert df['ph'].dtype == 'string' and (df['ph'] == 's/d').all()
+    assert str(df['id'].dtype) == 'Int64'
+    nueva = escribir_paquete(tmp_path, 'nueva.csv', ['fecha', 'id', 'ph', 'estado', 'turbidez'],
+                             [('2024-01-03 00:00:00', '1', '7.1', 'ok', '3')])
+    cache.leer_csv(nueva, clave)
+
+    derivas = cache.esquemas[clave]['derivas']
+    assert set(derivas) == {'tipo:ph', 'columna_nueva:turbidez'}
+    assert derivas['tipo:ph']['veces'] == 1
+    assert capsys.readouterr().out.count('Deriva de esquema') == 2
+
+
+def test_dispositivos_del_mismo_endpoint_no_comparten_esquema(tmp_path, capsys):
+    cache = CacheEsquemas(None, paquetes_aprendizaje=1)
+    agua = clave_esquema(ENDPOINT, 'AGUA-01')
+    lvag = clave_esquema(ENDPOINT, 'LVAG-01')
+    cache.leer_csv(paquete_agua(tmp_path, 1), agua)
+    otra = escribir_paquete(tmp_path, 'lvag.csv', ['fecha', 'nivel', 'caudal'],
+                            [(f"2024-01-01 00:{i:02d}:00", f"{i}.5", str(i)) for i in range(5)])
+    cache.leer_csv(otra, lvag)
+    df = cache.leer_csv(otra, lvag)
+
+    assert 'Deriva' not in capsys.readouterr().out
+    assert not cache.esquemas[agua]['derivas'] and not cache.esquemas[lvag]['derivas']
+    assert str(df['caudal'].dtype) == 'Int64' and str(df['nivel'].dtype) == 'float64'
+
+
+def test_el_esquema_se_conserva_entre_ejecuciones(tmp_path):
+    archivo = str(tmp_path / 'esquemas.json')
+    clave = clave_esquema(ENDPOINT, 'AGUA-01')
+    cache = CacheEsquemas(archivo, paquetes_aprendizaje=2)
+    for numero in (1, 2):
+        cache.leer_csv(paquete_agua(tmp_path, numero), clave)
+    tipos = cache.leer_csv(paquete_agua(tmp_path, 3), clave).dtypes
+    cache.guardar()
+
+    reiniciado = CacheEsquemas(archivo, paquetes_aprendizaje=2)
+    assert reiniciado.esquemas[clave]['fijo']
+    pd.testing.assert_series_equal(reiniciado.leer_csv(paquete_agua(tmp_path, 4), clave).dtypes, tipos)
+
+    assert reiniciado.olvidar(ENDPOINT) == 1
+    assert clave not in reiniciado.esquemas
@@ -0,0 +1,69 @@
+import os
+import json
+import glob
+
+import pandas as pd
+
+from compactador_paquetes import CompactadorPaquetes
+
+
+def escribir_paquete(dispositivo_folder, carpeta, nombre, filas):
+    ruta = os.path.join(dispositivo_folder, carpeta, nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('codigo_interno,fecha,fecha_insercion,valor\n')
+        f.writelines(f"D0,{fecha},{insercion},{valor}\n" for fecha, insercion, valor in filas)
+
+
+def crear_paquetes(dispositivo_folder):
+    """
+    Paquetes de dos días cerrados (el segundo repite filas del primero y
+    trae mediciones del día siguiente), uno push y uno de un día abierto.
+
+    Returns:
+        list: Filas de los días cerrados
+    """
+    filas = [(f"2024-01-01 {h:02d}:00:00", f"2024-01-01 {h:02d}:00:30", str(h)) for h in range(24)]
+    tardias = [(f"2024-01-02 0{h}:00:00", f"2024-01-02 0{h}:05:00", f"t{h}") for h in range(5)]
+    escribir_paquete(dispositivo_folder, '2024-01-01', 'D0_paquete_001_20240101.csv', filas[:15])
+    escribir_paquete(dispositivo_folder, '2024-01-01', 'D0_paquete_002_20240102.csv', filas[10:] + tardias[:3])
+    escribir_paquete(dispositivo_folder, '2024-01-02', 'D0_push_001_20240102.csv', tardias[2:])
+    escribir_paquete(dispositivo_folder, '2024-01-05', 'D0_paquete_001_20240105.csv',
+                     [('2024-01-05 00:00:00', '2024-01-05 00:00:10', 'abierto')])
+    return filas + tardias
+
+
+def leer_dias(dispositivo_folder):
+    return {os.path.basename(ruta): pd.read_csv(ruta, dtype=str, keep_default_na=False)
+            for ruta in sorted(glob.glob(os.path.join(dispositivo_folder, '*', '*_dia_*.csv')))}
+
+
+def test_compactar_conserva_las_filas_y_repetir_no_cambia_nada(tmp_path):
+    dispositivo_folder = str(tmp_path / 'datos' / 'proyecto_1' / 'D0')
+    filas = crear_paquetes(dispositivo_folder)
+
+    resultado = CompactadorPaquetes(str(tmp_path / 'datos'), borrar_origen=False).ejecutar()
+    assert resultado == {'dias': 2, 'paquetes': 3, 'filas': len(filas), 'duplicados': 6}
+    dias = leer_dias(dispositivo_folder)
+    assert set(dias) == {'D0_dia_20240101.csv', 'D0_dia_20240102.csv'}
+    compactadas = pd.concat(dias.values(), ignore_index=True)
+    assert list(zip(compactadas['fecha'], compactadas['fecha_insercion'], compactadas['valor'])) == filas
+    assert os.path.exists(os.path.join(dispositivo_folder, '2024-01-05', 'D0_paquete_001_20240105.csv'))
+
+    with open(os.path.join(dispositivo_folder, CompactadorPaquetes.NOMBRE_MANIFIESTO), encoding='utf-8') as f:
+        fuentes = {dia: entrada['fuentes'] for dia, entrada in json.load(f)['dias'].items()}
+
+    # Con --conservar los mismos paquetes vuelven a pasar sin cambiar días ni manifiesto
+    CompactadorPaquetes(str(tmp_path / 'datos'), borrar_origen=False).ejecutar()
+    for nombre, df in leer_dias(dispositivo_folder).items():
+        pd.testing.assert_frame_equal(df, dias[nombre])
+    with open(os.path.join(dispositivo_folder, CompactadorPaquetes.NOMBRE_MANIFIESTO), encoding='utf-8') as f:
+        assert {dia: entrada['fuentes'] for dia, entrada in json.load(f)['dias'].items()} == fuentes
+    assert [f['ruta'] for f in fuentes['2024-01-02']] == [
+        os.path.join('2024-01-01', 'D0_paquete_002_20240102.csv'), os.path.join('2024-01-02', 'D0_push_001_20240102.csv')]
+
+    # Borrando los paquetes, la siguiente pasada ya no tiene nada que compactar
+    CompactadorPaquetes(str(tmp_path / 'datos')).ejecutar()
+    assert CompactadorPaquetes(str(tmp_path / 'datos')).ejecutar()['paquetes'] == 0
+    for nombre, df in leer_dias(dispositivo_folder).items():
+        pd.testing.assert_frame_equal(df, dias[nombre])
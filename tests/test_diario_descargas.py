@@ -0,0 +1,29 @@
+import os
+
+import diario_descargas
+from diario_descargas import DiarioDescargas
+
+
+def test_siguiente_paquete_busca_en_disco_una_vez_por_carpeta(tmp_path, monkeypatch):
+    carpeta = tmp_path / '2024-01-01'
+    carpeta.mkdir()
+    (carpeta / 'D0_paquete_007_20240101.csv').write_text('fecha\n')
+    diario = DiarioDescargas(str(tmp_path))
+
+    busquedas = []
+    glob_original = diario_descargas.glob.glob
+    monkeypatch.setattr(diario_descargas.glob, 'glob', lambda patron: busquedas.append(patron) or glob_original(patron))
+
+    assert diario.siguiente_paquete('2024-01-01') == 8
+    for numero in (8, 9):
+        parcial = f"D0_paquete_{numero:03d}.parcial"
+        diario.registrar('2024-01-01', parcial, f"D0_paquete_{numero:03d}_20240101.csv", numero, 1, 10)
+        assert diario.siguiente_paquete('2024-01-01') == numero + 1
+    # Los paquetes push llevan su propia numeración
+    diario.registrar('2024-01-01', 'x.push', 'D0_push_050_20240101.csv', 50, 1, 10, origen='push')
+    assert diario.siguiente_paquete('2024-01-01') == 10
+    assert len(busquedas) == 1
+
+    # Un diario nuevo (reinicio del proceso) parte de lo anotado y de lo que hay en disco
+    assert DiarioDescargas(str(tmp_path)).siguiente_paquete('2024-01-01') == 10
+    assert os.path.exists(os.path.join(tmp_path, DiarioDescargas.NOMBRE_ARCHIVO))
@@ -0,0 +1,52 @@
+import os
+import glob
+
+import pytest
+
+from empaquetador_sync import ZSTD_DISPONIBLE, EmpaquetadorSync, extraer_paquete
+
+
+def crear_datos(carpeta):
+    """Días cerrados con CSV y Parquet (bytes arbitrarios) más un día abierto que no se empaqueta"""
+    archivos = {}
+    for proyecto in ('proyecto_1', 'proyecto_2'):
+        for dispositivo in ('D0', 'D1'):
+            for fecha in ('2024-01-01', '2024-01-02', '2024-02-01'):
+                for nombre, contenido in ((f"{dispositivo}_paquete_001_{fecha}.csv",
+                                           ''.join(f"{fecha} 00:{i:02d}:00,{i}\n" for i in range(60)).encode()),
+                                          (f"{dispositivo}_{fecha.replace('-', '')}.parquet", os.urandom(3000))):
+                    relativa = f"{proyecto}/{dispositivo}/{fecha}/{nombre}"
+                    archivos[relativa] = contenido
+    for relativa, contenido in archivos.items():
+        ruta = os.path.join(carpeta, *relativa.split('/'))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as f:
+            f.write(contenido)
+    abierto = os.path.join(carpeta, 'proyecto_1', 'D0', '2999-01-01')
+    os.makedirs(abierto)
+    with open(os.path.join(abierto, 'D0_paquete_001_2999-01-01.csv'), 'w') as f:
+        f.write('fecha,valor\n')
+    return archivos
+
+
+@pytest.mark.parametrize('agrupacion', ['dia', 'mes'])
+@pytest.mark.parametrize('compresion', [
+    'gz', pytest.param('zst', marks=pytest.mark.skipif(not ZSTD_DISPONIBLE, reason="requiere zstandard"))])
+def test_empaquetar_y_extraer_devuelve_los_mismos_archivos(tmp_path, agrupacion, compresion):
+    archivos = crear_datos(tmp_path / 'datos')
+    empaquetador = EmpaquetadorSync(str(tmp_path / 'datos'), str(tmp_path / 'paquetes'), agrupacion, compresion)
+    resumen = empaquetador.empaquetar()
+    assert resumen['archivos'] == len(archivos)
+    assert empaquetador.archivos_empaquetados() == set(archivos)
+
+    restaurados = []
+    for ruta_paquete in sorted(glob.glob(str(tmp_path / 'paquetes' / '*' / '*.tar.*'))):
+        restaurados.extend(extraer_paquete(ruta_paquete, str(tmp_path / 'restaurado')))
+    assert sorted(restaurados) == sorted(archivos)
+    for relativa, contenido in archivos.items():
+        with open(os.path.join(tmp_path, 'restaurado', *relativa.split('/')), 'rb') as f:
+            assert f.read() == contenido
+
+    # Sin cambios en los datos no se vuelve a armar nada
+    assert EmpaquetadorSync(str(tmp_path / 'datos'), str(tmp_path / 'paquetes'),
+                            agrupacion, compresion).empaquetar()['paquetes'] == 0
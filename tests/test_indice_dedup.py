@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+
+import colector_async
+from colector_async import ColectorAsync
+from estado_colector import EstadoColector
+from indice_dedup import IndiceDedup
+
+from test_colector_async import crear_colector
+
+
+def claves(indice, inicio, cantidad):
+    return [indice.clave(f"2024-01-01 00:{i:02d}:00", f"2024-01-01 00:{i:02d}:30")
+            for i in range(inicio, inicio + cantidad)]
+
+
+def test_confirmadas_se_conservan_entre_ejecuciones(tmp_path):
+    indice = IndiceDedup(str(tmp_path))
+    confirmadas, perdidas = claves(indice, 0, 10), claves(indice, 10, 5)
+    indice.reservar(confirmadas + perdidas)
+    indice.confirmar(confirmadas)
+    # Un corte a mitad de un registro no invalida el archivo
+    with open(indice.ruta, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+
+    reiniciado = IndiceDedup(str(tmp_path))
+    assert len(reiniciado) == 10
+    assert all(reiniciado.es_duplicado(c) for c in confirmadas)
+    assert not any(reiniciado.es_duplicado(c) for c in perdidas)
+
+
+def test_claves_fuera_del_horizonte_se_olvidan(tmp_path):
+    indice = IndiceDedup(str(tmp_path), horizonte_dias=1)
+    viejas, nuevas = claves(indice, 0, 30), claves(indice, 30, 10)
+    indice.confirmar(viejas)
+    with open(indice.ruta, 'r+b') as f:
+        f.truncate(0)
+        hace_dias = int(time.time()) - 3 * 86400
+        f.write(b''.join(IndiceDedup._REGISTRO.pack(c, hace_dias) for c in viejas))
+    indice.confirmar(nuevas)
+
+    reiniciado = IndiceDedup(str(tmp_path), horizonte_dias=1)
+    assert set(reiniciado.confirmadas) == set(nuevas)
+    # Más de la mitad estaba vencida: el archivo se compactó
+    assert os.path.getsize(reiniciado.ruta) == len(nuevas) * IndiceDedup._REGISTRO.size
+
+
+def test_descartar_solo_las_claves_del_paquete_perdido(tmp_path):
+    indice = IndiceDedup(str(tmp_path))
+    en_cola, descartado = claves(indice, 0, 10), claves(indice, 10, 10)
+    indice.reservar(en_cola)
+    indice.reservar(descartado)
+    indice.descartar_pendientes(descartado)
+    assert indice.pendientes == set(en_cola)
+
+    # Desde el colector, sin claves se olvidan las reservadas por la descarga y no las de otros
+    push = claves(indice, 20, 5)
+    indice.reservar(push)
+    descarga = {'indice': indice, 'claves_pendientes': set(en_cola)}
+    ColectorAsync._descartar_claves(descarga)
+    assert indice.pendientes == set(push) and not descarga['claves_pendientes']
+
+
+def test_refrescar_suma_las_claves_de_otro_proceso(tmp_path):
+    colector, receptor = IndiceDedup(str(tmp_path)), IndiceDedup(str(tmp_path))
+    propias, ajenas = claves(colector, 0, 10), claves(colector, 10, 10)
+    colector.confirmar(propias)
+    receptor.confirmar(ajenas)
+    assert not colector.es_duplicado(ajenas[0])
+    assert colector.refrescar() == 20
+    assert all(colector.es_duplicado(c) for c in propias + ajenas)
+    assert colector.refrescar() == 0
+
+    # Tras una compactación del otro proceso el archivo se vuelve a leer entero
+    receptor.confirmadas = {c: ts for c, ts in receptor.confirmadas.items() if c in ajenas}
+    receptor.compactar()
+    receptor.confirmar(claves(receptor, 20, 1))
+    assert colector.refrescar() == 11
+    assert colector.es_duplicado(claves(colector, 20, 1)[0]) and len(colector) == 21
+
+
+class IndiceLento(IndiceDedup):
+    """Índice que tarda en cargar, para que dos hilos lo pidan a la vez"""
+
+    def __init__(self, *args, **kwargs):
+        time.sleep(0.05)
+        super().__init__(*args, **kwargs)
+
+
+def test_indice_por_dispositivo_compartido_entre_hilos(tmp_path, config_dispositivos, monkeypatch):
+    monkeypatch.setattr(colector_async, 'IndiceDedup', IndiceLento)
+    estado = EstadoColector(str(tmp_path / 'estado.db'))
+    colector = crear_colector(tmp_path, config_dispositivos('http://api'), estado)
+    barrera = threading.Barrier(8)
+    indices = []
+
+    def pedir():
+        barrera.wait()
+        indices.append(colector._indice('SIM-001', str(tmp_path)))
+
+    hilos = [threading.Thread(target=pedir) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    estado.cerrar()
+    assert len(indices) == 8 and all(indice is indices[0] for indice in indices)
@@ -0,0 +1,74 @@
+import json
+
+from metricas_colector import MetricasColector
+
+ENDPOINT = 'http://api/listarUltimasMediciones'
+# Comillas, barra invertida y salto de línea se escapan en las etiquetas
+CODIGO = 'SIM"1\\a\nb'
+CODIGO_ESCAPADO = 'SIM\\"1\\\\a\\nb'
+
+
+def registrar(metricas):
+    for segundos, estado in ((0.03, 200), (0.07, 200), (0.3, 200), (200.1, 'timeout')):
+        metricas.registrar_peticion(CODIGO, ENDPOINT, segundos, estado)
+    metricas.registrar_reintento(CODIGO)
+    metricas.registrar_reintento(CODIGO)
+    metricas.registrar_recepcion(CODIGO, 4096, 120)
+    metricas.registrar_paquete(CODIGO, 50)
+    metricas.registrar_paquete(CODIGO, 45)
+    metricas.agregar_tiempo(CODIGO, 'red', 0.25)
+    metricas.finalizar_ejecucion(duracion=1.5)
+
+
+def test_texto_prometheus(tmp_path):
+    metricas = MetricasColector(str(tmp_path))
+    registrar(metricas)
+    lineas = metricas.texto_prometheus().splitlines()
+
+    nombre = 'colector_latencia_endpoint_segundos'
+    buckets = {linea.split('le="')[1].split('"')[0]: int(linea.rsplit(' ', 1)[1])
+               for linea in lineas if linea.startswith(f'{nombre}_bucket{{endpoint="{ENDPOINT}"')}
+    assert buckets == {'0.05': 1, '0.1': 2, '0.25': 2, '0.5': 3, '1.0': 3, '2.5': 3, '5.0': 3,
+                       '10.0': 3, '30.0': 3, '60.0': 3, '120.0': 3, '+Inf': 4}
+    assert f'{nombre}_sum{{endpoint="{ENDPOINT}"}} 200.500000' in lineas
+    assert f'{nombre}_count{{endpoint="{ENDPOINT}"}} 4' in lineas
+    assert f'# TYPE {nombre} histogram' in lineas
+
+    dispositivo = f'dispositivo="{CODIGO_ESCAPADO}"'
+    assert f'colector_latencia_dispositivo_segundos_bucket{{{dispositivo},le="+Inf"}} 4' in lineas
+    assert f'colector_latencia_dispositivo_segundos_count{{{dispositivo}}} 4' in lineas
+    assert f'colector_peticiones_total{{endpoint="{ENDPOINT}",estado="200"}} 3' in lineas
+    assert f'colector_peticiones_total{{endpoint="{ENDPOINT}",estado="timeout"}} 1' in lineas
+    assert f'colector_reintentos_total{{{dispositivo}}} 2' in lineas
+    assert f'colector_paquetes_escritos_total{{{dispositivo}}} 2' in lineas
+    assert f'colector_filas_escritas_total{{{dispositivo}}} 95' in lineas
+    assert f'colector_tiempo_segundos_total{{{dispositivo},fase="red"}} 0.250000' in lineas
+    assert 'colector_ejecuciones_total 1' in lineas
+    assert 'colector_duracion_ultima_segundos 1.500' in lineas
+
+
+def test_resumen_json(tmp_path):
+    metricas = MetricasColector(str(tmp_path))
+    registrar(metricas)
+    ruta_json, ruta_prom = metricas.guardar()
+    with open(ruta_json, encoding='utf-8') as f:
+        resumen = json.load(f)
+
+    assert resumen['ejecuciones'] == 1 and resumen['duracion_ultima_segundos'] == 1.5
+    endpoint = resumen['endpoints'][ENDPOINT]
+    assert endpoint['peticiones'] == {'200': 3, 'timeout': 1}
+    latencia = endpoint['latencia']
+    assert latencia['cuenta'] == 4 and latencia['suma_segundos'] == 200.5
+    assert latencia['p50'] == 0.1 and latencia['p99'] == '+Inf'
+    assert latencia['buckets']['0.5'] == 3 and latencia['buckets']['+Inf'] == 4
+
+    dispositivo = resumen['dispositivos'][CODIGO]
+    assert {clave: dispositivo[clave] for clave in ('bytes_recibidos', 'filas_recibidas', 'paquetes_escritos',
+                                                    'filas_escritas', 'reintentos')} == {
+        'bytes_recibidos': 4096, 'filas_recibidas': 120, 'paquetes_escritos': 2,
+        'filas_escritas': 95, 'reintentos': 2}
+    assert dispositivo['tiempo'] == {'red': 0.25, 'parseo': 0.0, 'disco': 0.0}
+    assert dispositivo['latencia']['cuenta'] == 4
+    # El .prom es el mismo texto salvo la marca de tiempo de la última línea
+    with open(ruta_prom, encoding='utf-8') as f:
+        assert f.read().splitlines()[:-1] == metricas.texto_prometheus().splitlines()[:-1]
@@ -0,0 +1,140 @@
+import os
+import glob
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import requests
+
+from estado_colector import EstadoColector
+from mock_api_sensores import COLUMNAS, FORMATO_FECHA
+from receptor_push import ReceptorPush
+
+from test_colector_async import claves_descargadas, claves_servidor, crear_colector
+
+DISPOSITIVOS = [{'proyecto': 1, 'codigo_interno': 'SIM-001'}, {'proyecto': 1, 'codigo_interno': 'SIM-002'}]
+
+
+def fila(codigo_interno, fecha, fecha_insercion, valor='1'):
+    return {'codigo_interno': codigo_interno, 'fecha': fecha.strftime(FORMATO_FECHA),
+            'fecha_insercion': fecha_insercion.strftime(FORMATO_FECHA), 'temperatura': valor}
+
+
+def filas_lote(codigo_interno, cantidad, inicio=datetime(2024, 1, 1)):
+    return [fila(codigo_interno, inicio + timedelta(minutes=i), inicio + timedelta(minutes=i, seconds=30))
+            for i in range(cantidad)]
+
+
+def test_validar_rechaza_filas_incompletas_y_dispositivos_ajenos(tmp_path):
+    receptor = ReceptorPush(str(tmp_path), EstadoColector(str(tmp_path / 'estado.db')), DISPOSITIVOS)
+    ok = fila('SIM-001', datetime(2024, 1, 1), datetime(2024, 1, 1, 0, 1))
+    filas = [
+        dict(ok),
+        dict(ok, fecha_insercion=''),
+        dict(ok, codigo_interno='OTRO-001'),
+        dict(ok, id_proyecto='2'),
+        dict(ok, fecha='ayer'),
+        dict(ok, codigo_interno=''),
+    ]
+    validas, errores = receptor.validar(filas, {'disp.codigo_interno': 'SIM-002'})
+
+    # La fila sin código toma el de la URL y el proyecto sale de config.json
+    assert [(p, c) for p, c, _ in validas] == [('1', 'SIM-001'), ('1', 'SIM-002')]
+    assert [e.split(':')[0] for e in errores] == ['fila 2', 'fila 3', 'fila 4', 'fila 5']
+    assert 'fecha_insercion' in errores[0] and 'desconocido' in errores[1]
+    assert 'no pertenece' in errores[2] and 'inválida' in errores[3]
+
+
+def test_cola_llena_responde_503(tmp_path):
+    receptor = ReceptorPush(str(tmp_path), EstadoColector(str(tmp_path / 'estado.db')), DISPOSITIVOS,
+                            max_filas_cola=3)
+    # Solo el servidor HTTP, sin hilo escritor: la cola no se vacía
+    servidor = receptor.crear_servidor()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/mediciones"
+    try:
+        primera = requests.post(url, json=filas_lote('SIM-001', 2))
+        segunda = requests.post(url, json=filas_lote('SIM-001', 2))
+        rechazada = requests.post(url, json=[{'codigo_interno': 'SIM-001'}])
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    assert primera.status_code == 202 and primera.json()['aceptadas'] == 2
+    assert segunda.status_code == 503 and segunda.headers['Retry-After'] == '1'
+    assert rechazada.status_code == 400 and rechazada.json()['rechazadas'] == 1
+    assert receptor.contadores['saturado'] == 1 and receptor._filas_en_cola == 2
+
+
+def test_escritor_agrupa_lotes_por_dispositivo(tmp_path):
+    receptor = ReceptorPush(str(tmp_path), EstadoColector(str(tmp_path / 'estado.db')), DISPOSITIVOS,
+                            tamano_lote=12, intervalo_lote=60.0)
+    for codigo_interno in ('SIM-001', 'SIM-002'):
+        for lote in range(2):
+            filas = filas_lote(codigo_interno, 3, datetime(2024, 1, 1, lote))
+            assert receptor.encolar(receptor.validar(filas, {})[0])
+    escritor = threading.Thread(target=receptor._escritor, daemon=True)
+    escritor.start()
+    # Se escribe al juntar tamano_lote filas, sin esperar intervalo_lote
+    limite = time.monotonic() + 10
+    while receptor.contadores['paquetes'] < 2 and time.monotonic() < limite:
+        time.sleep(0.05)
+    receptor._detener.set()
+    escritor.join(timeout=10)
+
+    assert receptor.contadores['paquetes'] == 2 and receptor.contadores['escritas'] == 12
+    assert receptor._filas_en_cola == 0
+    for codigo_interno in ('SIM-001', 'SIM-002'):
+        paquetes = glob.glob(os.path.join(tmp_path, 'proyecto_1', codigo_interno, '*', '*_push_*.csv'))
+        assert [os.path.basename(p) for p in paquetes] == [f"{codigo_interno}_push_001_20240101.csv"]
+
+
+def test_marca_avanza_solo_con_filas_contiguas(tmp_path):
+    estado = EstadoColector(str(tmp_path / 'estado.db'))
+    estado.avanzar_marca('SIM-001', '2024-01-01T00:00:00')
+    receptor = ReceptorPush(str(tmp_path), estado, DISPOSITIVOS, hueco_marca=300)
+    inicio = datetime(2024, 1, 1)
+
+    fechas = [inicio + timedelta(minutes=m) for m in (2, 6, 9, 30, 31)]
+    assert receptor.marca_contigua('SIM-001', fechas) == '2024-01-01T00:09:00'
+    # Un lote que empieza después de un hueco deja el tramo al sondeo
+    assert receptor.marca_contigua('SIM-001', fechas[3:]) is None
+    # Sin marca el sondeo todavía no bajó la historia
+    assert receptor.marca_contigua('SIM-002', fechas) is None
+
+
+def test_filas_push_no_se_vuelven_a_descargar(tmp_path, api_simulada, config_dispositivos):
+    api, url = api_simulada(dias=1, intervalo_minutos=5)
+    config_path = config_dispositivos(url, cantidad=1)
+    estado = EstadoColector(str(tmp_path / 'estado.db'))
+    # El receptor corre aparte: su propio estado e índices sobre los mismos archivos
+    estado_receptor = EstadoColector(str(tmp_path / 'estado.db'))
+    try:
+        colector = crear_colector(tmp_path, config_path, estado)
+        colector.ejecutar()
+
+        # El dispositivo sube por push mediciones que la API también recibe
+        dispositivo = api.dispositivo(1, 'SIM-001')
+        with dispositivo._lock:
+            ultima = dispositivo.claves[-1][0]
+            for i in range(1, 21):
+                dispositivo._agregar(ultima + timedelta(seconds=30 * i - 20), ultima + timedelta(seconds=30 * i))
+            enviadas = [dict(zip(COLUMNAS, map(str, f))) for f in dispositivo.filas[-20:]]
+        receptor = ReceptorPush(colector.output_folder, estado_receptor, DISPOSITIVOS)
+        validas, errores = receptor.validar(enviadas, {})
+        assert not errores
+        assert receptor.escribir_paquete('1', 'SIM-001', [f for _, _, f in validas]) is not None
+        assert estado.obtener_ultima_fecha('SIM-001') == (ultima + timedelta(seconds=600)).strftime('%Y-%m-%dT%H:%M:%S')
+
+        # El mismo colector (índice en memoria desde antes del push) sigue desde la marca
+        api.reiniciar_estadisticas()
+        colector.ejecutar()
+        assert api.estadisticas()['filas'] <= 1
+    finally:
+        estado.cerrar()
+        estado_receptor.cerrar()
+
+    descargadas = claves_descargadas(tmp_path, 'SIM-001')
+    assert not [clave for clave, n in Counter(descargadas).items() if n > 1]
+    assert not claves_servidor(api, 'SIM-001') - set(descargadas)
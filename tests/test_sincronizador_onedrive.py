@@ -0,0 +1,215 @@
+import os
+import threading
+
+import pytest
+import requests
+
+from sincronizador_onedrive import BackendLocal, BackendOneDrive, SincronizadorOneDrive
+
+
+def crear_arbol(carpeta, proyectos=2, dispositivos=3, dias=4):
+    """Árbol datos/proyecto_X/CODIGO/fecha/ con un CSV por carpeta de fecha"""
+    for p in range(1, proyectos + 1):
+        for d in range(dispositivos):
+            for dia in range(1, dias + 1):
+                fecha = f"2024-01-{dia:02d}"
+                ruta = os.path.join(carpeta, f"proyecto_{p}", f"D{d}", fecha, f"D{d}_paquete_001_{fecha}.csv")
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with open(ruta, 'w', encoding='utf-8') as f:
+                    f.write('fecha,valor\n' + ''.join(f"{fecha} 00:{i:02d}:00,{p * d * i}\n" for i in range(50)))
+
+
+def contenido_arbol(carpeta, ignorar=(BackendLocal.CARPETA_SESIONES,)):
+    """{ruta relativa: bytes} de todos los archivos bajo carpeta"""
+    archivos = {}
+    for raiz, carpetas, nombres in os.walk(carpeta):
+        carpetas[:] = [c for c in carpetas if c not in ignorar]
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre)
+            with open(ruta, 'rb') as f:
+                archivos[os.path.relpath(ruta, carpeta).replace(os.sep, '/')] = f.read()
+    return archivos
+
+
+def sincronizar(local, remoto, manifiesto, **opciones):
+    backend = BackendLocal(str(remoto), latencia=opciones.pop('latencia', 0.0))
+    sincronizador = SincronizadorOneDrive(str(local), backend, manifiesto=str(manifiesto), **opciones)
+    return sincronizador, sincronizador.sincronizar()
+
+
+def test_replica_el_arbol_y_resuelve_cada_carpeta_una_vez(tmp_path):
+    local = tmp_path / 'datos'
+    crear_arbol(local)
+    sincronizador, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json',
+                                         trabajadores=8, latencia=0.002)
+
+    assert contenido_arbol(tmp_path / 'remoto') == contenido_arbol(local)
+    carpetas = {os.path.relpath(raiz, local) for raiz, _, _ in os.walk(local)}
+    # La raíz más cada subcarpeta, aunque 8 hilos suban a la vez a las mismas carpetas
+    assert sincronizador.carpetas.resueltas == len(carpetas)
+    assert sincronizador.backend.peticiones == (len(carpetas) - 1) + resumen['subidos']
+
+
+def test_subida_en_paralelo_igual_a_un_trabajador(tmp_path):
+    local = tmp_path / 'datos'
+    crear_arbol(local)
+    manifiestos = {}
+    for trabajadores in (1, 8):
+        sincronizador, _ = sincronizar(local, tmp_path / f"remoto_{trabajadores}", tmp_path / f"sync_{trabajadores}.json",
+                                       trabajadores=trabajadores)
+        manifiestos[trabajadores] = {relativa: {k: v for k, v in entrada.items() if k != 'subido'}
+                                     for relativa, entrada in sincronizador.manifiesto['archivos'].items()}
+    assert manifiestos[8] == manifiestos[1]
+    assert contenido_arbol(tmp_path / 'remoto_8') == contenido_arbol(tmp_path / 'remoto_1')
+
+
+class DriveSinRuta:
+    """Drive de O365 que, como Graph, responde 404 a las rutas que no existen"""
+
+    def __init__(self):
+        self.creadas = []
+
+    def get_item_by_path(self, ruta):
+        respuesta = requests.Response()
+        respuesta.status_code = 404
+        raise requests.exceptions.HTTPError(f"404 Client Error: {ruta}", response=respuesta)
+
+
+class CarpetaRemota:
+    def __init__(self, drive, nombre):
+        self.drive = drive
+        self.nombre = nombre
+
+    def create_child_folder(self, nombre):
+        self.drive.creadas.append(nombre)
+        return CarpetaRemota(self.drive, nombre)
+
+
+def backend_onedrive(drive):
+    """BackendOneDrive ya conectado a drive, sin pasar por la autenticación de O365"""
+    backend = BackendOneDrive.__new__(BackendOneDrive)
+    backend.nombre_raiz = 'Datos'
+    backend._lock = threading.Lock()
+    backend._drive = drive
+    return backend
+
+
+def test_onedrive_crea_la_carpeta_si_la_ruta_da_404():
+    backend = backend_onedrive(DriveSinRuta())
+    carpeta = backend.obtener_carpeta(CarpetaRemota(backend._drive, 'Datos'), 'proyecto_1', 'proyecto_1')
+    assert carpeta.nombre == 'proyecto_1'
+    assert backend._drive.creadas == ['proyecto_1']
+
+
+def test_onedrive_no_oculta_otros_errores():
+    class DriveCaido(DriveSinRuta):
+        def get_item_by_path(self, ruta):
+            respuesta = requests.Response()
+            respuesta.status_code = 503
+            raise requests.exceptions.HTTPError("503 Server Error", response=respuesta)
+
+    backend = backend_onedrive(DriveCaido())
+    with pytest.raises(requests.exceptions.HTTPError):
+        backend.obtener_carpeta(CarpetaRemota(backend._drive, 'Datos'), 'proyecto_1', 'proyecto_1')
+
+
+def escribir(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+
+
+def test_sin_cambios_no_toca_el_remoto(tmp_path):
+    local = tmp_path / 'datos'
+    crear_arbol(local)
+    _, primera = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+    sincronizador, segunda = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+    assert segunda['subidos'] == 0
+    assert segunda['sin_cambios'] == primera['subidos']
+    assert sincronizador.backend.peticiones == 0
+
+
+def test_touch_no_sube_y_cambio_de_contenido_si(tmp_path):
+    local = tmp_path / 'datos'
+    ruta = local / 'proyecto_1' / 'D0' / '2024-01-01' / 'D0.csv'
+    escribir(ruta, b'fecha,valor\n2024-01-01 00:00:00,1\n')
+    sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+
+    os.utime(ruta, ns=(os.stat(ruta).st_atime_ns, os.stat(ruta).st_mtime_ns + 10 ** 9))
+    sincronizador, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+    assert resumen['subidos'] == 0
+    assert sincronizador.backend.peticiones == 0
+    assert sincronizador.manifiesto['archivos']['proyecto_1/D0/2024-01-01/D0.csv']['mtime_ns'] == os.stat(ruta).st_mtime_ns
+
+    escribir(ruta, b'fecha,valor\n2024-01-01 00:00:00,2\n')  # mismo tamaño, otro contenido
+    _, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+    assert resumen['subidos'] == 1
+    assert contenido_arbol(tmp_path / 'remoto') == contenido_arbol(local)
+
+
+class BackendQueSeCorta(BackendLocal):
+    """Falla después de subir cierta cantidad de fragmentos, como un corte de red a mitad de la subida"""
+
+    def __init__(self, directorio, fragmentos):
+        super().__init__(directorio)
+        self.restantes = fragmentos
+
+    def subir_fragmento(self, sesion, inicio, datos, tamano):
+        if self.restantes == 0:
+            raise ConnectionError("conexión cortada")
+        self.restantes -= 1
+        return super().subir_fragmento(sesion, inicio, datos, tamano)
+
+
+def test_retoma_la_sesion_desde_el_byte_confirmado(tmp_path):
+    local = tmp_path / 'datos'
+    contenido = os.urandom(10_000)
+    escribir(local / 'proyecto_1' / 'D0' / 'grande.parquet', contenido)
+    opciones = {'umbral_sesion': 1024, 'tamano_fragmento': 1024}
+
+    backend = BackendQueSeCorta(str(tmp_path / 'remoto'), fragmentos=3)
+    resumen = SincronizadorOneDrive(str(local), backend, manifiesto=str(tmp_path / 'sync.json'), **opciones).sincronizar()
+    assert resumen['fallidos'] == 1
+
+    sincronizador, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json', **opciones)
+    assert resumen['subidos'] == 1
+    # Solo viajan los bytes que faltaban después de los 3 fragmentos confirmados
+    assert sincronizador.backend.bytes_subidos == len(contenido) - 3 * 1024
+    assert contenido_arbol(tmp_path / 'remoto') == {'proyecto_1/D0/grande.parquet': contenido}
+    assert not sincronizador.manifiesto['sesiones']
+
+
+def test_archivo_que_crece_durante_la_subida(tmp_path):
+    local = tmp_path / 'datos'
+    ruta = local / 'proyecto_1' / 'D0' / 'grande.csv'
+    contenido = os.urandom(5000)
+    escribir(ruta, contenido)
+
+    class BackendConEscritor(BackendLocal):
+        def subir_fragmento(self, sesion, inicio, datos, tamano):
+            with open(ruta, 'ab') as f:
+                f.write(b'fila agregada\n')
+            return super().subir_fragmento(sesion, inicio, datos, tamano)
+
+    backend = BackendConEscritor(str(tmp_path / 'remoto'))
+    sincronizador = SincronizadorOneDrive(str(local), backend, manifiesto=str(tmp_path / 'sync.json'),
+                                          umbral_sesion=1024, tamano_fragmento=2048)
+    assert sincronizador.sincronizar()['subidos'] == 1
+    # Se sube exactamente lo que había al escanear; lo agregado viaja en la siguiente sincronización
+    assert contenido_arbol(tmp_path / 'remoto') == {'proyecto_1/D0/grande.csv': contenido}
+    _, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+    assert resumen['subidos'] == 1
+
+
+def test_retira_del_remoto_los_sueltos_que_pasaron_a_un_paquete(tmp_path):
+    local = tmp_path / 'datos'
+    crear_arbol(local)
+    sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json')
+
+    empaquetados = {relativa for relativa in contenido_arbol(local) if '/2024-01-01/' in relativa}
+    sincronizador, resumen = sincronizar(local, tmp_path / 'remoto', tmp_path / 'sync.json',
+                                         excluir=empaquetados, retirar_excluidos=True)
+    assert resumen['borrados'] == len(empaquetados)
+    assert resumen['subidos'] == 0
+    assert set(contenido_arbol(tmp_path / 'remoto')) == set(contenido_arbol(local)) - empaquetados
+    assert not empaquetados & set(sincronizador.manifiesto['archivos'])
@@ -0,0 +1,65 @@
+import os
+import random
+
+import unificador_proyectos
+from unificador_proyectos import UnificadorProyectos
+
+
+def escribir_paquete(carpeta, dispositivo, fecha_carpeta, numero, filas):
+    ruta = os.path.join(carpeta, 'proyecto_1', dispositivo, fecha_carpeta,
+                        f"{dispositivo}_paquete_{numero:03d}_{fecha_carpeta}.csv")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('fecha,fecha_insercion,valor\n')
+        f.writelines(f"{fecha},{insercion},{valor}\n" for fecha, insercion, valor in filas)
+
+
+def crear_datos(carpeta, dispositivos=4, dias=3, paquetes=3, filas=200, semilla=7):
+    """
+    Paquetes con fechas de inserción repetidas entre dispositivos y dentro de cada
+    uno (cargas en bloque), algunas vacías y algunos paquetes fuera de orden.
+    """
+    azar = random.Random(semilla)
+    for d in range(dispositivos):
+        for dia in range(1, dias + 1):
+            fecha_carpeta = f"2024-01-{dia:02d}"
+            for numero in range(1, paquetes + 1):
+                lote = []
+                for i in range(filas):
+                    minuto = azar.randrange(24 * 60)
+                    fecha = f"{fecha_carpeta} {minuto // 60:02d}:{minuto % 60:02d}:00"
+                    insercion = '' if azar.random() < 0.02 else f"2024-01-{dia + azar.randrange(2):02d} 0{azar.randrange(3)}:00:00"
+                    lote.append((fecha, insercion, f"D{d}-{dia}-{numero}-{i}"))
+                escribir_paquete(carpeta, f"D{d}", fecha_carpeta, numero, lote)
+
+
+def unificar(datos, salida, **opciones):
+    unificador = UnificadorProyectos(str(datos), str(salida), **opciones)
+    unificador.ejecutar_unificacion()
+    with open(os.path.join(salida, 'proyecto_1_unificado.csv'), 'rb') as f:
+        return f.read()
+
+
+def test_paralelo_igual_a_secuencial(tmp_path):
+    crear_datos(tmp_path / 'datos')
+    secuencial = unificar(tmp_path / 'datos', tmp_path / 'secuencial')
+    paralelo = unificar(tmp_path / 'datos', tmp_path / 'paralelo', procesos=2)
+    assert paralelo == secuencial
+
+
+def test_incremental_igual_a_rehacer_con_paquete_fuera_de_orden(tmp_path, monkeypatch):
+    # Puntos de control cada 100 filas para que la cola reordenada empiece a mitad del archivo
+    monkeypatch.setattr(unificador_proyectos, 'FILAS_PUNTO_CONTROL', 100)
+    datos = tmp_path / 'datos'
+    crear_datos(datos)
+    unificar(datos, tmp_path / 'incremental')
+
+    # Paquete atrasado con las mismas fechas de inserción que filas ya unificadas de otros dispositivos
+    filas = [(f"2024-01-01 {i % 24:02d}:00:00", f"2024-01-0{1 + i % 2} 0{i % 3}:00:00", f"tardio-{i}")
+             for i in range(50)]
+    escribir_paquete(datos, 'D2', '2024-01-01', 9, filas)
+    escribir_paquete(datos, 'C0', '2024-01-02', 1, filas)
+
+    incremental = unificar(datos, tmp_path / 'incremental', incremental=True)
+    completo = unificar(datos, tmp_path / 'completo')
+    assert incremental == completo
@@ -1,15 +1,219 @@
 import pandas as pd
+import io
+import codecs
 import os
 import glob
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import warnings
+import numpy as np
+from pandas.tseries.api import guess_datetime_format
+from almacen_parquet import archivos_datos, leer_archivo_datos
 warnings.filterwarnings('ignore')
 
+COLUMNAS_CONTEXTO = ['proyecto', 'dispositivo', 'fecha_carpeta', 'archivo_origen']
+COLUMNAS_ORDENAMIENTO = ['fecha_insercion', 'fecha']
+# Orden de lectura de las filas (por nombre de dispositivo, carpeta y archivo): desempata las fechas iguales
+COLUMNAS_DESEMPATE = ['dispositivo', 'fecha_carpeta', 'archivo_origen']
+# Filas entre puntos de control (offset en bytes y clave de orden) del CSV unificado
+FILAS_PUNTO_CONTROL = 50000
+
+
+def _clave_comparable(clave):
+    """Clave de orden guardada (lista de ISO o None) como tupla comparable; las fechas vacías van al final"""
+    return tuple((1, '') if valor is None else (0, valor) for valor in clave)
+
+
+def dispositivos_proyecto(proyecto_path):
+    """Carpetas de dispositivo de un proyecto, en el orden en que se unifican (por nombre)"""
+    for dispositivo in sorted(os.listdir(proyecto_path)):
+        dispositivo_path = os.path.join(proyecto_path, dispositivo)
+        if os.path.isdir(dispositivo_path):
+            yield dispositivo, dispositivo_path
+
+
+def leer_dispositivo(proyecto_id, dispositivo, dispositivo_path, rutas=None, log=print):
+    """
+    Leer los archivos de datos de un dispositivo (dispositivo/fecha/*.csv)
+    
+    Args:
+        proyecto_id (str): ID del proyecto
+        dispositivo (str): Código del dispositivo
+        dispositivo_path (str): Carpeta del dispositivo
+        rutas (set): Si se indica, solo se leen estos archivos
+        log (callable): Destino de los mensajes de progreso
+    
+    Returns:
+        tuple: (DataFrames por archivo con columnas de contexto, detalle de archivos procesados)
+    """
+    todos_los_datos = []
+    archivos_procesados = []
+    
+    log(f"  📱 Dispositivo: {dispositivo}")
+    
+    for fecha_carpeta in sorted(os.listdir(dispositivo_path)):
+        fecha_path = os.path.join(dispositivo_path, fecha_carpeta)
+        
+        if not os.path.isdir(fecha_path):
+            continue
+        
+        # Buscar archivos de datos (CSV o Parquet) en la carpeta de fecha
+        archivos_csv = archivos_datos(fecha_path)
+        if rutas is not None:
+            archivos_csv = [archivo for archivo in archivos_csv if archivo in rutas]
+            if not archivos_csv:
+                continue
+        
+        log(f"    📅 Fecha: {fecha_carpeta}")
+        
+        for archivo_csv in archivos_csv:
+            try:
+                # Leer CSV o Parquet
+                df = leer_archivo_datos(archivo_csv)
+                
+                if df.empty:
+                    continue
+                
+                # Agregar información de contexto
+                df['proyecto'] = proyecto_id
+                df['dispositivo'] = dispositivo
+                df['fecha_carpeta'] = fecha_carpeta
+                df['archivo_origen'] = os.path.basename(archivo_csv)
+                
+                todos_los_datos.append(df)
+                archivos_procesados.append({
+                    'proyecto': proyecto_id,
+                    'dispositivo': dispositivo,
+                    'fecha': fecha_carpeta,
+                    'archivo': os.path.basename(archivo_csv),
+                    'registros': len(df),
+                    'ruta': archivo_csv
+                })
+                
+                log(f"      📄 {os.path.basename(archivo_csv)} ({len(df)} registros)")
+                
+            except Exception as e:
+                log(f"    ⚠️ Error leyendo {archivo_csv}: {e}")
+                continue
+    
+    return todos_los_datos, archivos_procesados
+
+
+def _formato_fechas(serie):
+    """
+    Formato que pandas.to_datetime deduciría para serie (a partir de su primer valor no nulo).
+    
+    Returns:
+        tuple | None: ('texto', formato o None) o ('valor', tipo); None si no hay valores
+    """
+    for valor in serie:
+        if isinstance(valor, str):
+            if valor in ('', 'NaT', 'nat', 'nan', 'NaN'):
+                continue
+            return ('texto', guess_datetime_format(valor))
+        if not pd.isna(valor):
+            return ('valor', type(valor).__name__)
+    return None
+
+
+def ordenar_dispositivo(proyecto_id, dispositivo, dispositivo_path):
+    """
+    Lee y ordena un dispositivo en un proceso del pool de unificación en paralelo.
+    
+    Los DataFrames se devuelven tal como se leyeron (el proceso principal los
+    concatena igual que la unificación secuencial, con los mismos tipos) junto
+    con el orden estable del dispositivo por COLUMNAS_ORDENAMIENTO y sus claves
+    ya ordenadas; los mensajes se devuelven para imprimirlos en orden.
+    
+    Returns:
+        dict: datos, archivos, log, orden, claves y formatos (de cada columna de fecha)
+    """
+    log = []
+    datos, archivos = leer_dispositivo(proyecto_id, dispositivo, dispositivo_path, log=log.append)
+    resultado = {'datos': datos, 'archivos': archivos, 'log': log, 'orden': None, 'claves': None, 'formatos': {}}
+    if datos:
+        # Una columna que falta en el dispositivo queda vacía, como en la concatenación del proyecto
+        fechas = pd.concat([df.reindex(columns=COLUMNAS_ORDENAMIENTO) for df in datos], ignore_index=True)
+        claves = pd.DataFrame({col: pd.to_datetime(fechas[col], errors='coerce') for col in COLUMNAS_ORDENAMIENTO})
+        orden = claves.sort_values(COLUMNAS_ORDENAMIENTO, ascending=True, kind='stable').index
+        resultado['orden'] = orden.to_numpy()
+        resultado['claves'] = claves.loc[orden].reset_index(drop=True)
+        resultado['formatos'] = {col: _formato_fechas(fechas[col]) for col in COLUMNAS_ORDENAMIENTO}
+    return resultado
+
+
+def mezclar_corridas(claves, columnas):
+    """
+    Orden estable de claves formadas por corridas ya ordenadas (una por dispositivo).
+    
+    El argsort estable de NumPy (timsort) detecta las corridas de la primera
+    columna y las mezcla sin reordenarlas; los empates en ella se ordenan por
+    las columnas siguientes solo entre las filas empatadas. Las fechas vacías
+    van al final, como en sort_values. Si alguna columna no es datetime (zonas
+    horarias mezcladas) se ordena con sort_values.
+    
+    Returns:
+        ndarray: Posiciones de claves en el orden final
+    """
+    if not all(pd.api.types.is_datetime64_dtype(claves[col]) for col in columnas):
+        return claves.sort_values(columnas, ascending=True, kind='stable').index.to_numpy()
+    enteros = []
+    for col in columnas:
+        valores = claves[col].to_numpy()
+        enteros.append(np.where(np.isnat(valores), np.iinfo(np.int64).max, valores.view('i8')))
+    orden = np.argsort(enteros[0], kind='stable')
+    if len(enteros) > 1:
+        primera = enteros[0][orden]
+        empate = primera[1:] == primera[:-1]
+        if empate.any():
+            filas = np.flatnonzero(np.r_[empate, False] | np.r_[False, empate])
+            grupo = np.cumsum(np.r_[True, ~empate])[filas]
+            resto = [valores[orden[filas]] for valores in reversed(enteros[1:])]
+            orden[filas] = orden[filas][np.lexsort(resto + [grupo])]
+    return orden
+
+
 class UnificadorProyectos:
-    def __init__(self, datos_folder='datos', output_folder='datos_unificados'):
+    """
+    Une los archivos de datos de cada proyecto en datos_unificados/proyecto_X_unificado.csv.
+
+    Con incremental=True se usa estado_unificacion.json (en la carpeta de
+    salida), que guarda por proyecto los archivos ya unificados (tamaño,
+    mtime y registros), el resumen y puntos de control del CSV unificado
+    (offset en bytes y clave de orden cada FILAS_PUNTO_CONTROL filas). Solo
+    se leen los archivos nuevos: si todos son posteriores a la última fila
+    se anexan al final, y si no, se relee la cola del unificado desde el
+    último punto de control anterior a ellos, se reordena junto con lo
+    nuevo (desempatando las fechas iguales por COLUMNAS_DESEMPATE, que es
+    el orden de lectura de la unificación completa) y se reescribe desde
+    ahí. Si un archivo ya unificado cambió o
+    desapareció (compactación, descarga repetida), si aparecen columnas
+    nuevas o si el unificado no coincide con el estado, ese proyecto se
+    rehace completo.
+
+    Con procesos > 1 la lectura, el parseo de fechas y el orden de cada
+    dispositivo se reparten en un pool de procesos (ordenar_dispositivo),
+    encargando los dispositivos del proyecto siguiente mientras se escribe
+    el actual; el proceso principal concatena los archivos en el mismo
+    orden que la unificación secuencial y mezcla los dispositivos ya
+    ordenados con una mezcla estable (mezclar_corridas), así que el CSV
+    resultante es idéntico.
+    """
+
+    NOMBRE_ESTADO = 'estado_unificacion.json'
+
+    def __init__(self, datos_folder='datos', output_folder='datos_unificados', incremental=False, procesos=1):
         self.datos_folder = datos_folder
         self.output_folder = output_folder
+        self.incremental = incremental
+        self.procesos = max(1, int(procesos))
+        self._pool = None
+        self._pendientes = {}
         self.crear_carpeta_output()
+        self.ruta_estado = os.path.join(output_folder, self.NOMBRE_ESTADO)
+        self.estado = self.cargar_estado()
     
     def crear_carpeta_output(self):
         """Crear carpeta de salida para datos unificados"""
@@ -37,70 +241,264 @@ class UnificadorProyectos:
         
         return proyectos
     
-    def leer_csvs_proyecto(self, proyecto_path, proyecto_id):
-        """Leer todos los CSV de un proyecto específico"""
-        todos_los_datos = []
-        archivos_procesados = []
-        
-        print(f"\n📊 Procesando Proyecto {proyecto_id}...")
+    def cargar_estado(self):
+        """Leer el estado de la última unificación (archivos unificados por proyecto)"""
+        if not os.path.exists(self.ruta_estado):
+            return {'proyectos': {}}
+        try:
+            with open(self.ruta_estado, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  No se pudo leer {self.ruta_estado} ({e}), se unificará todo de nuevo")
+            return {'proyectos': {}}
+    
+    def guardar_estado(self):
+        """Escribe el estado en un temporal y lo renombra"""
+        self.estado['actualizado'] = datetime.now().isoformat(timespec='seconds')
+        ruta_tmp = self.ruta_estado + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f, indent=1, ensure_ascii=False)
+        os.replace(ruta_tmp, self.ruta_estado)
+    
+    def escanear_archivos(self, proyecto_path):
+        """
+        Archivos de datos de un proyecto sin leerlos.
         
-        # Recorrer estructura: proyecto/dispositivo/fecha/*.csv
-        for dispositivo in os.listdir(proyecto_path):
+        Returns:
+            dict: {ruta relativa a datos_folder con '/': (ruta, dispositivo, fecha_carpeta, os.stat_result)}
+        """
+        archivos = {}
+        for dispositivo in sorted(os.listdir(proyecto_path)):
             dispositivo_path = os.path.join(proyecto_path, dispositivo)
-            
             if not os.path.isdir(dispositivo_path):
                 continue
-                
-            print(f"  📱 Dispositivo: {dispositivo}")
-            
-            for fecha_carpeta in os.listdir(dispositivo_path):
+            for fecha_carpeta in sorted(os.listdir(dispositivo_path)):
                 fecha_path = os.path.join(dispositivo_path, fecha_carpeta)
-                
                 if not os.path.isdir(fecha_path):
                     continue
-                
-                print(f"    📅 Fecha: {fecha_carpeta}")
-                
-                # Buscar archivos CSV en la carpeta de fecha
-                patron_csv = os.path.join(fecha_path, "*.csv")
-                archivos_csv = glob.glob(patron_csv)
-                
-                for archivo_csv in archivos_csv:
-                    try:
-                        # Leer CSV
-                        df = pd.read_csv(archivo_csv)
-                        
-                        if df.empty:
-                            continue
-                        
-                        # Agregar información de contexto
-                        df['proyecto'] = proyecto_id
-                        df['dispositivo'] = dispositivo
-                        df['fecha_carpeta'] = fecha_carpeta
-                        df['archivo_origen'] = os.path.basename(archivo_csv)
-                        
-                        todos_los_datos.append(df)
-                        archivos_procesados.append({
-                            'proyecto': proyecto_id,
-                            'dispositivo': dispositivo,
-                            'fecha': fecha_carpeta,
-                            'archivo': os.path.basename(archivo_csv),
-                            'registros': len(df),
-                            'ruta': archivo_csv
-                        })
-                        
-                        print(f"      📄 {os.path.basename(archivo_csv)} ({len(df)} registros)")
-                        
-                    except Exception as e:
-                        print(f"    ⚠️ Error leyendo {archivo_csv}: {e}")
-                        continue
+                for ruta in archivos_datos(fecha_path):
+                    relativa = os.path.relpath(ruta, self.datos_folder).replace(os.sep, '/')
+                    archivos[relativa] = (ruta, dispositivo, fecha_carpeta, os.stat(ruta))
+        return archivos
+    
+    def leer_csvs_proyecto(self, proyecto_path, proyecto_id, rutas=None):
+        """
+        Leer todos los CSV de un proyecto específico
+        
+        Args:
+            proyecto_path (str): Carpeta del proyecto
+            proyecto_id (str): ID del proyecto
+            rutas (set): Si se indica, solo se leen estos archivos
+        """
+        todos_los_datos = []
+        archivos_procesados = []
+        
+        print(f"\n📊 Procesando Proyecto {proyecto_id}...")
+        
+        # Recorrer estructura: proyecto/dispositivo/fecha/*.csv
+        for dispositivo, dispositivo_path in dispositivos_proyecto(proyecto_path):
+            if rutas is not None and not any(ruta.startswith(dispositivo_path + os.sep) for ruta in rutas):
+                continue
+            datos, archivos = leer_dispositivo(proyecto_id, dispositivo, dispositivo_path, rutas)
+            todos_los_datos.extend(datos)
+            archivos_procesados.extend(archivos)
         
         return todos_los_datos, archivos_procesados
     
+    def encargar_proyecto(self, proyecto_id, proyecto_path):
+        """Envía al pool la lectura y el orden de cada dispositivo del proyecto (si no se envió ya)"""
+        if proyecto_id not in self._pendientes:
+            self._pendientes[proyecto_id] = [
+                self._pool.submit(ordenar_dispositivo, proyecto_id, dispositivo, dispositivo_path)
+                for dispositivo, dispositivo_path in dispositivos_proyecto(proyecto_path)
+            ]
+    
+    def leer_proyecto_paralelo(self, proyecto_path, proyecto_id):
+        """
+        Resultados del pool para un proyecto, en el orden de los dispositivos.
+        
+        Returns:
+            tuple: (DataFrames por archivo, detalle de archivos procesados, resultados por dispositivo)
+        """
+        self.encargar_proyecto(proyecto_id, proyecto_path)
+        print(f"\n📊 Procesando Proyecto {proyecto_id}...")
+        todos_los_datos = []
+        archivos_procesados = []
+        resultados = []
+        for futuro in self._pendientes.pop(proyecto_id):
+            resultado = futuro.result()
+            for linea in resultado['log']:
+                print(linea)
+            todos_los_datos.extend(resultado['datos'])
+            archivos_procesados.extend(resultado['archivos'])
+            if resultado['datos']:
+                resultados.append(resultado)
+        return todos_los_datos, archivos_procesados, resultados
+    
+    def combinar_ordenados(self, df, resultados):
+        """
+        Ordena el proyecto mezclando los dispositivos que ya vienen ordenados del pool.
+        
+        df es la concatenación de los archivos de resultados en orden; mezclar
+        de forma estable las claves de cada dispositivo (también en orden) da
+        el mismo resultado que ordenar_unificado sobre df. Si los dispositivos
+        no escriben las fechas con el mismo formato, pandas podría interpretar
+        distinto la columna completa y se ordena como en el modo secuencial.
+        
+        Returns:
+            tuple: (DataFrame ordenado, claves de orden como datetime, columnas de ordenamiento)
+        """
+        columnas_ordenamiento = [col for col in COLUMNAS_ORDENAMIENTO if col in df.columns]
+        for col in columnas_ordenamiento:
+            formatos = {resultado['formatos'][col] for resultado in resultados} - {None}
+            if len(formatos) > 1:
+                print(f"    ⚠️ Formatos de fecha distintos entre dispositivos en {col}, se ordena el proyecto completo")
+                return self.ordenar_unificado(df)
+        if not columnas_ordenamiento:
+            return self.ordenar_unificado(df)
+        
+        posiciones = []
+        desplazamiento = 0
+        for resultado in resultados:
+            posiciones.append(resultado['orden'] + desplazamiento)
+            desplazamiento += sum(len(datos) for datos in resultado['datos'])
+        posiciones = np.concatenate(posiciones)
+        claves = pd.concat([resultado['claves'][columnas_ordenamiento] for resultado in resultados], ignore_index=True)
+        orden = mezclar_corridas(claves, columnas_ordenamiento)
+        df = df.take(posiciones[orden]).reset_index(drop=True)
+        claves = claves.take(orden).reset_index(drop=True)
+        return df, claves, columnas_ordenamiento
+    
+    def ordenar_unificado(self, df, desempate=False):
+        """
+        Ordena por fecha de inserción y luego por fecha de medición sin modificar las columnas.
+        
+        Args:
+            df (DataFrame): Filas a ordenar
+            desempate (bool): Desempatar además por COLUMNAS_DESEMPATE, para filas que no
+                vienen en el orden de lectura (cola del unificado más archivos nuevos)
+        
+        Returns:
+            tuple: (DataFrame ordenado, claves de orden como datetime, columnas de ordenamiento)
+        """
+        columnas_ordenamiento = [col for col in COLUMNAS_ORDENAMIENTO if col in df.columns]
+        # Convertir fechas a datetime solo para ordenamiento
+        claves = pd.DataFrame({col: pd.to_datetime(df[col], errors='coerce') for col in columnas_ordenamiento},
+                              index=df.index)
+        if columnas_ordenamiento:
+            # Orden estable: a igual fecha se respeta el orden de lectura
+            columnas = columnas_ordenamiento
+            orden_por = claves
+            if desempate:
+                columnas = columnas_ordenamiento + COLUMNAS_DESEMPATE
+                orden_por = claves.join(df[COLUMNAS_DESEMPATE])
+            orden = orden_por.sort_values(columnas, ascending=True, kind='stable').index
+            df = df.loc[orden].reset_index(drop=True)
+            claves = claves.loc[orden].reset_index(drop=True)
+        return df, claves, columnas_ordenamiento
+    
+    @staticmethod
+    def _clave_fila(claves, fila):
+        return [None if pd.isna(valor) else valor.isoformat() for valor in claves.iloc[fila]]
+    
+    def escribir_unificado(self, df, claves, archivo_salida, desde=None):
+        """
+        Escribe el CSV unificado por tramos y anota un punto de control al inicio de cada uno.
+        
+        Args:
+            df (DataFrame): Filas ordenadas a escribir
+            claves (DataFrame): Claves de orden de esas filas
+            archivo_salida (str): Ruta del CSV unificado
+            desde (int): Offset desde el que se reescribe; None escribe el archivo completo con cabecera
+        
+        Returns:
+            tuple: (puntos de control [offset, clave], tamaño final del archivo)
+        """
+        puntos = []
+        with open(archivo_salida, 'wb' if desde is None else 'r+b') as f:
+            if desde is None:
+                f.write(codecs.BOM_UTF8)  # mismo inicio que encoding='utf-8-sig'
+                df.iloc[:0].to_csv(f, index=False, encoding='utf-8')
+            else:
+                f.seek(desde)
+                f.truncate()
+            for inicio in range(0, len(df), FILAS_PUNTO_CONTROL):
+                puntos.append([f.tell(), self._clave_fila(claves, inicio)])
+                df.iloc[inicio:inicio + FILAS_PUNTO_CONTROL].to_csv(f, index=False, header=False, encoding='utf-8')
+            return puntos, f.tell()
+    
+    @staticmethod
+    def _rango_fechas(df):
+        """Rango de fecha_insercion ('YYYY-MM-DD HH:MM:SS') o ('N/A', 'N/A')"""
+        fecha_inicio = fecha_final = "N/A"
+        if 'fecha_insercion' in df.columns:
+            # Convertir temporalmente para obtener el rango sin modificar los datos originales
+            fechas_temp = pd.to_datetime(df['fecha_insercion'], errors='coerce').dropna()
+            if not fechas_temp.empty:
+                fecha_inicio = fechas_temp.min().strftime('%Y-%m-%d %H:%M:%S')
+                fecha_final = fechas_temp.max().strftime('%Y-%m-%d %H:%M:%S')
+        return fecha_inicio, fecha_final
+    
+    def _registrar_archivos(self, estado, archivos_info):
+        for info in archivos_info:
+            stat = os.stat(info['ruta'])
+            relativa = os.path.relpath(info['ruta'], self.datos_folder).replace(os.sep, '/')
+            estado['archivos'][relativa] = {
+                'bytes': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'dispositivo': info['dispositivo'],
+                'fecha': info['fecha'],
+                'registros': info['registros'],
+            }
+    
+    def resumen_desde_estado(self, proyecto_id, imprimir=True):
+        """Resumen de un proyecto armado con el estado guardado, sin leer el CSV unificado"""
+        estado = self.estado['proyectos'][proyecto_id]
+        archivos_detalle = []
+        for relativa, archivo in estado['archivos'].items():
+            archivos_detalle.append({
+                'proyecto': proyecto_id,
+                'dispositivo': archivo['dispositivo'],
+                'fecha': archivo['fecha'],
+                'archivo': os.path.basename(relativa),
+                'registros': archivo['registros'],
+                'ruta': os.path.join(self.datos_folder, *relativa.split('/'))
+            })
+        resumen = {
+            'proyecto_id': proyecto_id,
+            'archivo_salida': estado['archivo_salida'],
+            'total_registros': estado['total_registros'],
+            'total_archivos': len(archivos_detalle),
+            'dispositivos': len(estado['dispositivos']),
+            'fechas_carpetas': len(estado['fechas_carpetas']),
+            'fecha_inicio': estado['fecha_inicio'],
+            'fecha_final': estado['fecha_final'],
+            'archivos_detalle': archivos_detalle
+        }
+        if imprimir:
+            self._imprimir_resumen(resumen)
+        return resumen
+    
+    @staticmethod
+    def _imprimir_resumen(resumen):
+        print(f"  ✅ Unificado guardado: {os.path.basename(resumen['archivo_salida'])}")
+        print(f"     📊 {resumen['total_registros']:,} registros de {resumen['total_archivos']} archivos")
+        print(f"     📱 {resumen['dispositivos']} dispositivos en {resumen['fechas_carpetas']} fechas")
+        print(f"     📅 Período: {resumen['fecha_inicio']} → {resumen['fecha_final']}")
+    
     def unificar_proyecto(self, proyecto_id, proyecto_path):
         """Unificar todos los datos de un proyecto en un solo CSV"""
+        if self.incremental:
+            resumen = self.unificar_incremental(proyecto_id, proyecto_path)
+            if resumen is not False:
+                return resumen
+        
         # Leer todos los CSV del proyecto
-        todos_los_datos, archivos_info = self.leer_csvs_proyecto(proyecto_path, proyecto_id)
+        ordenados = None
+        if self._pool is not None:
+            todos_los_datos, archivos_info, ordenados = self.leer_proyecto_paralelo(proyecto_path, proyecto_id)
+        else:
+            todos_los_datos, archivos_info = self.leer_csvs_proyecto(proyecto_path, proyecto_id)
         
         if not todos_los_datos:
             print(f"  ❌ No se encontraron datos para el Proyecto {proyecto_id}")
@@ -110,73 +508,142 @@ class UnificadorProyectos:
         print(f"  🔄 Unificando {len(todos_los_datos)} archivos...")
         df_unificado = pd.concat(todos_los_datos, ignore_index=True)
         
-        # Ordenar por fecha de inserción y luego por fecha de medición
-        columnas_ordenamiento = []
-        if 'fecha_insercion' in df_unificado.columns:
-            columnas_ordenamiento.append('fecha_insercion')
-        if 'fecha' in df_unificado.columns:
-            columnas_ordenamiento.append('fecha')
-        
+        if ordenados is not None:
+            df_unificado, claves, columnas_ordenamiento = self.combinar_ordenados(df_unificado, ordenados)
+        else:
+            df_unificado, claves, columnas_ordenamiento = self.ordenar_unificado(df_unificado)
         if columnas_ordenamiento:
-            # Crear una copia para ordenamiento sin modificar las columnas originales
-            df_temp = df_unificado.copy()
-            
-            # Convertir fechas a datetime solo para ordenamiento
-            for col in columnas_ordenamiento:
-                df_temp[f'{col}_temp'] = pd.to_datetime(df_temp[col], errors='coerce')
-            
-            # Ordenar usando las columnas temporales
-            columnas_temp = [f'{col}_temp' for col in columnas_ordenamiento]
-            df_temp_sorted = df_temp.sort_values(columnas_temp, ascending=True)
-            
-            # Obtener el índice ordenado y aplicarlo al DataFrame original
-            df_unificado = df_unificado.iloc[df_temp_sorted.index].reset_index(drop=True)
-            
             print(f"    ✓ Datos ordenados por: {', '.join(columnas_ordenamiento)}")
         
         # Reorganizar columnas (poner las de contexto al final)
-        columnas_contexto = ['proyecto', 'dispositivo', 'fecha_carpeta', 'archivo_origen']
-        columnas_datos = [col for col in df_unificado.columns if col not in columnas_contexto]
-        df_unificado = df_unificado[columnas_datos + columnas_contexto]
+        columnas_datos = [col for col in df_unificado.columns if col not in COLUMNAS_CONTEXTO]
+        df_unificado = df_unificado[columnas_datos + COLUMNAS_CONTEXTO]
         
         # Guardar CSV unificado
         archivo_salida = os.path.join(self.output_folder, f"proyecto_{proyecto_id}_unificado.csv")
-        df_unificado.to_csv(archivo_salida, index=False, encoding='utf-8-sig')
+        puntos, tamano = self.escribir_unificado(df_unificado, claves, archivo_salida)
         
         # Generar reporte de resumen
-        total_registros = len(df_unificado)
-        total_archivos = len(archivos_info)
-        dispositivos_unicos = df_unificado['dispositivo'].nunique()
-        fechas_unicas = df_unificado['fecha_carpeta'].nunique()
-        
-        # Rango de fechas para el reporte
-        fecha_inicio = fecha_final = "N/A"
-        if 'fecha_insercion' in df_unificado.columns:
-            # Convertir temporalmente para obtener el rango sin modificar los datos originales
-            fechas_temp = pd.to_datetime(df_unificado['fecha_insercion'], errors='coerce').dropna()
-            if not fechas_temp.empty:
-                fecha_inicio = fechas_temp.min().strftime('%Y-%m-%d %H:%M:%S')
-                fecha_final = fechas_temp.max().strftime('%Y-%m-%d %H:%M:%S')
-        
-        resumen = {
-            'proyecto_id': proyecto_id,
+        fecha_inicio, fecha_final = self._rango_fechas(df_unificado)
+        estado = {
             'archivo_salida': archivo_salida,
-            'total_registros': total_registros,
-            'total_archivos': total_archivos,
-            'dispositivos': dispositivos_unicos,
-            'fechas_carpetas': fechas_unicas,
+            'bytes': tamano,
+            'columnas': list(df_unificado.columns),
+            'tipos': {col: str(tipo) for col, tipo in df_unificado.dtypes.items()},
+            'puntos_control': puntos,
+            'ultima_clave': self._clave_fila(claves, len(df_unificado) - 1),
+            'total_registros': len(df_unificado),
+            'dispositivos': sorted(df_unificado['dispositivo'].unique().tolist()),
+            'fechas_carpetas': sorted(df_unificado['fecha_carpeta'].unique().tolist()),
             'fecha_inicio': fecha_inicio,
             'fecha_final': fecha_final,
-            'archivos_detalle': archivos_info
+            'archivos': {},
         }
+        self._registrar_archivos(estado, archivos_info)
+        self.estado['proyectos'][proyecto_id] = estado
+        self.guardar_estado()
         
-        print(f"  ✅ Unificado guardado: {os.path.basename(archivo_salida)}")
-        print(f"     📊 {total_registros:,} registros de {total_archivos} archivos")
-        print(f"     📱 {dispositivos_unicos} dispositivos en {fechas_unicas} fechas")
-        print(f"     📅 Período: {fecha_inicio} → {fecha_final}")
-        
+        resumen = self.resumen_desde_estado(proyecto_id, imprimir=False)
+        resumen['archivos_detalle'] = archivos_info
+        self._imprimir_resumen(resumen)
         return resumen
     
+    def unificar_incremental(self, proyecto_id, proyecto_path):
+        """
+        Agrega al unificado existente solo los archivos nuevos desde la última unificación.
+        
+        Returns:
+            dict | False: Resumen del proyecto, o False si hay que rehacerlo completo
+        """
+        estado = self.estado['proyectos'].get(proyecto_id)
+        archivo_salida = os.path.join(self.output_folder, f"proyecto_{proyecto_id}_unificado.csv")
+        if estado is None or not os.path.exists(archivo_salida) or os.path.getsize(archivo_salida) != estado['bytes']:
+            return False
+        
+        print(f"\n📊 Procesando Proyecto {proyecto_id} (incremental)...")
+        actuales = self.escanear_archivos(proyecto_path)
+        registrados = estado['archivos']
+        cambiados = [relativa for relativa, archivo in registrados.items()
+                     if relativa not in actuales
+                     or actuales[relativa][3].st_size != archivo['bytes']
+                     or actuales[relativa][3].st_mtime_ns != archivo['mtime_ns']]
+        if cambiados:
+            print(f"  🔁 {len(cambiados)} archivos ya unificados cambiaron o ya no existen: se rehace completo")
+            return False
+        
+        nuevos = {actuales[relativa][0] for relativa in actuales if relativa not in registrados}
+        todos_los_datos, archivos_info = [], []
+        if nuevos:
+            todos_los_datos, archivos_info = self.leer_csvs_proyecto(proyecto_path, proyecto_id, rutas=nuevos)
+        if not todos_los_datos:
+            print(f"  ✓ Sin archivos nuevos desde la última unificación")
+            return self.resumen_desde_estado(proyecto_id)
+        
+        df_nuevos = pd.concat(todos_los_datos, ignore_index=True)
+        columnas = estado['columnas']
+        columnas_nuevas = [col for col in df_nuevos.columns if col not in columnas]
+        if columnas_nuevas:
+            print(f"  🔁 Columnas nuevas ({', '.join(columnas_nuevas)}): se rehace completo")
+            return False
+        for col in df_nuevos.columns:
+            tipo_anterior = estado['tipos'].get(col, '')
+            # Mantener el formato del unificado: un entero donde antes había decimales se escribe como decimal
+            if tipo_anterior.startswith('float') and pd.api.types.is_integer_dtype(df_nuevos[col]):
+                df_nuevos[col] = df_nuevos[col].astype(tipo_anterior)
+            elif tipo_anterior.startswith('int') and pd.api.types.is_float_dtype(df_nuevos[col]):
+                print(f"  🔁 La columna {col} pasa de entera a decimal: se rehace completo")
+                return False
+        df_nuevos = df_nuevos.reindex(columns=columnas)
+        df_nuevos, claves_nuevas, columnas_ordenamiento = self.ordenar_unificado(df_nuevos)
+        
+        # Posición de reescritura: fin del archivo si lo nuevo va estrictamente después de
+        # la última fila; con fechas iguales el orden depende del desempate y se reordena
+        puntos = estado['puntos_control']
+        primera = _clave_comparable(self._clave_fila(claves_nuevas, 0))
+        indice = len(puntos)
+        desde = estado['bytes']
+        if columnas_ordenamiento and primera <= _clave_comparable(estado['ultima_clave']):
+            indice = 0
+            for i, (offset, clave) in enumerate(puntos):
+                if None not in clave and _clave_comparable(clave) < primera:
+                    indice = i
+            desde = puntos[indice][0] if puntos else estado['bytes']
+        
+        if desde < estado['bytes']:
+            # Reordenar la cola del unificado junto con lo nuevo, todo como texto para no cambiar el formato
+            with open(archivo_salida, 'rb') as f:
+                f.seek(desde)
+                cola = pd.read_csv(f, header=None, names=columnas, dtype=str, keep_default_na=False)
+            nuevos_texto = pd.read_csv(io.StringIO(df_nuevos.to_csv(index=False)), dtype=str, keep_default_na=False)
+            df_escribir, claves, _ = self.ordenar_unificado(pd.concat([cola, nuevos_texto], ignore_index=True),
+                                                            desempate=True)
+            print(f"  🔄 Reordenando {len(cola):,} filas de la cola con {len(df_nuevos):,} filas nuevas...")
+        else:
+            df_escribir, claves = df_nuevos, claves_nuevas
+            print(f"  🔄 Anexando {len(df_nuevos):,} filas nuevas...")
+        puntos_nuevos, tamano = self.escribir_unificado(df_escribir, claves, archivo_salida, desde=desde)
+        
+        fecha_inicio, fecha_final = self._rango_fechas(df_nuevos)
+        if estado['fecha_inicio'] != "N/A" and (fecha_inicio == "N/A" or estado['fecha_inicio'] < fecha_inicio):
+            fecha_inicio = estado['fecha_inicio']
+        if estado['fecha_final'] != "N/A" and (fecha_final == "N/A" or estado['fecha_final'] > fecha_final):
+            fecha_final = estado['fecha_final']
+        estado.update({
+            'bytes': tamano,
+            'puntos_control': puntos[:indice] + puntos_nuevos,
+            'ultima_clave': self._clave_fila(claves, len(df_escribir) - 1),
+            'total_registros': estado['total_registros'] + len(df_nuevos),
+            'dispositivos': sorted(set(estado['dispositivos']) | set(df_nuevos['dispositivo'])),
+            'fechas_carpetas': sorted(set(estado['fechas_carpetas']) | set(df_nuevos['fecha_carpeta'])),
+            'fecha_inicio': fecha_inicio,
+            'fecha_final': fecha_final,
+        })
+        self._registrar_archivos(estado, archivos_info)
+        # Mismo orden de archivos que una unificación completa
+        estado['archivos'] = {relativa: registrados[relativa] for relativa in actuales if relativa in registrados}
+        self.guardar_estado()
+        return self.resumen_desde_estado(proyecto_id)
+    
     def generar_reporte_general(self, resumenes_proyectos):
         """Generar reporte general de la unificación"""
         if not resumenes_proyectos:
@@ -222,6 +689,20 @@ class UnificadorProyectos:
         
         print(f"📝 Reporte detallado: {os.path.basename(archivo_resumen)}")
     
+    def unificar_proyectos(self, proyectos):
+        """Unificar cada proyecto en orden y devolver los resúmenes"""
+        resumenes = []
+        lista = list(proyectos.items())
+        for i, (proyecto_id, proyecto_path) in enumerate(lista):
+            if self._pool is not None and not self.incremental:
+                # El pool lee el proyecto siguiente mientras se ordena y escribe este
+                for siguiente_id, siguiente_path in lista[i:i + 2]:
+                    self.encargar_proyecto(siguiente_id, siguiente_path)
+            resumen = self.unificar_proyecto(proyecto_id, proyecto_path)
+            if resumen:
+                resumenes.append(resumen)
+        return resumenes
+    
     def ejecutar_unificacion(self):
         """Ejecutar el proceso completo de unificación"""
         print("🚀 INICIANDO UNIFICACIÓN DE DATOS POR PROYECTO")
@@ -237,11 +718,17 @@ class UnificadorProyectos:
         print(f"\n🎯 Se procesarán {len(proyectos)} proyectos")
         
         # Procesar cada proyecto
-        resumenes = []
-        for proyecto_id, proyecto_path in proyectos.items():
-            resumen = self.unificar_proyecto(proyecto_id, proyecto_path)
-            if resumen:
-                resumenes.append(resumen)
+        if self.procesos > 1:
+            print(f"⚙️  Dispositivos en paralelo con {self.procesos} procesos")
+            with ProcessPoolExecutor(max_workers=self.procesos) as pool:
+                self._pool = pool
+                try:
+                    resumenes = self.unificar_proyectos(proyectos)
+                finally:
+                    self._pool = None
+                    self._pendientes.clear()
+        else:
+            resumenes = self.unificar_proyectos(proyectos)
         
         # Generar reporte general
         self.generar_reporte_general(resumenes)
@@ -251,9 +738,19 @@ class UnificadorProyectos:
 
 # ===== EJECUCIÓN PRINCIPAL =====
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unificación de los datos de cada proyecto en un CSV")
+    parser.add_argument('--datos', default='datos', help="Carpeta de datos del colector")
+    parser.add_argument('--salida', default='datos_unificados', help="Carpeta de los CSV unificados")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Agregar solo los archivos nuevos desde la última unificación")
+    parser.add_argument('--procesos', type=int, default=1,
+                        help="Procesos para leer y ordenar dispositivos en paralelo (1 = secuencial)")
+    args = parser.parse_args()
+    
     print("📊 Iniciando unificación de datos por proyecto...")
     
-    unificador = UnificadorProyectos()
+    unificador = UnificadorProyectos(args.datos, args.salida, incremental=args.incremental,
+                                     procesos=args.procesos)
     resultados = unificador.ejecutar_unificacion()
     
     if resultados: